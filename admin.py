@@ -2,7 +2,8 @@
 import os
 from datetime import datetime, timedelta
 from sqlalchemy import func
-from flask_admin import Admin, AdminIndexView, expose 
+from sqlalchemy.exc import IntegrityError
+from flask_admin import Admin, AdminIndexView, BaseView, expose 
 from flask_admin.contrib.sqla import ModelView
 from flask_ckeditor import CKEditorField
 from flask_admin.form.upload import ImageUploadField
@@ -10,20 +11,32 @@ from flask_admin.menu import MenuLink
 from wtforms.validators import ValidationError
 from flask import flash, redirect, url_for, request, render_template
 from flask_login import current_user, logout_user 
-from slugify import slugify
 from wtforms.fields import DateField
 
 from flask_admin.actions import action
-from slugify import slugify
-
+from flask_admin.babel import lazy_gettext
+from flask_admin.contrib.sqla import tools as sqla_tools
+from flask_admin.contrib.sqla.filters import BaseSQLAFilter
+from flask_admin.helpers import get_redirect_target
+
+import bulk
+import jobs
+import order_items
+import outbox
+import rollups
+from cart_store import cart_store
+from instrumentation import request_metrics
+import search
+import slugs
 from extensions import db
+from images import content_hash, remove_derivatives
 from models import (
     HeaderCategory, CircularCategory, Banner,
     Product, ProductSection, TextSection,
     Variation, Category,
     FooterLink,
     Product, Promotion,
-    Order, SiteStat
+    Order, OrderItem, SiteStat, Job, OutboxMessage
 )
 
 # --- Configuração do Caminho de Upload ---
@@ -31,6 +44,33 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 upload_path = os.path.join(basedir, 'static', 'uploads')
 
 
+# --- Campo de Upload (gera as derivadas das imagens, ver images.py) ---
+
+class ResponsiveImageUploadField(ImageUploadField):
+    """
+    ImageUploadField que enfileira a geração das derivadas após salvar
+    (o save do admin não espera o Pillow) e as apaga junto com o original.
+    """
+
+    def _save_file(self, data, filename):
+        filename = super()._save_file(data, filename)
+        path = self._get_path(filename)
+        try:
+            digest = content_hash(path)
+        except OSError as e:
+            print(f"Erro ao ler {filename}: {e}")
+            return filename
+        jobs.enqueue('images.process',
+                     {'directory': os.path.dirname(path), 'filename': os.path.basename(path)},
+                     key=f'images.process:{filename}:{digest}')
+        return filename
+
+    def _delete_file(self, filename):
+        super()._delete_file(filename)
+        path = self._get_path(filename)
+        remove_derivatives(os.path.dirname(path), os.path.basename(path))
+
+
 # --- Views de Admin Personalizadas ---
 
 class SecureModelView(ModelView):
@@ -43,6 +83,33 @@ class SecureModelView(ModelView):
         if not self.is_accessible():
             return redirect(url_for('login', next=request.url))
 
+class UniqueSlugMixin:
+    """
+    Se outro cadastro pegar o mesmo slug entre a alocação (on_model_change)
+    e o commit, o UNIQUE do banco falha: realoca e salva de novo.
+    """
+
+    def create_model(self, form):
+        return self._save_with_slug_retry(super().create_model, form)
+
+    def update_model(self, form, model):
+        return self._save_with_slug_retry(super().update_model, form, model)
+
+    def _save_with_slug_retry(self, save, *args):
+        for _ in range(slugs.RETRIES):
+            self._slug_conflict = False
+            result = save(*args)
+            if result or not self._slug_conflict:
+                return result
+        flash('Não foi possível gerar um slug único. Tente salvar de novo.', 'error')
+        return result
+
+    def handle_view_exception(self, exc):
+        if isinstance(exc, IntegrityError) and slugs.is_conflict(exc, self.model):
+            self._slug_conflict = True
+            return True
+        return super().handle_view_exception(exc)
+
 class SecureAdminIndexView(AdminIndexView):
     """
     Protege a página inicial do painel admin e exibe o dashboard com filtros.
@@ -90,10 +157,6 @@ class SecureAdminIndexView(AdminIndexView):
             else:
                 start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
 
-            recent_pending_orders = Order.query.filter_by(status='Pendente')\
-                                                .order_by(Order.created_at.desc())\
-                                                .limit(10).all()
-        
         except ValueError:
             flash('Formato de data inválido. Usando o padrão (últimos 30 dias).', 'warning')
             end_date = datetime.now()
@@ -104,61 +167,48 @@ class SecureAdminIndexView(AdminIndexView):
         
         # --- 3. QUERIES (DENTRO DE UM 'TRY' CORRIGIDO) ---
         try:
-            # Cria uma consulta base de pedidos dentro do período
-            base_query_pedidos = Order.query.filter(
-                Order.created_at >= start_date,
-                Order.created_at <= end_date
-            )
-            
-            total_leads = base_query_pedidos.count()
+            # Uma única leitura do resumo diário (dia x status), mantido
+            # pelos eventos de Order em rollups.py, em vez de 5 agregações
+            # sobre a tabela de pedidos inteira.
+            linhas_resumo = rollups.load_range(start_date, end_date)
 
-            vendas_concluidas_query = base_query_pedidos.filter(Order.status == 'Concluído')
-            total_vendas_concluidas = vendas_concluidas_query.count()
+            total_leads = sum(linha.count for linha in linhas_resumo)
 
-            receita_total_raw = db.session.query(func.sum(Order.total_price))\
-                                  .filter(Order.status == 'Concluído')\
-                                  .filter(Order.created_at >= start_date, Order.created_at <= end_date)\
-                                  .scalar()
-            receita_total = receita_total_raw or 0.0
+            concluidas = [linha for linha in linhas_resumo if linha.status == 'Concluído']
+            total_vendas_concluidas = sum(linha.count for linha in concluidas)
+            receita_total = sum(linha.revenue for linha in concluidas)
 
             taxa_conversao = 0.0
             if total_leads > 0:
                 taxa_conversao = (total_vendas_concluidas / total_leads) * 100
 
             # 4. DADOS PARA GRÁFICOS
-            status_data = db.session.query(Order.status, func.count(Order.id))\
-                              .filter(Order.created_at >= start_date, Order.created_at <= end_date)\
-                              .group_by(Order.status).all()
+            pedidos_por_status = {}
+            for linha in linhas_resumo:
+                pedidos_por_status[linha.status] = pedidos_por_status.get(linha.status, 0) + linha.count
             dados_status_pizza = {
-                'labels': [s[0] for s in status_data],
-                'data': [s[1] for s in status_data]
+                'labels': list(pedidos_por_status),
+                'data': list(pedidos_por_status.values())
             }
 
-            receita_por_dia_raw = db.session.query(
-                                    func.date(Order.created_at), 
-                                    func.sum(Order.total_price)
-                                 ).filter(
-                                    Order.status == 'Concluído',
-                                    Order.created_at >= start_date,
-                                    Order.created_at <= end_date
-                                 ).group_by(
-                                    func.date(Order.created_at)
-                                 ).order_by(
-                                    func.date(Order.created_at)
-                                 ).all()
-            
+            # `concluidas` já vem ordenado por dia (uma linha por dia)
             dados_receita_linha = {
-                'labels': [datetime.strptime(d[0], '%Y-%m-%d').strftime('%d/%m') for d in receita_por_dia_raw],
-                'data': [float(d[1]) for d in receita_por_dia_raw]
+                'labels': [linha.day.strftime('%d/%m') for linha in concluidas],
+                'data': [float(linha.revenue) for linha in concluidas]
             }
             
-            top_produtos = Product.query.filter(Product.cart_add_count > 0)\
-                                  .order_by(Product.cart_add_count.desc())\
-                                  .limit(5).all()
+            # Mais vendidos no período, pelos itens dos pedidos concluídos
+            # (ver order_items.py); antes era Product.cart_add_count all-time
+            top_produtos = order_items.top_products(start_date, end_date, limit=5)
             dados_produtos_carrinho = {
-                'labels': [p.name for p in top_produtos],
-                'data': [p.cart_add_count for p in top_produtos]
+                'labels': [nome for nome, quantidade, receita in top_produtos],
+                'data': [int(quantidade) for nome, quantidade, receita in top_produtos]
             }
+            receita_por_tamanho = order_items.revenue_by_size(start_date, end_date)
+            receita_por_promocao = order_items.revenue_by_promotion(start_date, end_date)
+
+            # Carrinhos convertidos/abandonados no período (ver cart_store.py)
+            metricas_carrinho = cart_store.metrics(start_date, end_date)
 
             # 5. ENVIAR DADOS PARA O TEMPLATE
             template_args.update({
@@ -171,8 +221,9 @@ class SecureAdminIndexView(AdminIndexView):
                 'dados_status_pizza': dados_status_pizza,
                 'dados_receita_linha': dados_receita_linha,
                 'dados_produtos_carrinho': dados_produtos_carrinho,
-                'recent_pending_orders': recent_pending_orders,
-                'recent_pending_orders': []
+                'receita_por_tamanho': receita_por_tamanho,
+                'receita_por_promocao': receita_por_promocao,
+                'metricas_carrinho': metricas_carrinho,
             })
 
         # --- 6. 'EXCEPT' CORRIGIDO E PAREADO ---
@@ -184,7 +235,10 @@ class SecureAdminIndexView(AdminIndexView):
                 'total_vendas_concluidas': 0, 'taxa_conversao': 0,
                 'dados_status_pizza': {'labels': [], 'data': []},
                 'dados_receita_linha': {'labels': [], 'data': []},
-                'dados_produtos_carrinho': {'labels': [], 'data': []}
+                'dados_produtos_carrinho': {'labels': [], 'data': []},
+                'receita_por_tamanho': [], 'receita_por_promocao': [],
+                'metricas_carrinho': {'abertos': 0, 'convertidos': 0, 'abandonados': 0,
+                                      'itens_abandonados': 0, 'taxa_abandono': 0.0},
             })
         
         # --- 7. RENDERIZAR NO FINAL ---
@@ -192,6 +246,64 @@ class SecureAdminIndexView(AdminIndexView):
             self._template,
             **template_args
         )
+
+    @expose('/order/quick_update', methods=['POST'])
+    def quick_update_status(self):
+        """
+        Recebe um POST dos botões 'OK' e 'X' do dashboard
+        e atualiza o status do pedido.
+        """
+        # (Só admin logado chega aqui: ver _handle_view)
+        try:
+            order_id = request.form.get('order_id')
+            new_status = request.form.get('new_status') # Será "Concluído" ou "Cancelado"
+
+            if not order_id or not new_status:
+                flash('Erro na solicitação: dados ausentes.', 'danger')
+                return redirect(url_for('admin.index'))
+
+            order = Order.query.get(order_id)
+            if order:
+                order.status = new_status
+                db.session.commit()
+                flash(f'Pedido #{order.id} atualizado para "{new_status}"!', 'success')
+            else:
+                flash(f'Pedido #{order_id} não encontrado.', 'danger')
+
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Erro ao atualizar pedido: {e}', 'danger')
+
+        # Redireciona de volta para o dashboard
+        return redirect(url_for('admin.index'))
+
+
+class PerformanceView(BaseView):
+    """p50/p95/p99 por endpoint e queries lentas (ver instrumentation.py)"""
+
+    def is_accessible(self):
+        return current_user.is_authenticated
+
+    def _handle_view(self, name, **kwargs):
+        if not self.is_accessible():
+            return redirect(url_for('login', next=request.url))
+
+    @expose('/')
+    def index(self):
+        return self.render(
+            'admin/desempenho.html',
+            endpoints=request_metrics.snapshot(),
+            slow_queries=request_metrics.slow_queries(),
+            slow_query_ms=request_metrics.slow_query_ms,
+            enabled=request_metrics.enabled,
+        )
+
+    @expose('/zerar', methods=['POST'])
+    def reset(self):
+        request_metrics.reset()
+        flash('Métricas zeradas (apenas deste processo).', 'success')
+        return redirect(url_for('.index'))
+
 class HeaderCategoryView(SecureModelView):
     form_columns = ('name', 'category', 'order')
     column_list = ('name', 'category', 'order')
@@ -204,7 +316,7 @@ class HeaderCategoryView(SecureModelView):
         }
     }   
 
-class CategoryView(SecureModelView):
+class CategoryView(UniqueSlugMixin, SecureModelView):
     form_columns = ('name', 'description', 'products')
     column_list = ('name', 'slug', 'products')
     
@@ -215,10 +327,9 @@ class CategoryView(SecureModelView):
     }
 
     def on_model_change(self, form, model, is_created):
-        model.slug = slugify(model.name)
-        check_slug = Category.query.filter_by(slug=model.slug).first()
-        if check_slug and check_slug.id != model.id:
-            model.slug = f"{model.slug}-{model.id or 'novo'}"
+        with self.session.no_autoflush:
+            model.slug = slugs.allocate_one(self.session, Category, model.name, exclude_id=model.id)
+        if model.slug != slugs.base_slug(Category, model.name):
             flash(f'O slug foi alterado para "{model.slug}" pois o original já existia.', 'warning')
         super().on_model_change(form, model, is_created)
 
@@ -230,9 +341,9 @@ class CategoryView(SecureModelView):
     
 
 
-class ProductView(SecureModelView):
+class ProductView(UniqueSlugMixin, SecureModelView):
     form_overrides = {
-        'image': ImageUploadField,
+        'image': ResponsiveImageUploadField,
         'description': CKEditorField
     }
     
@@ -267,6 +378,13 @@ class ProductView(SecureModelView):
     column_searchable_list = ('name',) 
     column_filters = ('categories', 'sections', 'active')
 
+    def _apply_search(self, query, count_query, joins, count_joins, search_text):
+        # Usa o índice FTS5 (nome, descrição e categorias) em vez de LIKE '%...%'
+        query = search.filter_matching(query, search_text)
+        if count_query is not None:
+            count_query = search.filter_matching(count_query, search_text)
+        return query, count_query, joins, count_joins
+
     inline_models = [(Variation, {
         'form_label': 'Variação',
         'form_columns': ['id', 'size', 'stock'],
@@ -274,56 +392,91 @@ class ProductView(SecureModelView):
     })]
 
     def on_model_change(self, form, model, is_created):
-        if form.slug.data:
-            model.slug = slugify(form.slug.data)
-        else:
-            model.slug = slugify(model.name)
-        query = self.model.query.filter_by(slug=model.slug)
-        if model.id:
-            query = query.filter(self.model.id != model.id)
-        check_slug = query.first()
-        if check_slug:
-            unique_suffix = model.id or 'novo' 
-            model.slug = f"{model.slug}-{unique_suffix}"
+        wanted = form.slug.data or model.name
+        with self.session.no_autoflush:
+            model.slug = slugs.allocate_one(self.session, Product, wanted, exclude_id=model.id)
+        if model.slug != slugs.base_slug(Product, wanted):
             flash(f'O slug foi alterado para "{model.slug}" pois o original já existia.', 'warning')
         super().on_model_change(form, model, is_created)
 
+    # --- Ações em massa (SQL direto sobre os selecionados, ver bulk.py) ---
+    # A ação abre uma prévia com as contagens; só o "Confirmar" grava.
+
+    @action('ativar', 'Ativar')
+    def action_activate(self, ids):
+        return self._bulk_page('ativar', ids)
+
+    @action('desativar', 'Desativar')
+    def action_deactivate(self, ids):
+        return self._bulk_page('desativar', ids)
+
+    @action('preco', 'Reajustar preço (%)')
+    def action_price(self, ids):
+        return self._bulk_page('preco', ids)
+
+    @action('estoque', 'Definir estoque de um tamanho')
+    def action_stock(self, ids):
+        return self._bulk_page('estoque', ids)
+
+    @action('promocao_incluir', 'Incluir em promoção')
+    def action_promotion_add(self, ids):
+        return self._bulk_page('promocao_incluir', ids)
+
+    @action('promocao_remover', 'Retirar de promoção')
+    def action_promotion_remove(self, ids):
+        return self._bulk_page('promocao_remover', ids)
+
+    def _bulk_page(self, name, ids, submitted=False):
+        ids = sorted({int(i) for i in ids})
+        params, error = None, None
+        try:
+            params = bulk.parse_params(name, request.form)
+        except ValueError as e:
+            # Na primeira abertura (vindo da ação) o formulário ainda está vazio
+            error = str(e) if submitted else None
+        return self.render(
+            'admin/produtos_em_massa.html',
+            operation=name,
+            label=bulk.OPERATIONS[name].label,
+            fields=bulk.OPERATIONS[name].fields,
+            ids=ids,
+            form_data=request.form,
+            error=error,
+            preview=bulk.preview(name, ids, params) if params is not None else None,
+            promotions=Promotion.query.order_by(Promotion.name).all(),
+            sizes=bulk.sizes_of(ids) if name == 'estoque' else [],
+            return_url=get_redirect_target() or self.get_url('.index_view'),
+        )
+
+    @expose('/em-massa/', methods=['POST'])
+    def bulk_view(self):
+        name = request.form.get('operacao')
+        ids = request.form.getlist('rowid')
+        return_url = get_redirect_target() or self.get_url('.index_view')
+        if name not in bulk.OPERATIONS or not ids:
+            flash('Nenhum produto selecionado.', 'warning')
+            return redirect(return_url)
+        if not request.form.get('confirmar'):
+            return self._bulk_page(name, ids, submitted=True)
+        try:
+            params = bulk.parse_params(name, request.form)
+            changed = bulk.apply(name, [int(i) for i in ids], params)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return self._bulk_page(name, ids, submitted=True)
+        except Exception as ex:
+            if not self.handle_view_exception(ex):
+                flash(f'Falha na ação em massa: {ex}', 'error')
+            return redirect(return_url)
+        flash(f'{bulk.OPERATIONS[name].label}: {changed} registro(s) alterado(s).', 'success')
+        return redirect(return_url)
+
     @action('duplicate', 'Duplicar', 'Tem certeza que deseja duplicar os produtos selecionados?')
     def action_duplicate(self, ids):
         try:
-            product_query = self.model.query.filter(self.model.id.in_(ids))
-            
-            for product in product_query.all():
-                new_name = f"{product.name} (Cópia)"
-                new_slug = slugify(new_name)
-                
-                check_slug = self.model.query.filter_by(slug=new_slug).first()
-                if check_slug:
-                    new_slug = f"{new_slug}-{product.id}"
-
-                new_product = self.model(
-                    name=new_name,
-                    slug=new_slug,
-                    description=product.description,
-                    price=product.price,
-                    image=product.image,
-                    active=False 
-                )
-                new_product.categories = list(product.categories)
-                new_product.sections = list(product.sections)
-                new_vars = []
-                for var in product.variations:
-                    new_var = Variation(
-                        size=var.size,
-                        stock=var.stock
-                    )
-                    new_vars.append(new_var)
-                
-                new_product.variations = new_vars
-                self.session.add(new_product)
-            
-            self.session.commit()
-            flash(f"{len(ids)} produto(s) duplicado(s) com sucesso. Lembre-se de ativá-los após a edição.", 'success')
+            # Em lote: slugs numa consulta só e INSERT ... SELECT (ver bulk.py)
+            copies = bulk.duplicate([int(i) for i in ids])
+            flash(f"{len(copies)} produto(s) duplicado(s) com sucesso. Lembre-se de ativá-los após a edição.", 'success')
         
         except Exception as ex:
             if not self.handle_view_exception(ex):
@@ -353,8 +506,8 @@ class PromotionView(SecureModelView):
 
 class BannerView(SecureModelView):
     form_overrides = {
-        'image_url_desktop': ImageUploadField,
-        'image_url_mobile': ImageUploadField,
+        'image_url_desktop': ResponsiveImageUploadField,
+        'image_url_mobile': ResponsiveImageUploadField,
     }
     form_args = {
         'image_url_desktop': {
@@ -392,7 +545,7 @@ class FooterLinkView(SecureModelView):
 
 class CircularCategoryView(SecureModelView):
     form_overrides = {
-        'image_url': ImageUploadField
+        'image_url': ResponsiveImageUploadField
     }
     form_args = {
         'image_url': {
@@ -446,6 +599,35 @@ class ProductSectionView(SecureModelView):
         # O 'super()' deve ser chamado apenas uma vez, no final.
         super().on_model_change(form, model, is_created)
 
+class OrderItemEqual(BaseSQLAFilter):
+    """
+    Pedidos com algum item que atende ao filtro. Usa EXISTS (Order.items.any)
+    e a coluna do próprio pedido: com JOIN em order_item, um pedido com 3
+    itens iguais contava 3 vezes na listagem e na paginação.
+    """
+
+    def __init__(self, item_column, name):
+        super().__init__(Order.id, name)
+        self.item_column = item_column
+
+    def condition(self, value):
+        return self.item_column == value
+
+    def apply(self, query, value, alias=None):
+        return query.filter(Order.items.any(self.condition(value)))
+
+    def operation(self):
+        return lazy_gettext('equals')
+
+
+class OrderItemContains(OrderItemEqual):
+    def condition(self, value):
+        return self.item_column.ilike(sqla_tools.parse_like_term(value))
+
+    def operation(self):
+        return lazy_gettext('contains')
+
+
 class OrderView(SecureModelView):
     """Visualização para os Pedidos/Leads"""
     can_create = True # criar pedidos manualmente
@@ -465,7 +647,13 @@ class OrderView(SecureModelView):
     column_list = ('id', 'status','created_at', 'total_price', 'items_summary', 'whatsapp_url')
     column_default_sort = ('created_at', True) # Ordenar por mais novo
     column_searchable_list = ('items_summary',)
-    column_filters = ('created_at', 'total_price')
+    # Filtra pelos itens estruturados (order_item), não pelo texto do resumo
+    column_filters = (
+        'created_at', 'total_price',
+        OrderItemContains(OrderItem.product_name, 'Produto (item)'),
+        OrderItemEqual(OrderItem.product_name, 'Produto (item)'),
+        OrderItemEqual(OrderItem.size, 'Tamanho (item)'),
+    )
 
 class SiteStatView(SecureModelView):
     """Visualização para as Estatísticas"""
@@ -477,6 +665,54 @@ class SiteStatView(SecureModelView):
     
     column_list = ('key', 'value')
 
+class JobView(SecureModelView):
+    """Status da fila de tarefas em segundo plano (ver jobs.py)"""
+    can_create = False
+    can_edit = False
+    can_delete = True
+    can_view_details = True
+
+    column_list = ('id', 'task', 'status', 'attempts', 'max_attempts',
+                   'created_at', 'run_after', 'finished_at', 'last_error')
+    column_details_list = ('id', 'task', 'payload', 'idempotency_key', 'status', 'attempts',
+                           'max_attempts', 'created_at', 'run_after', 'started_at',
+                           'finished_at', 'last_error')
+    column_default_sort = ('id', True)
+    column_filters = ('status', 'task', 'created_at')
+    column_searchable_list = ('task', 'idempotency_key')
+    column_formatters = {
+        # Só a última linha do traceback na listagem; completo nos detalhes
+        'last_error': lambda v, c, m, p: (m.last_error or '').strip().rsplit('\n', 1)[-1][:150]
+    }
+
+    @action('retry', 'Reprocessar', 'Colocar as tarefas selecionadas de volta na fila?')
+    def action_retry(self, ids):
+        count = jobs.retry([int(i) for i in ids])
+        flash(f'{count} tarefa(s) de volta na fila.', 'success')
+
+
+class OutboxView(SecureModelView):
+    """Avisos de pedido e entrega aos canais (ver outbox.py)"""
+    can_create = False
+    can_edit = False
+    can_delete = True
+    can_view_details = True
+
+    column_list = ('id', 'event', 'status', 'attempts', 'delivered',
+                   'created_at', 'run_after', 'sent_at', 'last_error')
+    column_details_list = ('id', 'event', 'payload', 'status', 'attempts', 'delivered',
+                           'created_at', 'run_after', 'started_at', 'sent_at', 'last_error')
+    column_default_sort = ('id', True)
+    column_filters = ('status', 'event', 'created_at')
+    column_formatters = {
+        # Só o primeiro erro na listagem; todos nos detalhes
+        'last_error': lambda v, c, m, p: (m.last_error or '').strip().split('\n', 1)[0][:150]
+    }
+
+    @action('retry', 'Reenviar', 'Colocar as notificações selecionadas de volta na fila?')
+    def action_retry(self, ids):
+        count = outbox.retry([int(i) for i in ids])
+        flash(f'{count} notificação(ões) de volta na fila.', 'success')
 
 def init_admin(app):
     """Inicializa o Flask-Admin."""
@@ -510,5 +746,11 @@ def init_admin(app):
                    menu_icon_value='fa-bar-chart'))
     admin.add_view(PromotionView(Promotion, db.session, name='Promoções (Campanhas)',
                    menu_icon_value='fa-bullhorn'))
+    admin.add_view(JobView(Job, db.session, name='Tarefas (Fila)',
+                   menu_icon_value='fa-tasks'))
+    admin.add_view(OutboxView(OutboxMessage, db.session, name='Notificações (Pedidos)',
+                   menu_icon_value='fa-bell'))
+    admin.add_view(PerformanceView(name='Desempenho', endpoint='desempenho',
+                   menu_icon_value='fa-tachometer'))
     admin.add_link(MenuLink(name='Voltar ao Site', category='', url='/',
                    icon_value='fa-home'))
\ No newline at end of file
@@ -1,12 +1,32 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, make_response, jsonify
+from markupsafe import Markup
 from extensions import db, login_manager, bcrypt
-from admin import init_admin
-from flask_ckeditor import CKEditor
+from counters import counter_buffer
+from pricing import price_projection
+from migrations import migrations_cli, run_migrations
+from rollups import rollups_cli
+from jobs import jobs_cli
+from outbox import outbox_cli
+from seed import seed_command
+from catalog_io import catalog_cli
+from cache import fragment_cache, generations, layout_cache, product_generation, request_key
+import catalog
+import facets
+from cart import load_variations, resolve_cart
+from cart_store import cart_store
+import sqlite_tuning
+import images
+import search
+import stock
+from assets import static_assets
+from instrumentation import request_metrics, timed_template
+import lazy_admin
+import order_items
+import outbox
 import math
 import os
 import datetime
-from flask import send_from_directory
 from models import Order
 from sqlalchemy import not_
 from urllib.parse import quote_plus as url_escape 
@@ -20,28 +40,135 @@ if IS_PRODUCTION:
     persistent_data_path = '/var/data' 
     db_path = os.path.join(persistent_data_path, 'oba_afro.db') 
     upload_folder = os.path.join(persistent_data_path, 'uploads') 
+    # Spool compartilhado pelos workers do gunicorn (ver counters.py)
+    counter_spool_path = os.path.join(persistent_data_path, 'counters.spool')
+    cache_dir = os.path.join(persistent_data_path, 'cache')
+    cache_backend = 'filesystem'  # compartilhado entre os workers
+    outbox_log_path = os.path.join(persistent_data_path, 'pedidos.log')
+    sqlite_profile = 'tuned'  # WAL, busy_timeout etc. (ver sqlite_tuning.py)
 else: 
     db_path = os.path.join(basedir, 'oba_afro.db') 
     upload_folder = os.path.join(basedir, 'static', 'uploads')
+    counter_spool_path = None
+    cache_dir = os.path.join(basedir, 'instance', 'cache')
+    cache_backend = 'memory'
+    outbox_log_path = os.path.join(basedir, 'instance', 'pedidos.log')
+    sqlite_profile = 'default'
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
 
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
     app.config['UPLOAD_FOLDER'] = upload_folder
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', sqlite_profile)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_tuning.engine_options(app.config['SQLITE_PROFILE'])
     app.config['SECRET_KEY'] = 'uma-chave-secreta-muito-forte' 
     app.config['UPLOAD_FOLDER'] = upload_folder
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     app.config['FLASK_ADMIN_EXTRA_CSS'] = ['css/admin_custom.css']
 
-    
+    # Contadores (visitas, views, carrinho) são gravados em lote
+    app.config['COUNTER_FLUSH_INTERVAL'] = 10  # segundos
+    app.config['COUNTER_FLUSH_THRESHOLD'] = 200  # incrementos pendentes
+    app.config['COUNTER_SPOOL_PATH'] = counter_spool_path
+
+    # Gerações de cache compartilhadas entre os workers (ver cache.py)
+    app.config['CACHE_DIR'] = cache_dir
+    # Cache das páginas da loja: 'memory', 'filesystem' ou 'null' (desliga)
+    app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', cache_backend)
+    app.config['CACHE_DEFAULT_TTL'] = 300  # segundos
+
+    # Fila de tarefas em segundo plano: rode `flask jobs worker` (ver jobs.py)
+    app.config['JOBS_PROCESSES'] = int(os.environ.get('JOBS_PROCESSES', 2))
+    app.config['JOBS_POLL_INTERVAL'] = 1.0  # segundos entre buscas na fila
+    app.config['JOBS_STALE_AFTER'] = 600  # 'executando' há mais tempo = worker morreu
+
+    # Avisos de pedido novo: o checkout grava na outbox e o
+    # `flask outbox dispatch` entrega aos canais (ver outbox.py)
+    app.config['OUTBOX_SINKS'] = os.environ.get('OUTBOX_SINKS', 'log')  # webhook,email,log
+    app.config['OUTBOX_WEBHOOK_URL'] = os.environ.get('OUTBOX_WEBHOOK_URL')
+    app.config['OUTBOX_SMTP_HOST'] = os.environ.get('OUTBOX_SMTP_HOST', 'localhost')
+    app.config['OUTBOX_SMTP_PORT'] = int(os.environ.get('OUTBOX_SMTP_PORT', 1025))
+    app.config['OUTBOX_EMAIL_FROM'] = os.environ.get('OUTBOX_EMAIL_FROM', 'loja@localhost')
+    app.config['OUTBOX_EMAIL_TO'] = os.environ.get('OUTBOX_EMAIL_TO')  # separados por vírgula
+    app.config['OUTBOX_LOG_PATH'] = os.environ.get('OUTBOX_LOG_PATH', outbox_log_path)
+    app.config['OUTBOX_BATCH_SIZE'] = 50
+    app.config['OUTBOX_POLL_INTERVAL'] = 1.0  # segundos entre buscas na fila
+    app.config['OUTBOX_SINK_TIMEOUT'] = 10.0  # segundos por envio
+    app.config['OUTBOX_CONCURRENCY'] = 10  # envios simultâneos por canal
+    app.config['OUTBOX_MAX_ATTEMPTS'] = 8  # espera dobra a cada falha (até 1h)
+    app.config['OUTBOX_STALE_AFTER'] = 300  # 'enviando' há mais tempo = dispatcher morreu
+    app.config['OUTBOX_RETENTION_DAYS'] = 30  # `flask outbox purge`
+
+    # Carrinho no servidor: o cookie leva só o id (ver cart_store.py)
+    app.config['CART_TTL_DAYS'] = 7  # sem alterações por mais tempo = abandonado
+    app.config['CART_RETENTION_DAYS'] = 90  # abandonados/convertidos (métricas)
+    app.config['CART_SWEEP_INTERVAL'] = 3600  # segundos entre varreduras automáticas
+
+    # Checkout reserva o estoque; pedido pendente devolve após este prazo
+    # com `flask stock release-expired` (ver stock.py)
+    app.config['STOCK_RESERVATION_HOURS'] = 48
+
+    # Arquivos estáticos: asset_url() com hash no nome (ver assets.py)
+    app.config['ASSETS_PRECOMPRESSED'] = True  # usa arquivo.br/.gz se existirem
+    app.config['UPLOAD_MAX_AGE'] = 0  # uploads revalidam sempre (ETag -> 304)
+
+    # Métricas por requisição: Server-Timing, admin "Desempenho" e /metrics
+    # (ver instrumentation.py)
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+    app.config['METRICS_SLOW_QUERY_MS'] = float(os.environ.get('METRICS_SLOW_QUERY_MS', 100))
+    app.config['METRICS_BUFFER_SIZE'] = 1000  # amostras guardadas por endpoint
+    app.config['METRICS_ENDPOINT'] = os.environ.get('METRICS_ENDPOINT', '0') == '1'
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')  # Bearer para o /metrics
+
+    # Admin montado só na primeira requisição a /admin (ver lazy_admin.py);
+    # ADMIN_LAZY=0 monta tudo aqui, como antes
+    app.config['ADMIN_LAZY'] = os.environ.get('ADMIN_LAZY', '1') == '1'
+
+    # Paginação das listagens de produtos (?por_pagina=)
+    app.config['CATALOG_PAGE_SIZE'] = catalog.DEFAULT_PAGE_SIZE
+    app.config['CATALOG_PAGE_SIZES'] = catalog.PAGE_SIZES
+
+    # Sobrescritas para scripts/benchmarks: create_app({'SQLALCHEMY_DATABASE_URI': ...})
+    if config:
+        app.config.update(config)
+        if 'SQLITE_PROFILE' in config and 'SQLALCHEMY_ENGINE_OPTIONS' not in config:
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_tuning.engine_options(config['SQLITE_PROFILE'])
 
     db.init_app(app)
+    sqlite_tuning.init_app(app, db)
+    request_metrics.init_app(app)
     login_manager.init_app(app)
     bcrypt.init_app(app)
-    CKEditor(app)
-    init_admin(app) 
+    counter_buffer.init_app(app)
+    price_projection.init_app(app)
+    generations.init_app(app)
+    fragment_cache.init_app(app)
+    images.init_app(app)
+    static_assets.init_app(app)
+    search.init_app(app)
+    stock.init_app(app)
+    cart_store.init_app(app)
+    if app.config['ADMIN_LAZY']:
+        lazy_admin.init_app(app)
+    else:
+        from flask_ckeditor import CKEditor
+        from admin import init_admin
+        CKEditor(app)
+        init_admin(app)
+
+    # Cria tabelas novas (ex: product_price) e aplica as migrações pendentes
+    # (índices/colunas em tabelas que já existem). Ver migrations.py
+    app.cli.add_command(migrations_cli)
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(catalog_cli)
+    with app.app_context():
+        db.create_all()
+        run_migrations()
 
     from models import (HeaderCategory, CircularCategory, Banner, Product, 
                         ProductSection, TextSection, Variation,
@@ -57,173 +184,211 @@ def create_app():
         return User.query.get(int(user_id))
 
 
-    @app.route('/admin/order/quick_update', methods=['POST'])
-    def quick_update_status():
-        """
-        Recebe um POST dos botões 'OK' e 'X' do dashboard
-        e atualiza o status do pedido.
-        """
-        # Proteção: só admin logado pode fazer isso
-        if not current_user.is_authenticated:
-            return redirect(url_for('login'))
-            
-        try:
-            order_id = request.form.get('order_id')
-            new_status = request.form.get('new_status') # Será "Concluído" ou "Cancelado"
-
-            if not order_id or not new_status:
-                flash('Erro na solicitação: dados ausentes.', 'danger')
-                return redirect(url_for('admin.index'))
-
-            order = Order.query.get(order_id)
-            if order:
-                order.status = new_status
-                db.session.commit()
-                flash(f'Pedido #{order.id} atualizado para "{new_status}"!', 'success')
-            else:
-                flash(f'Pedido #{order.id} não encontrado.', 'danger')
-        
-        except Exception as e:
-            db.session.rollback()
-            flash(f'Erro ao atualizar pedido: {e}', 'danger')
-
-        # Redireciona de volta para o dashboard
-        return redirect(url_for('admin.index'))
-    
     @app.context_processor
     def inject_global_data():
-        header_categories = HeaderCategory.query.order_by(HeaderCategory.order).all()
+        # Header/footer vêm do cache (zero queries até um admin salvar algo)
+        layout = layout_cache.get()
         
-        cart = session.get('cart', {})
-        cart_item_count = sum(cart.values()) 
-        
-        all_categories = Category.query.order_by(Category.name).all()
+        # Sem cookie de carrinho não há query (ver cart_store.py)
+        cart_item_count = cart_store.item_count()
         
         return {
             'now': datetime.datetime.now(),
-            'header_categories': header_categories,
+            'header_categories': layout['header_categories'],
+            'footer_columns': layout['footer_columns'],
             'math': math,
             'cart_item_count': cart_item_count,
-            'all_categories': all_categories, 
+            'all_categories': layout['all_categories'], 
             'current_user': current_user
         }
-    def get_stat(key):
-        """Busca ou cria uma estatística e retorna o objeto."""
-        stat = SiteStat.query.filter_by(key=key).first()
-        if not stat:
-            stat = SiteStat(key=key, value=0)
-            db.session.add(stat)
-            # Tenta salvar imediatamente
-            try:
-                db.session.commit()
-            except:
-                db.session.rollback()
-                stat = SiteStat.query.filter_by(key=key).first()
-        return stat
-    
+
     # --- Rotas da Loja ---
 
+    def render_content_block(template_name, **context):
+        """Renderiza só o bloco `content` do template (a parte cacheável)."""
+        template = app.jinja_env.get_or_select_template(template_name)
+        app.update_template_context(context)
+        with timed_template():
+            return ''.join(template.blocks['content'](template.new_context(context)))
+
+    def render_cached_page(fragment, **context):
+        """Monta a página completa (header/footer por request) em volta do fragmento."""
+        return render_template('pagina_cacheada.html', conteudo=Markup(fragment), **context)
+
+    # Parâmetros que as listagens leem (ordem, tamanho, cursor, facetas)
+    LISTING_ARGS = ('ordem', 'por_pagina', 'depois', 'antes') + facets.ARG_NAMES
+
+    def page_key(*allowed):
+        """Chave do cache de fragmentos: caminho + só os parâmetros da rota."""
+        return request_key(request.path, request.args, allowed)
+
     @app.route('/')
     def index():
-        try:
-            stat = get_stat('total_visitas')
-            stat.value += 1
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            print(f"Erro ao contar visita: {e}")
-        circular_categories_1 = CircularCategory.query.filter_by(section=1).order_by(CircularCategory.order).all()
-        banners = Banner.query.order_by(Banner.order).all()
-        product_sections = ProductSection.query.all()
-        circular_categories_2 = CircularCategory.query.filter_by(section=2).order_by(CircularCategory.order).all()
-        about_section = TextSection.query.filter_by(key='sobre-nos').first()
-        return render_template(
-            'index.html',
-            circular_categories_1=circular_categories_1,
-            banners=banners,
-            product_sections=product_sections,
-            circular_categories_2=circular_categories_2,
-            about_section=about_section
+        # Não grava na hora: o buffer junta as visitas e faz um UPDATE em lote
+        counter_buffer.incr_stat('total_visitas')
+
+        def build():
+            circular_categories_1 = catalog.home_circular_categories(section=1)
+            banners = catalog.home_banners()
+            product_sections = catalog.home_sections()
+            circular_categories_2 = catalog.home_circular_categories(section=2)
+            about_section = layout_cache.get()['about_section']
+            return {'html': render_content_block(
+                'index.html',
+                circular_categories_1=circular_categories_1,
+                banners=banners,
+                product_sections=product_sections,
+                circular_categories_2=circular_categories_2,
+                about_section=about_section
+            )}
+
+        page = fragment_cache.get_or_set(page_key(), ('home', 'catalog', 'layout'), build)
+        return render_cached_page(page['html'])
+
+    def render_listing(template, make_listing):
+        """
+        Renderiza uma listagem paginada por keyset (?depois=/?antes=).
+        `make_listing()` retorna (query, contexto extra) e só roda se a
+        página não estiver no cache.
+        """
+        ordem = request.args.get('ordem')
+        if ordem not in catalog.SORT_OPTIONS:
+            ordem = None
+        per_page = catalog.parse_page_size(
+            request.args.get('por_pagina'),
+            allowed=app.config['CATALOG_PAGE_SIZES'],
+            default=app.config['CATALOG_PAGE_SIZE']
         )
 
+        def build():
+            query, context = make_listing()
+            # Filtros facetados (?tamanho=, ?categoria=, ?preco=, ?promocao=, ?estoque=)
+            selection = facets.FacetSelection.from_args(request.args)
+            facet_data = facets.facet_counts(
+                query.whereclause, selection, current_category=context.get('category')
+            )
+            query = selection.apply(query)
+            page = catalog.keyset_paginate(
+                query, ordem=ordem,
+                after=request.args.get('depois'),
+                before=request.args.get('antes'),
+                per_page=per_page
+            )
+            # Links de navegação mantêm os filtros atuais e trocam só o cursor
+            args = {k: v for k, v in request.args.to_dict(flat=False).items() if k not in ('depois', 'antes')}
+            args.update(request.view_args or {})
+            next_url = url_for(request.endpoint, depois=page.next_cursor, **args) if page.has_next else None
+            prev_url = url_for(request.endpoint, antes=page.prev_cursor, **args) if page.has_prev else None
+            # Base dos links das facetas: filtros atuais, sem cursor
+            filter_url = url_for(request.endpoint, **(request.view_args or {}))
+            html = render_content_block(
+                template, produtos=page.items, page=page,
+                next_url=next_url, prev_url=prev_url,
+                facets=facet_data, selection=selection, filter_url=filter_url,
+                ordem=ordem, per_page=per_page, **context
+            )
+            return {'html': html, 'next_url': next_url, 'prev_url': prev_url}
+
+        cached = fragment_cache.get_or_set(page_key(*LISTING_ARGS), ('catalog',), build)
+        next_url, prev_url = cached['next_url'], cached['prev_url']
+
+        response = make_response(render_cached_page(
+            cached['html'], next_url=next_url, prev_url=prev_url
+        ))
+        links = []
+        if next_url:
+            links.append(f'<{next_url}>; rel="next"')
+        if prev_url:
+            links.append(f'<{prev_url}>; rel="prev"')
+        if links:
+            response.headers['Link'] = ', '.join(links)
+        return response
+
     @app.route('/produtos')
     def produtos():
-        produtos_list = Product.query.filter_by(active=True).all()
-        return render_template('produtos.html', produtos=produtos_list)
+        return render_listing(
+            'produtos.html',
+            lambda: (catalog.active_products_query(), {})
+        )
 
     @app.route('/categoria/<slug>')
     def categoria_produtos(slug):
-        category = Category.query.filter_by(slug=slug).first_or_404()
-        produtos_list = [product for product in category.products if product.active]
-        return render_template(
-            'categoria_produtos.html', 
-            produtos=produtos_list,
-            category=category
-        )
+        def make_listing():
+            category = Category.query.filter_by(slug=slug).first_or_404()
+            return catalog.category_products_query(category), {'category': category}
+        return render_listing('categoria_produtos.html', make_listing)
 
     @app.route('/produto/<slug>')
     def produto_detalhe(slug):
-        produto = Product.query.filter_by(slug=slug, active=True).first_or_404()
-        
+        def build():
+            produto = catalog.get_active_product(slug)  # 404 não entra no cache
+            return {
+                'html': render_content_block('produto_detalhe.html', produto=produto),
+                'product_id': produto.id,
+            }
+
+        page = fragment_cache.get_or_set(page_key(), ('catalog', product_generation(slug)), build)
+
         # --- RASTREAMENTO DE VISUALIZAÇÃO DE PRODUTO ---
-        try:
-            produto.view_count += 1
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            print(f"Erro ao contar view do produto: {e}")
+        counter_buffer.incr(Product, 'view_count', page['product_id'])
         # --- FIM DO RASTREAMENTO ---
 
-        return render_template(
-            'produto_detalhe.html', 
-            produto=produto
-        )
+        return render_cached_page(page['html'])
+
+    @app.route('/busca')
+    def busca():
+        termo = request.args.get('q', '').strip()[:100]
+        per_page = app.config['CATALOG_PAGE_SIZE']
+        try:
+            pagina = max(1, int(request.args.get('pagina', 1)))
+        except ValueError:
+            pagina = 1
+
+        def build():
+            # Um a mais para saber se existe próxima página
+            produtos = search.search_products(
+                termo, limit=per_page + 1, offset=(pagina - 1) * per_page,
+                options=catalog.product_card_options()
+            ) if termo else []
+            next_url = url_for('busca', q=termo, pagina=pagina + 1) if len(produtos) > per_page else None
+            prev_url = url_for('busca', q=termo, pagina=pagina - 1) if pagina > 1 else None
+            html = render_content_block(
+                'busca.html', produtos=produtos[:per_page], termo=termo,
+                next_url=next_url, prev_url=prev_url
+            )
+            return {'html': html, 'next_url': next_url, 'prev_url': prev_url}
+
+        cached = fragment_cache.get_or_set(page_key('q', 'pagina'), ('catalog',), build)
+        return render_cached_page(cached['html'], next_url=cached['next_url'], prev_url=cached['prev_url'])
+
+    @app.route('/busca/sugestoes')
+    def busca_sugestoes():
+        """Autocompletar: JSON com os produtos mais relevantes para o prefixo digitado."""
+        termo = request.args.get('q', '').strip()[:100]
+
+        def build():
+            if len(termo) < 2:
+                return []
+            return [{
+                'name': row.name,
+                'url': url_for('produto_detalhe', slug=row.slug),
+                'image': url_for('static', filename='uploads/' + row.image) if row.image else None,
+            } for row in search.suggest(termo)]
+
+        response = jsonify(fragment_cache.get_or_set(page_key('q'), ('catalog',), build))
+        response.cache_control.public = True
+        response.cache_control.max_age = 60
+        return response
 
     @app.route('/carrinho')
     def carrinho():
-        cart_session = session.get('cart', {})
-        cart_items = []
-        total_price = 0
-        
-        # Não vamos mais gerar a URL do zap aqui.
-        # Vamos gerar apenas o texto.
-        whatsapp_message_lines = ["Olá! Gostaria de fazer o seguinte pedido:\n"]
-        
-        for var_id_str, quantity in cart_session.items():
-            # ... (código para calcular cart_items e total_price) ...
-            variation = Variation.query.get(var_id_str)
-            if variation:
-                product = variation.product
-                subtotal = product.current_price * quantity
-                total_price += subtotal
-                
-                cart_items.append({
-                    'product': product,
-                    'variation': variation,
-                    'quantity': quantity,
-                    'subtotal': subtotal
-                })
-                # Adiciona ao texto da mensagem
-                whatsapp_message_lines.append(
-                    f"- {quantity}x {product.name} (Tamanho: {variation.size}) - R$ {subtotal:.2f}"
-                )
-
-        whatsapp_message_lines.append(f"\n*Total: R$ {total_price:.2f}*")
-        
-        # Salva o texto da mensagem na sessão para a próxima rota usar
-        session['whatsapp_message'] = "\n".join(whatsapp_message_lines)
+        # Todas as linhas resolvidas numa única query (ver cart.py)
+        snapshot = resolve_cart(cart_store.load())
         
         return render_template(
             'carrinho.html', 
-            cart_items=cart_items, 
-            total_price=total_price
-            # Removemos o whatsapp_url daqui
-        )
-        return render_template(
-            'carrinho.html', 
-            cart_items=cart_items, 
-            total_price=total_price,
-            whatsapp_url=whatsapp_url
+            cart_items=snapshot.template_items(), 
+            total_price=snapshot.total
         )
     
     @app.route('/checkout/criar-pedido', methods=['POST'])
@@ -232,53 +397,63 @@ def create_app():
         Esta rota é chamada quando o usuário clica em "Finalizar Pedido".
         Ela cria o "Lead" (Pedido) no banco antes de redirecionar ao WhatsApp.
         """
-        cart_session = session.get('cart', {})
-        whatsapp_message = session.get('whatsapp_message', 'Erro: Carrinho vazio.')
+        # Recalcula o preço total para segurança (o mesmo snapshot gera
+        # o total, o resumo e a mensagem do WhatsApp)
+        snapshot = resolve_cart(cart_store.load())
         
-        if not cart_session:
+        if snapshot.is_empty:
             flash('Seu carrinho está vazio.', 'warning')
             return redirect(url_for('carrinho'))
 
-        # Recalcula o preço total para segurança
-        total_price = 0
-        items_summary_list = []
-        for var_id_str, quantity in cart_session.items():
-            variation = Variation.query.get(var_id_str)
-            if variation:
-                total_price += variation.product.current_price * quantity
-                items_summary_list.append(f"{quantity}x {variation.product.name} ({variation.size})")
-
-        items_summary_text = ", ".join(items_summary_list)
-        whatsapp_url = f"https://wa.me/{WHATSAPP_NUMBER}?text={url_escape(whatsapp_message)}"
+        whatsapp_url = f"https://wa.me/{WHATSAPP_NUMBER}?text={url_escape(snapshot.whatsapp_message)}"
         
         # 1. Cria o Pedido (Lead) no banco de dados
         novo_pedido = Order(
-            total_price=total_price,
-            items_summary=items_summary_text,
+            total_price=snapshot.total,
+            items_summary=snapshot.items_summary,
             whatsapp_url=whatsapp_url
         )
         db.session.add(novo_pedido)
-        
-        # 2. Incrementa a estatística de "checkout"
-        stat = get_stat('total_checkouts_whatsapp')
-        stat.value += 1
-        
+
+        # Baixa o estoque de cada linha (UPDATE condicional) na mesma transação
+        try:
+            stock.reserve(snapshot.lines, novo_pedido)
+        except stock.InsufficientStock as e:
+            db.session.rollback()
+            line = e.line
+            cart = cart_store.load()
+            if e.available > 0:
+                cart[str(line.variation.id)] = e.available
+                flash(f'Restam apenas {e.available} unidade(s) de {line.product.name} ({line.variation.size}). '
+                      'Ajustamos seu carrinho.', 'warning')
+            else:
+                cart.pop(str(line.variation.id), None)
+                flash(f'{line.product.name} ({line.variation.size}) esgotou e foi removido do carrinho.', 'danger')
+            cart_store.save(cart)
+            return redirect(url_for('carrinho'))
+
+        # Uma linha por item (um executemany): relatórios por produto,
+        # tamanho e promoção no dashboard (ver order_items.py)
+        order_items.record(snapshot.lines, novo_pedido)
+
+        # O carrinho vira 'convertido' junto com o pedido (métricas de abandono)
+        cart_store.mark_converted(novo_pedido)
+        # Aviso para a loja: só uma linha na outbox, entregue depois pelo
+        # `flask outbox dispatch` (webhook, e-mail...). Ver outbox.py
+        outbox.publish_order_created(novo_pedido)
         db.session.commit()
+
+        # 2. Incrementa a estatística de "checkout"
+        counter_buffer.incr_stat('total_checkouts_whatsapp')
         
-        # 3. Limpa o carrinho
-        session.pop('cart', None)
-        session.pop('whatsapp_message', None)
-        session.modified = True
-        
+        # 3. O carrinho já foi finalizado acima (e o cookie é apagado)
+
         # 4. Redireciona o usuário para o WhatsApp
         flash('Seu pedido foi registrado! Estamos te redirecionando para o WhatsApp.', 'success')
         return redirect(whatsapp_url)
     
     @app.route('/carrinho/adicionar/<int:produto_id>', methods=['POST'])
     def adicionar_carrinho(produto_id):
-        if 'cart' not in session:
-            session['cart'] = {}
-        
         variation_id = request.form.get('variation_id')
         produto = Product.query.get_or_404(produto_id) # <-- Já busca o produto
 
@@ -294,23 +469,19 @@ def create_app():
             flash('Variação inválida.', 'danger')
             return redirect(url_for('produto_detalhe', slug=produto.slug))
 
+        cart = cart_store.load()
         var_id_str = str(variation_id)
-        current_in_cart = session['cart'].get(var_id_str, 0)
+        current_in_cart = cart.get(var_id_str, 0)
         total_wanted = current_in_cart + quantity
 
         if total_wanted > variacao.stock:
             flash(f'Desculpe, temos apenas {variacao.stock} unidades de {produto.name} ({variacao.size}) em estoque.', 'danger')
         else:
-            session['cart'][var_id_str] = total_wanted
-            session.modified = True 
+            cart[var_id_str] = total_wanted
+            cart_store.save(cart)
             
             # --- ADICIONADO: Rastreamento de Adição ao Carrinho ---
-            try:
-                produto.cart_add_count += 1
-                db.session.commit()
-            except Exception as e:
-                db.session.rollback()
-                print(f"Erro ao salvar contagem de carrinho: {e}")
+            counter_buffer.incr(Product, 'cart_add_count', produto.id)
             # --- FIM DA ADIÇÃO ---
             
             flash(f'{quantity}x {produto.name} ({variacao.size}) adicionado ao carrinho!', 'success')
@@ -319,32 +490,39 @@ def create_app():
 
     @app.route('/carrinho/atualizar', methods=['POST'])
     def atualizar_carrinho():
-        if 'cart' not in session:
+        cart = cart_store.load()
+        if not cart:
             return redirect(url_for('carrinho'))
+        # Estoque de todas as linhas enviadas numa única query
+        variations = load_variations(k for k in request.form.keys() if k in cart)
         for var_id_str, new_quantity_str in request.form.items():
-            if var_id_str in session['cart']:
+            if var_id_str in cart:
                 try:
                     new_quantity = int(new_quantity_str)
                     if new_quantity < 1: 
-                        session['cart'].pop(var_id_str, None)
+                        cart.pop(var_id_str, None)
+                        continue
+                    variation = variations.get(int(var_id_str))
+                    if variation is None:
+                        cart.pop(var_id_str, None)
                         continue
-                    variation = Variation.query.get(var_id_str)
                     if new_quantity > variation.stock:
                         flash(f'Estoque máximo para {variation.product.name} ({variation.size}) é {variation.stock}.', 'warning')
-                        session['cart'][var_id_str] = variation.stock
+                        cart[var_id_str] = variation.stock
                     else:
-                        session['cart'][var_id_str] = new_quantity
+                        cart[var_id_str] = new_quantity
                 except (ValueError, TypeError):
                     pass 
-        session.modified = True
+        cart_store.save(cart)
         return redirect(url_for('carrinho'))
 
     @app.route('/carrinho/remover/<int:variation_id>')
     def remover_do_carrinho(variation_id):
         var_id_str = str(variation_id)
-        if 'cart' in session and var_id_str in session['cart']:
-            session['cart'].pop(var_id_str, None)
-            session.modified = True
+        cart = cart_store.load()
+        if var_id_str in cart:
+            cart.pop(var_id_str, None)
+            cart_store.save(cart)
             flash('Item removido do carrinho.', 'success')
         return redirect(url_for('carrinho'))
 
@@ -383,7 +561,8 @@ def create_app():
     
     @app.route('/uploads/<path:filename>')
     def uploaded_file(filename): 
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        # ETag forte + 304 e cache longo para as derivadas (ver assets.py)
+        return static_assets.serve_upload(app.config['UPLOAD_FOLDER'], filename)
 
     # --- Fim da Função create_app ---
     return app
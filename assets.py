@@ -0,0 +1,240 @@
+# assets.py
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import abort, request, send_file, url_for
+from flask.cli import AppGroup
+from werkzeug.security import safe_join
+
+from images import DERIVATIVE_RE
+
+try:
+    import brotli
+except ImportError:  # .br é opcional; .gz usa só a biblioteca padrão
+    brotli = None
+
+
+# --- Arquivos Estáticos e Uploads com Cache Eficiente ---
+# `url_for('static', ...)` gerava sempre a mesma URL para o style.css: ou
+# o navegador revalidava a cada página, ou ficava com a versão velha.
+#
+# - `asset_url('css/style.css')` -> /static/css/style.3f2a9c1b7e4d.css
+#   (hash do conteúdo calculado uma vez na subida da app). URLs com hash
+#   são servidas com `Cache-Control: immutable` por 1 ano.
+# - Uploads recebem ETag forte (hash do conteúdo) e Last-Modified, e o
+#   navegador recebe 304 quando já tem a versão atual. As derivadas de
+#   imagem (images.py) já têm hash no nome e também são imutáveis.
+# - Se existir `arquivo.br`/`arquivo.gz` ao lado do original e o navegador
+#   aceitar, ele é enviado já comprimido (`flask assets compress` gera).
+
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 31536000  # 1 ano
+FINGERPRINT_RE = re.compile(r'^(?P<base>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)$' % HASH_LENGTH)
+# Extensões que vale a pena comprimir (imagens já são comprimidas)
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.ico', '.map')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprinted_name(filename, digest):
+    base, ext = os.path.splitext(filename)
+    return f'{base}.{digest[:HASH_LENGTH]}{ext}'
+
+
+class StaticAssets:
+
+    def __init__(self):
+        self.static_folder = None
+        self.uploads_subdir = 'uploads'
+        self.auto_reload = False
+        self.precompressed = True
+        self.upload_max_age = 0
+        self._manifest = {}  # 'css/style.css' -> hash
+        self._etags = {}  # caminho -> ((mtime_ns, tamanho), hash)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.auto_reload = app.config.get('ASSETS_AUTO_RELOAD', app.debug)
+        self.precompressed = app.config.get('ASSETS_PRECOMPRESSED', True)
+        self.upload_max_age = app.config.get('UPLOAD_MAX_AGE', 0)
+        self._manifest = self.build_manifest()
+
+        app.view_functions['static'] = self.serve_static
+        app.jinja_env.globals['asset_url'] = self.asset_url
+        app.extensions['static_assets'] = self
+        app.cli.add_command(assets_cli)
+
+    # --- Manifesto (hash de cada arquivo estático) ---
+
+    def _asset_files(self):
+        """Arquivos estáticos versionados (fora de uploads e dos .gz/.br)."""
+        for root, dirs, files in os.walk(self.static_folder):
+            if root == self.static_folder and self.uploads_subdir in dirs:
+                dirs.remove(self.uploads_subdir)
+            for name in files:
+                if name.endswith(('.gz', '.br')):
+                    continue
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, self.static_folder).replace(os.sep, '/'), path
+
+    def build_manifest(self):
+        manifest = {}
+        for filename, path in self._asset_files():
+            try:
+                manifest[filename] = file_hash(path)
+            except OSError as e:
+                print(f"Erro ao calcular hash de {filename}: {e}")
+        return manifest
+
+    def _digest(self, filename):
+        if not self.auto_reload:
+            return self._manifest.get(filename)
+        # Desenvolvimento: o arquivo pode ter mudado desde a subida
+        path = safe_join(self.static_folder, filename)
+        return self.content_hash(path) if path and os.path.isfile(path) else None
+
+    def asset_url(self, filename):
+        """URL com o hash do conteúdo no nome (cai no url_for normal se não souber o hash)."""
+        digest = self._digest(filename)
+        if digest is None:
+            return url_for('static', filename=filename)
+        return url_for('static', filename=fingerprinted_name(filename, digest))
+
+    # --- ETag forte (hash do conteúdo, recalculado só se o arquivo mudar) ---
+
+    def content_hash(self, path):
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._etags.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        digest = file_hash(path)
+        with self._lock:
+            self._etags[path] = (key, digest)
+        return digest
+
+    # --- Envio dos Arquivos ---
+
+    def _precompressed_sibling(self, path):
+        if not self.precompressed or not path.endswith(COMPRESSIBLE):
+            return None, None
+        for encoding, suffix in ENCODINGS:
+            if not request.accept_encodings[encoding]:
+                continue
+            sibling = path + suffix
+            try:
+                # Irmão desatualizado (original editado depois) é ignorado
+                if os.stat(sibling).st_mtime_ns >= os.stat(path).st_mtime_ns:
+                    return sibling, encoding
+            except OSError:
+                continue
+        return None, None
+
+    def send(self, path, max_age, immutable=False):
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        etag = self.content_hash(path)[:32]
+        sibling, encoding = self._precompressed_sibling(path)
+        if sibling:
+            response = send_file(sibling, mimetype=mimetype, etag=f'{etag}-{encoding}',
+                                 last_modified=os.stat(path).st_mtime, max_age=max_age)
+            response.headers['Content-Encoding'] = encoding
+        else:
+            response = send_file(path, mimetype=mimetype, etag=etag, max_age=max_age)
+        if path.endswith(COMPRESSIBLE):
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        if immutable:
+            response.cache_control.immutable = True
+        elif not max_age:
+            response.cache_control.no_cache = True  # pode guardar, mas revalida (304)
+        return response
+
+    def serve_static(self, filename):
+        """Substitui a view 'static' do Flask."""
+        path = safe_join(self.static_folder, filename)
+        if path is None:
+            abort(404)
+
+        if os.path.isfile(path):
+            name = os.path.basename(filename)
+            if DERIVATIVE_RE.match(name):
+                return self.send(path, IMMUTABLE_MAX_AGE, immutable=True)
+            if filename.startswith(self.uploads_subdir + '/'):
+                return self.send(path, self.upload_max_age)
+            return self.send(path, 0)
+
+        match = FINGERPRINT_RE.match(filename)
+        if match:
+            original = match.group('base') + match.group('ext')
+            original_path = safe_join(self.static_folder, original)
+            if original_path and os.path.isfile(original_path):
+                if (self._digest(original) or '')[:HASH_LENGTH] == match.group('hash'):
+                    return self.send(original_path, IMMUTABLE_MAX_AGE, immutable=True)
+                # Hash antigo (deploy novo): entrega o atual, mas sem cache longo
+                return self.send(original_path, 0)
+        abort(404)
+
+    def serve_upload(self, directory, filename):
+        """Usado pela rota /uploads/ (UPLOAD_FOLDER fora de static/)."""
+        path = safe_join(directory, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        if DERIVATIVE_RE.match(os.path.basename(filename)):
+            return self.send(path, IMMUTABLE_MAX_AGE, immutable=True)
+        return self.send(path, self.upload_max_age)
+
+    # --- Pré-compressão ---
+
+    def compress(self, min_size=512):
+        """Gera os irmãos .gz (e .br, se o módulo brotli existir). Retorna quantos gravou."""
+        written = 0
+        for filename, path in self._asset_files():
+            if not path.endswith(COMPRESSIBLE) or os.path.getsize(path) < min_size:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            outputs = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                outputs.append(('.br', brotli.compress(data, quality=11)))
+            for suffix, compressed in outputs:
+                tmp_path = f'{path}{suffix}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp_path, path + suffix)
+                written += 1
+        return written
+
+
+static_assets = StaticAssets()
+
+
+# --- Comando CLI: flask assets compress/manifest ---
+
+assets_cli = AppGroup('assets', help='Arquivos estáticos versionados e pré-comprimidos.')
+
+
+@assets_cli.command('compress')
+def compress_command():
+    """Gera arquivo.gz/arquivo.br ao lado dos CSS/JS (rode a cada deploy)."""
+    written = static_assets.compress()
+    extra = '' if brotli is not None else ' (instale "brotli" para gerar .br)'
+    print(f"{written} arquivo(s) comprimido(s) gravado(s){extra}.")
+
+
+@assets_cli.command('manifest')
+def manifest_command():
+    """Lista as URLs versionadas dos arquivos estáticos."""
+    for filename, digest in sorted(static_assets.build_manifest().items()):
+        print(f"  {filename} -> {fingerprinted_name(filename, digest)}")
@@ -0,0 +1,203 @@
+# benchmarks/import_time.py
+"""
+Relatório de tempo de importação e memória na subida de um worker: roda o
+create_app() num processo novo com `python -X importtime`, resume a saída
+(total, módulos mais lentos, tempo por pacote) e mede o RSS do processo
+depois de subir, depois da primeira página da loja e depois do primeiro
+/admin. Por padrão compara o admin sob demanda (ADMIN_LAZY=1) com o
+montado na subida (ADMIN_LAZY=0).
+
+Uso:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --modes lazy --top 30
+    python benchmarks/import_time.py --json benchmarks/import_time.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)  # o app, não benchmarks/search.py
+MODES = {'lazy': True, 'eager': False}
+PHASE_MARK = 'import_time: fase '
+LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$')
+
+# Fases medidas no processo filho, na ordem
+PHASES = (
+    ('subida', 'create_app()'),
+    ('loja', 'primeira requisição a /'),
+    ('admin', 'primeira requisição a /admin/'),
+)
+
+
+# --- Processo filho (roda com -X importtime) ---
+
+def rss_kib():
+    """Memória residente atual do processo (KiB)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource  # fora do Linux: o pico, não o atual
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def mark(phase):
+    sys.stderr.flush()
+    sys.stderr.write(f'{PHASE_MARK}{phase}\n')
+    sys.stderr.flush()
+
+
+def child(db_path, lazy, prepare=False):
+    tmp = os.path.dirname(db_path)
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'ADMIN_LAZY': lazy,
+        'CACHE_BACKEND': 'null',
+        'CACHE_DIR': os.path.join(tmp, 'cache'),
+        'COUNTER_SPOOL_PATH': None,
+        'UPLOAD_FOLDER': os.path.join(tmp, 'uploads'),
+    }
+    result = {'rss_inicial_kib': rss_kib()}
+
+    mark('subida')
+    started = time.perf_counter()
+    from app import create_app
+    app = create_app(config)
+    result['create_app_ms'] = (time.perf_counter() - started) * 1000
+    result['rss_subida_kib'] = rss_kib()
+    if prepare:
+        return  # só cria as tabelas e aplica as migrações
+
+    client = app.test_client()
+    for phase, path in (('loja', '/'), ('admin', '/admin/')):
+        mark(phase)
+        started = time.perf_counter()
+        status = client.get(path).status_code  # /admin/ sem login: redireciona, mas monta o admin
+        result[f'{phase}_ms'] = (time.perf_counter() - started) * 1000
+        result[f'{phase}_status'] = status
+        result[f'rss_{phase}_kib'] = rss_kib()
+    mark('fim')
+    print(json.dumps(result))
+
+
+# --- Leitura da saída do -X importtime ---
+
+def parse_importtime(text):
+    """{fase: [(módulo, self µs, cumulativo µs, profundidade)]} na ordem de importação."""
+    phases, current = {}, None
+    for line in text.splitlines():
+        if line.startswith(PHASE_MARK):
+            current = line[len(PHASE_MARK):].strip()
+            phases.setdefault(current, [])
+            continue
+        match = LINE_RE.match(line)
+        if match is None or current is None:
+            continue  # cabeçalho e imports do próprio script antes da subida
+        self_us, cumulative_us, indent, module = match.groups()
+        phases[current].append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return phases
+
+
+def summarize(entries, top):
+    """Total, mais lentos (cumulativo e próprio) e tempo por pacote, em ms."""
+    by_package = {}
+    for module, self_us, _, _ in entries:
+        package = module.split('.')[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    # O cumulativo dos imports de primeiro nível já inclui os aninhados
+    total_us = sum(cumulative for _, _, cumulative, depth in entries if depth == 0)
+    return {
+        'modulos': len(entries),
+        'total_ms': total_us / 1000,
+        'cumulativo': [(module, cumulative / 1000) for module, _, cumulative, _
+                       in sorted(entries, key=lambda e: e[2], reverse=True)[:top]],
+        'proprio': [(module, self_us / 1000) for module, self_us, _, _
+                    in sorted(entries, key=lambda e: e[1], reverse=True)[:top]],
+        'pacotes': sorted(((package, us / 1000) for package, us in by_package.items()),
+                          key=lambda item: item[1], reverse=True)[:top],
+    }
+
+
+# --- Processo pai ---
+
+def run_child(db_path, lazy, prepare=False):
+    command = [sys.executable, '-X', 'importtime', os.path.abspath(__file__),
+               '--child', db_path, '--lazy', '1' if lazy else '0']
+    if prepare:
+        command.append('--prepare')
+    proc = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f'Processo filho falhou ({proc.returncode}):\n{proc.stderr[-3000:]}')
+    if prepare:
+        return None
+    stdout = proc.stdout.strip().splitlines()
+    return json.loads(stdout[-1]), parse_importtime(proc.stderr)
+
+
+def print_report(mode, result, summaries, top):
+    print(f"\n=== ADMIN_LAZY={'1' if MODES[mode] else '0'} ({mode}) ===")
+    print(f"create_app(): {result['create_app_ms']:.0f} ms; primeira / {result['loja_ms']:.0f} ms; "
+          f"primeiro /admin/ {result['admin_ms']:.0f} ms")
+    print(f"RSS: {result['rss_subida_kib'] / 1024:.1f} MiB após subir, "
+          f"{result['rss_loja_kib'] / 1024:.1f} MiB após /, {result['rss_admin_kib'] / 1024:.1f} MiB após /admin/")
+    print(f"\n{'fase':<10} {'módulos':>8} {'import ms':>10}  descrição")
+    for phase, description in PHASES:
+        summary = summaries[phase]
+        print(f"{phase:<10} {summary['modulos']:>8} {summary['total_ms']:>10.1f}  {description}")
+
+    startup = summaries['subida']
+    for key, title in (('cumulativo', 'cumulativo'), ('proprio', 'próprio'), ('pacotes', 'por pacote')):
+        print(f"\nSubida: top {top} ({title}, ms)")
+        for name, ms in startup[key]:
+            print(f"  {ms:>8.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--top', type=int, default=15, help='Quantos módulos/pacotes listar.')
+    parser.add_argument('--json', help='Grava o resumo (JSON) para acompanhar ao longo do tempo.')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--lazy', default='1', help=argparse.SUPPRESS)
+    parser.add_argument('--prepare', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.lazy == '1', prepare=args.prepare)
+        return
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'import_time.db')
+        # Tabelas e migrações antes: a subida medida é a de um worker comum
+        run_child(db_path, True, prepare=True)
+        for mode in args.modes:
+            result, phases = run_child(db_path, MODES[mode])
+            summaries = {phase: summarize(phases.get(phase, []), args.top) for phase, _ in PHASES}
+            print_report(mode, result, summaries, args.top)
+            report[mode] = {'resultado': result, 'fases': summaries}
+
+    if len(report) == 2:
+        lazy, eager = report['lazy'], report['eager']
+        print(f"\nAdmin sob demanda: subida "
+              f"{eager['fases']['subida']['total_ms'] - lazy['fases']['subida']['total_ms']:+.0f} ms "
+              f"de import e {(eager['resultado']['rss_loja_kib'] - lazy['resultado']['rss_loja_kib']) / 1024:+.1f} "
+              f"MiB de RSS economizados por worker que só atende a loja.")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'resultados': report}, f, indent=2, ensure_ascii=False)
+        print(f"\nResumo gravado em {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/order_indexes.py
+"""
+Mostra o efeito da migração de índices (migrations.py, versão 1) nas
+queries do dashboard: EXPLAIN QUERY PLAN e tempo antes/depois, num banco
+temporário com N pedidos sintéticos.
+
+Uso:
+    python benchmarks/order_indexes.py --orders 100000
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+import models  # noqa: E402,F401  (registra as tabelas no metadata)
+from extensions import db  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+
+STATUSES = ('Pendente', 'Concluído', 'Cancelado')
+
+# Mesmas queries que SecureAdminIndexView.index executa (últimos 30 dias)
+QUERIES = {
+    'leads no período': (
+        'SELECT count(*) FROM "order" WHERE created_at >= :start AND created_at <= :end'
+    ),
+    'vendas concluídas': (
+        'SELECT count(*) FROM "order" WHERE created_at >= :start AND created_at <= :end '
+        'AND status = \'Concluído\''
+    ),
+    'receita total': (
+        'SELECT sum(total_price) FROM "order" WHERE status = \'Concluído\' '
+        'AND created_at >= :start AND created_at <= :end'
+    ),
+    'pedidos por status': (
+        'SELECT status, count(id) FROM "order" WHERE created_at >= :start AND created_at <= :end '
+        'GROUP BY status'
+    ),
+    'receita por dia': (
+        'SELECT date(created_at), sum(total_price) FROM "order" WHERE status = \'Concluído\' '
+        'AND created_at >= :start AND created_at <= :end '
+        'GROUP BY date(created_at) ORDER BY date(created_at)'
+    ),
+    'pendentes recentes': (
+        'SELECT * FROM "order" WHERE status = \'Pendente\' ORDER BY created_at DESC LIMIT 10'
+    ),
+}
+
+MIGRATION_INDEXES = (
+    'ix_order_status_created_at', 'ix_order_created_at', 'ix_product_active_name_id',
+    'ix_circular_category_section_order', 'ix_banner_order', 'ix_header_category_order',
+    'ix_variation_product_id', 'ix_product_category_association_category_id',
+    'ix_promotion_product_association_product_id',
+)
+
+
+def build_database(path, n_orders, days):
+    """Cria o schema "antigo" (sem os índices) e insere os pedidos."""
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        for name in MIGRATION_INDEXES:
+            conn.execute(f'DROP INDEX IF EXISTS {name}')
+
+        rng = random.Random(42)
+        now = datetime.datetime.now()
+        rows = []
+        for i in range(n_orders):
+            created = now - datetime.timedelta(seconds=rng.randint(0, days * 86400))
+            rows.append((
+                created.strftime('%Y-%m-%d %H:%M:%S.%f'),
+                round(rng.uniform(30, 600), 2),
+                f'{rng.randint(1, 4)}x Produto {rng.randint(1, 500)} (M)',
+                rng.choices(STATUSES, weights=(2, 6, 2))[0],
+            ))
+        conn.executemany(
+            'INSERT INTO "order" (created_at, total_price, items_summary, status) VALUES (?, ?, ?, ?)',
+            rows
+        )
+        conn.execute('PRAGMA user_version = 0')
+        conn.commit()
+    finally:
+        raw.close()
+    return engine
+
+
+def measure(engine, repeat):
+    end = datetime.datetime.now()
+    params = {
+        'start': (end - datetime.timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S'),
+        'end': end.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    results = {}
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        for name, sql in QUERIES.items():
+            plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+            best = float('inf')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                conn.execute(sql, params).fetchall()
+                best = min(best, time.perf_counter() - started)
+            results[name] = (plan, best * 1000)
+    finally:
+        raw.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--days', type=int, default=365, help='Período coberto pelos pedidos')
+    parser.add_argument('--repeat', type=int, default=5, help='Execuções por query (vale a melhor)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Gerando {args.orders} pedidos em {args.days} dias...")
+        engine = build_database(os.path.join(tmp, 'bench.db'), args.orders, args.days)
+
+        before = measure(engine, args.repeat)
+        run_migrations(engine)
+        after = measure(engine, args.repeat)
+        engine.dispose()
+
+    total_before = total_after = 0.0
+    for name in QUERIES:
+        plan_before, ms_before = before[name]
+        plan_after, ms_after = after[name]
+        total_before += ms_before
+        total_after += ms_after
+        print(f"\n== {name}: {ms_before:.2f} ms -> {ms_after:.2f} ms")
+        print("   antes:  " + ' | '.join(plan_before))
+        print("   depois: " + ' | '.join(plan_after))
+    print(f"\nTotal do dashboard: {total_before:.2f} ms -> {total_after:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/search.py
+"""
+Latência da busca de produtos (search.py, FTS5 + BM25) num catálogo
+sintético, comparada com o LIKE '%...%' que o admin usava.
+
+Uso:
+    python benchmarks/search.py --products 50000 --repeat 50
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+import models  # noqa: E402,F401  (registra as tabelas no metadata)
+import search  # noqa: E402
+from extensions import db  # noqa: E402
+
+PIECES = ('Vestido', 'Saia', 'Turbante', 'Camisa', 'Calça', 'Bata', 'Kimono', 'Conjunto',
+          'Macacão', 'Blusa', 'Bolsa', 'Colar', 'Brinco', 'Túnica', 'Short')
+STYLES = ('Ankara', 'Kente', 'Bogolan', 'Estampado', 'Longo', 'Curto', 'Midi', 'Étnico',
+          'Tradicional', 'Básico', 'Festa', 'Algodão', 'Linho', 'Ajustável')
+COLORS = ('Amarelo', 'Laranja', 'Vermelho', 'Azul', 'Verde', 'Preto', 'Branco', 'Marrom',
+          'Dourado', 'Estampa Búzios')
+CATEGORIES = ('Feminino', 'Masculino', 'Infantil', 'Acessórios', 'Promoções', 'Lançamentos',
+              'Plus Size', 'Moda Praia')
+WORDS = ('tecido', 'confortável', 'africano', 'costura', 'artesanal', 'caimento', 'elegante',
+         'ocasião', 'verão', 'inverno', 'padronagem', 'cores', 'vibrantes', 'tradição', 'cultura')
+
+# (descrição, texto digitado)
+QUERIES = (
+    ('palavra comum', 'vestido'),
+    ('duas palavras', 'saia ankara'),
+    ('sem acento', 'calca linho'),
+    ('autocompletar', 'turb'),
+    ('categoria + peça', 'infantil bata'),
+    ('raro', 'macacao buzios'),
+)
+
+
+def build_database(path, n_products):
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    rng = random.Random(7)
+    conn = sqlite3.connect(path)
+    conn.executemany('INSERT INTO category (id, name, slug) VALUES (?, ?, ?)',
+                     [(i + 1, name, f'cat-{i}') for i, name in enumerate(CATEGORIES)])
+    products, links = [], []
+    for i in range(1, n_products + 1):
+        name = f'{rng.choice(PIECES)} {rng.choice(STYLES)} {rng.choice(COLORS)} {i}'
+        description = '<p>' + ' '.join(rng.choice(WORDS) for _ in range(30)) + '</p>'
+        products.append((i, name, description, rng.uniform(30, 400), f'produto-{i}', 1))
+        for category_id in rng.sample(range(1, len(CATEGORIES) + 1), 2):
+            links.append((i, category_id))
+    conn.executemany('INSERT INTO product (id, name, description, price, slug, active) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', products)
+    conn.executemany('INSERT INTO product_category_association (product_id, category_id) '
+                     'VALUES (?, ?)', links)
+
+    started = time.perf_counter()
+    search.create_index(conn)
+    indexed = search.reindex(conn)
+    conn.commit()
+    print(f"Índice FTS5 com {indexed} produtos construído em {time.perf_counter() - started:.1f}s\n")
+    return conn
+
+
+def timed(conn, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = conn.execute(sql, params).fetchall()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return len(rows), timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=24)
+    args = parser.parse_args()
+
+    weights = ', '.join(str(w) for w in search.BM25_WEIGHTS)
+    fts_sql = (f'SELECT rowid FROM product_search WHERE product_search MATCH ? AND active = 1 '
+               f'ORDER BY bm25(product_search, {weights}), rowid LIMIT {args.limit}')
+    like_sql = f'SELECT id FROM product WHERE active = 1 AND {{where}} ORDER BY name LIMIT {args.limit}'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = build_database(os.path.join(tmp, 'search.db'), args.products)
+        print(f"{'consulta':<18} {'texto':<16} {'FTS p50':>9} {'FTS p95':>9} {'LIKE p50':>9} {'LIKE p95':>9}  resultados")
+        for label, text in QUERIES:
+            _, fts_p50, fts_p95 = timed(conn, fts_sql, (search.match_expression(text),), args.repeat)
+            terms = text.split()
+            where = ' AND '.join('name LIKE ?' for _ in terms)
+            like_rows, like_p50, like_p95 = timed(
+                conn, like_sql.format(where=where), [f'%{t}%' for t in terms], args.repeat
+            )
+            total = conn.execute('SELECT count(*) FROM product_search WHERE product_search MATCH ?',
+                                 (search.match_expression(text),)).fetchone()[0]
+            print(f"{label:<18} {text:<16} {fts_p50:>8.2f}ms {fts_p95:>8.2f}ms "
+                  f"{like_p50:>8.2f}ms {like_p95:>8.2f}ms  {total} (LIKE: {like_rows})")
+        conn.close()
+    print("\nLIKE só olha o nome e não ignora acentos ('calca' não acha 'Calça').")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+# benchmarks/sqlite_load.py
+"""
+Teste de carga do SQLite com tráfego misto de leitura/escrita, simulando
+vários workers do gunicorn. Compara os perfis de sqlite_tuning.py.
+
+Uso:
+    python benchmarks/sqlite_load.py --workers 4 --seconds 10 --write-ratio 0.2
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+import models  # noqa: E402,F401  (registra as tabelas no metadata)
+import sqlite_tuning  # noqa: E402
+from extensions import db  # noqa: E402
+
+# Leitura parecida com a listagem de produtos (produto + estoque)
+READ_SQL = text(
+    'SELECT p.id, p.name, p.price, sum(v.stock) FROM product p '
+    'JOIN variation v ON v.product_id = p.id '
+    'WHERE p.active = 1 AND p.name >= :name '
+    'GROUP BY p.id ORDER BY p.name, p.id LIMIT 24'
+)
+# Escritas: contador de views (como o counters.py) e um pedido novo
+WRITE_VIEW_SQL = text('UPDATE product SET view_count = coalesce(view_count, 0) + 1 WHERE id = :id')
+WRITE_ORDER_SQL = text(
+    'INSERT INTO "order" (created_at, total_price, items_summary, status) '
+    'VALUES (CURRENT_TIMESTAMP, :total, :summary, \'Pendente\')'
+)
+
+
+def make_engine(path, profile):
+    engine = create_engine(f'sqlite:///{path}', **sqlite_tuning.engine_options(profile))
+    sqlite_tuning.register_pragmas(engine, profile)
+    return engine
+
+
+def seed(path, profile, n_products):
+    engine = make_engine(path, profile)
+    db.metadata.create_all(engine)
+    rng = random.Random(1)
+    with engine.begin() as conn:
+        conn.execute(
+            text('INSERT INTO product (id, name, price, slug, active, view_count, cart_add_count) '
+                 'VALUES (:id, :name, :price, :slug, 1, 0, 0)'),
+            [{'id': i, 'name': f'Produto {i:05d}', 'price': rng.uniform(30, 400), 'slug': f'produto-{i}'}
+             for i in range(1, n_products + 1)]
+        )
+        conn.execute(
+            text('INSERT INTO variation (size, stock, product_id) VALUES (:size, :stock, :product_id)'),
+            [{'size': size, 'stock': rng.randint(0, 10), 'product_id': i}
+             for i in range(1, n_products + 1) for size in ('P', 'M', 'G')]
+        )
+    engine.dispose()
+
+
+def worker(path, profile, seconds, write_ratio, n_products, seed_value, queue):
+    engine = make_engine(path, profile)
+    rng = random.Random(seed_value)
+    stats = {'reads': 0, 'writes': 0, 'locked': 0, 'latencies': []}
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if rng.random() < write_ratio:
+                with engine.begin() as conn:
+                    if rng.random() < 0.7:
+                        conn.execute(WRITE_VIEW_SQL, {'id': rng.randint(1, n_products)})
+                    else:
+                        conn.execute(WRITE_ORDER_SQL, {'total': rng.uniform(30, 600), 'summary': '1x Produto (M)'})
+                stats['writes'] += 1
+            else:
+                with engine.connect() as conn:
+                    conn.execute(READ_SQL, {'name': f'Produto {rng.randint(1, n_products):05d}'}).fetchall()
+                stats['reads'] += 1
+        except OperationalError as e:
+            if 'locked' in str(e) or 'busy' in str(e):
+                stats['locked'] += 1
+                continue
+            raise
+        stats['latencies'].append(time.perf_counter() - started)
+    engine.dispose()
+    queue.put(stats)
+
+
+def run_profile(profile, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f'load_{profile}.db')
+        seed(path, profile, args.products)
+
+        queue = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(
+                path, profile, args.seconds, args.write_ratio, args.products, i, queue
+            ))
+            for i in range(args.workers)
+        ]
+        for p in processes:
+            p.start()
+        results = [queue.get() for _ in processes]
+        for p in processes:
+            p.join()
+
+    latencies = sorted(lat for r in results for lat in r['latencies'])
+
+    def pct(p):
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    reads = sum(r['reads'] for r in results)
+    writes = sum(r['writes'] for r in results)
+    return {
+        'ops_per_s': (reads + writes) / args.seconds,
+        'reads': reads,
+        'writes': writes,
+        'locked': sum(r['locked'] for r in results),
+        'p50': pct(0.50),
+        'p95': pct(0.95),
+        'p99': pct(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--profiles', nargs='+', default=list(sqlite_tuning.PROFILES))
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, {args.seconds}s, {args.write_ratio:.0%} escritas, "
+          f"{args.products} produtos\n")
+    print(f"{'perfil':<10} {'ops/s':>9} {'leituras':>9} {'escritas':>9} {'locked':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for profile in args.profiles:
+        r = run_profile(profile, args)
+        print(f"{profile:<10} {r['ops_per_s']:>9.0f} {r['reads']:>9} {r['writes']:>9} {r['locked']:>7} "
+              f"{r['p50']:>8.2f} {r['p95']:>8.2f} {r['p99']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+# benchmarks/storefront.py
+"""
+Benchmark das páginas da loja e do admin pelo test client do Flask, num
+banco sintético (seed.py). Mede latência, queries e memória alocada por
+operação e compara com uma linha de base salva antes.
+
+Uso:
+    python benchmarks/storefront.py --products 5000 --repeat 30
+    python benchmarks/storefront.py --save benchmarks/baseline.json
+    python benchmarks/storefront.py --compare benchmarks/baseline.json --tolerance 0.25
+
+Com --compare, sai com código 1 se algum cenário regrediu (mais queries,
+ou latência/memória acima da tolerância), para rodar no CI ou antes de
+um deploy.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app  # noqa: E402
+from catalog import count_queries  # noqa: E402
+from counters import counter_buffer  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Category, Product, User, Variation  # noqa: E402
+from seed import seed_database  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+ADMIN_EMAIL = 'benchmark@oba.local'
+ADMIN_PASSWORD = 'benchmark'
+# Diferenças de latência abaixo disso são ruído (ms)
+LATENCY_NOISE_MS = 1.0
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+# --- Preparação ---
+
+def build_app(tmp, args):
+    db_path = args.db or os.path.join(tmp, 'storefront.db')
+    existing = os.path.exists(db_path)
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'SQLITE_PROFILE': args.profile,
+        'CACHE_BACKEND': args.cache,
+        'CACHE_DIR': os.path.join(tmp, 'cache'),
+        'COUNTER_SPOOL_PATH': None,
+        'UPLOAD_FOLDER': os.path.join(tmp, 'uploads'),
+        'METRICS_SLOW_QUERY_MS': 10 ** 9,  # sem log de queries lentas no meio da medição
+    })
+    with app.app_context():
+        if not existing or db.session.query(Product.id).first() is None:
+            started = time.perf_counter()
+            counts = seed_database(products=args.products, orders=args.orders, seed=args.seed)
+            print(f"Banco sintético: {', '.join(f'{v} {k}' for k, v in counts.items())} "
+                  f"({time.perf_counter() - started:.1f}s)")
+        if User.query.filter_by(email=ADMIN_EMAIL).first() is None:
+            user = User(email=ADMIN_EMAIL)
+            user.set_password(ADMIN_PASSWORD)
+            db.session.add(user)
+            db.session.commit()
+    return app
+
+
+def pick_fixtures(app):
+    """Categoria mais cheia, um produto ativo com estoque e uma variação dele."""
+    with app.app_context():
+        category = db.session.query(Category)\
+            .join(Category.products).group_by(Category.id)\
+            .order_by(db.func.count().desc()).first()
+        variation = db.session.query(Variation).join(Product)\
+            .filter(Product.active == True, Variation.stock > 0)\
+            .order_by(Product.id).first()
+        # Estoque "infinito" para o cenário de checkout não esgotar
+        variation.stock = 10 ** 6
+        db.session.commit()
+        return {
+            'category_slug': category.slug,
+            'product_id': variation.product_id,
+            'product_slug': variation.product.slug,
+            'variation_id': variation.id,
+        }
+
+
+# --- Cenários (cada um é uma "operação" medida) ---
+
+def expect(response, *codes):
+    if response.status_code not in (codes or (200,)):
+        raise RuntimeError(f'{response.request.path}: HTTP {response.status_code}')
+    return response
+
+
+def scenarios(fx):
+    def add_to_cart(client):
+        expect(client.post(f"/carrinho/adicionar/{fx['product_id']}",
+                           data={'variation_id': fx['variation_id']}), 302)
+
+    def cart_flow(client):
+        add_to_cart(client)
+        expect(client.get('/carrinho'))
+        expect(client.post('/carrinho/atualizar', data={str(fx['variation_id']): '1'}), 302)
+
+    def checkout(client):
+        add_to_cart(client)
+        expect(client.post('/checkout/criar-pedido'), 302)
+
+    return (
+        # (nome, precisa de login, operação)
+        ('index', False, lambda c: expect(c.get('/'))),
+        ('produtos', False, lambda c: expect(c.get('/produtos'))),
+        ('produtos_filtros', False, lambda c: expect(c.get('/produtos?tamanho=M&estoque=1&ordem=menor-preco'))),
+        ('categoria_produtos', False, lambda c: expect(c.get(f"/categoria/{fx['category_slug']}"))),
+        ('produto_detalhe', False, lambda c: expect(c.get(f"/produto/{fx['product_slug']}"))),
+        ('busca', False, lambda c: expect(c.get('/busca?q=vestido ankara'))),
+        ('carrinho', False, cart_flow),
+        ('criar_pedido', False, checkout),
+        ('admin_dashboard', True, lambda c: expect(c.get('/admin/'))),
+    )
+
+
+def run_scenario(app, needs_login, operation, args):
+    # Na classe Engine: conta também as queries do admin, que com
+    # ADMIN_LAZY tem o seu próprio engine (ver lazy_admin.py)
+    engine = Engine
+    client = app.test_client()
+    if needs_login:
+        expect(client.post('/login', data={'email': ADMIN_EMAIL, 'senha': ADMIN_PASSWORD}), 302)
+    for _ in range(args.warmup):
+        operation(client)
+
+    timings, queries = [], []
+    for _ in range(args.repeat):
+        with count_queries(engine) as counter:
+            started = time.perf_counter()
+            operation(client)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+
+    # Memória numa rodada separada (o tracemalloc deixa tudo mais lento)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        operation(client)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': percentile(timings, 50),
+        'p95_ms': percentile(timings, 95),
+        'mean_ms': sum(timings) / len(timings),
+        'queries': max(queries),
+        'peak_kib': peak / 1024,
+    }
+
+
+# --- Linha de base ---
+
+def compare(results, baseline, tolerance):
+    """Lista de regressões (texto) em relação à linha de base."""
+    problems = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            problems.append(f"{name}: {result['queries']} queries (base {base['queries']})")
+        for key, label in (('p50_ms', 'p50'), ('p95_ms', 'p95')):
+            limit = base[key] * (1 + tolerance)
+            if result[key] > limit and result[key] - base[key] > LATENCY_NOISE_MS:
+                problems.append(f"{name}: {label} {result[key]:.2f}ms (base {base[key]:.2f}ms)")
+        if result['peak_kib'] > base['peak_kib'] * (1 + tolerance):
+            problems.append(f"{name}: memória {result['peak_kib']:.0f}KiB (base {base['peak_kib']:.0f}KiB)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--cache', default='null', choices=('null', 'memory', 'filesystem'),
+                        help='Cache de páginas (null mede o trabalho completo de cada request).')
+    parser.add_argument('--profile', default='default', help='Perfil do sqlite_tuning.py.')
+    parser.add_argument('--db', help='Reaproveita (ou cria) este banco em vez de um temporário.')
+    parser.add_argument('--only', nargs='+', help='Rodar só estes cenários.')
+    parser.add_argument('--save', help='Grava os resultados como linha de base (JSON).')
+    parser.add_argument('--compare', help='Compara com a linha de base (JSON).')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Piora relativa aceita em latência/memória (0.25 = 25%%).')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(tmp, args)
+        fixtures = pick_fixtures(app)
+        results = {}
+        print(f"\n{'cenário':<20} {'p50 ms':>8} {'p95 ms':>8} {'média':>8} {'queries':>8} {'pico KiB':>9}")
+        for name, needs_login, operation in scenarios(fixtures):
+            if args.only and name not in args.only:
+                continue
+            r = results[name] = run_scenario(app, needs_login, operation, args)
+            print(f"{name:<20} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['mean_ms']:>8.2f} "
+                  f"{r['queries']:>8} {r['peak_kib']:>9.0f}")
+        # Grava os contadores pendentes antes de o banco temporário sumir
+        counter_buffer.flush()
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'meta': {
+                    'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                    'python': platform.python_version(),
+                    'machine': platform.machine(),
+                    'products': args.products,
+                    'orders': args.orders,
+                    'cache': args.cache,
+                    'repeat': args.repeat,
+                },
+                'results': results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\nLinha de base gravada em {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        meta = baseline.get('meta', {})
+        if (meta.get('products'), meta.get('cache')) != (args.products, args.cache):
+            print(f"\nAtenção: linha de base com {meta.get('products')} produtos e cache "
+                  f"{meta.get('cache')!r}; comparação pode não fazer sentido.")
+        problems = compare(results, baseline.get('results', {}), args.tolerance)
+        if problems:
+            print(f"\n{len(problems)} regressão(ões) em relação a {args.compare}:")
+            for problem in problems:
+                print(f"  - {problem}")
+            sys.exit(1)
+        print(f"\nSem regressões em relação a {args.compare}.")
+
+
+if __name__ == '__main__':
+    main()
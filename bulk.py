@@ -0,0 +1,291 @@
+# bulk.py
+from collections import namedtuple
+
+from sqlalchemy import case, delete, distinct, func, insert, literal, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+import slugs
+from extensions import db
+from models import Product, Promotion, Variation, promotion_product_association
+
+
+# --- Ações em Massa sobre Produtos (admin) ---
+# "Ativar estes 80 produtos", "reajustar 5%", "zerar o tamanho M",
+# "colocar na promoção de 20%": cada operação é um único UPDATE /
+# INSERT ... SELECT / DELETE sobre os ids selecionados, em vez de um
+# formulário por produto.
+#
+# Antes de gravar, o admin vê uma prévia com as contagens (calculadas por
+# uma consulta de agregação com os mesmos filtros). Escritas em SQL direto
+# não passam pelos eventos da sessão, então `apply()` atualiza de uma vez
+# o que depende delas: índice de busca (coluna active), preço efetivo
+# (pricing.py) e as gerações de cache da loja. O resumo de estoque do
+# produto é mantido pelos triggers (stock.py).
+#
+# `duplicate()` segue a mesma ideia: as cópias, suas variações, categorias
+# e seções são gravadas com um punhado de statements, qualquer que seja o
+# número de produtos (o ORM faria um INSERT por produto e por variação).
+
+# refresh: o que recalcular depois ('search', 'prices')
+Operation = namedtuple('Operation', 'label fields preview apply refresh')
+
+
+def _selected(ids):
+    return Product.id.in_(ids)
+
+
+def _count_selected(ids):
+    return db.session.execute(select(func.count()).select_from(Product).where(_selected(ids))).scalar()
+
+
+# --- Parâmetros (vindos do formulário da prévia) ---
+
+def _percent(form):
+    try:
+        percent = float(form.get('percentual', '').replace(',', '.'))
+    except ValueError:
+        raise ValueError('Informe o percentual (ex: 5 ou -10).')
+    if percent == 0 or percent <= -100:
+        raise ValueError('O percentual precisa ser diferente de 0 e maior que -100.')
+    return percent
+
+
+def _promotion_id(form):
+    try:
+        promotion_id = int(form.get('promocao', ''))
+    except ValueError:
+        raise ValueError('Escolha a promoção.')
+    if db.session.get(Promotion, promotion_id) is None:
+        raise ValueError('Promoção não encontrada.')
+    return promotion_id
+
+
+def parse_params(name, form):
+    """Parâmetros da operação `name` a partir do formulário (ValueError se inválidos)."""
+    if name == 'preco':
+        return {'percent': _percent(form)}
+    if name == 'estoque':
+        size = form.get('tamanho', '').strip()
+        if not size:
+            raise ValueError('Escolha o tamanho.')
+        try:
+            stock = int(form.get('estoque', ''))
+        except ValueError:
+            raise ValueError('Informe o estoque (número inteiro).')
+        if stock < 0:
+            raise ValueError('O estoque não pode ser negativo.')
+        return {'size': size, 'stock': stock}
+    if name in ('promocao_incluir', 'promocao_remover'):
+        return {'promotion_id': _promotion_id(form)}
+    return {}
+
+
+# --- Ativar/desativar ---
+
+def _preview_active(ids, active):
+    total, already = db.session.execute(
+        select(func.count(), func.coalesce(func.sum(case((Product.active == active, 1), else_=0)), 0))
+        .where(_selected(ids))
+    ).one()
+    verb = 'ativados' if active else 'desativados'
+    return [f'{total} produto(s) selecionado(s)',
+            f'{already} já estão {verb}; {total - already} serão {verb}']
+
+
+def _apply_active(conn, ids, active):
+    return conn.execute(
+        update(Product).where(_selected(ids), Product.active != active).values(active=active)
+    ).rowcount
+
+
+# --- Reajuste de preço ---
+
+def _new_price(percent):
+    return func.round(Product.price * (1 + percent / 100.0), 2)
+
+
+def _preview_price(ids, percent):
+    new_price = _new_price(percent)
+    row = db.session.execute(
+        select(func.count(), func.min(Product.price), func.max(Product.price),
+               func.min(new_price), func.max(new_price),
+               func.avg(Product.price), func.avg(new_price))
+        .where(_selected(ids))
+    ).one()
+    count, old_min, old_max, new_min, new_max, old_avg, new_avg = row
+    if not count:
+        return ['Nenhum produto selecionado']
+    return [f'{count} produto(s) com preço reajustado em {percent:+g}%',
+            f'Faixa: R$ {old_min:.2f}–{old_max:.2f} → R$ {new_min:.2f}–{new_max:.2f}',
+            f'Preço médio: R$ {old_avg:.2f} → R$ {new_avg:.2f}']
+
+
+def _apply_price(conn, ids, percent):
+    return conn.execute(
+        update(Product).where(_selected(ids)).values(price=_new_price(percent))
+    ).rowcount
+
+
+# --- Estoque de um tamanho ---
+
+def sizes_of(ids):
+    """Tamanhos existentes entre os produtos selecionados (para o formulário)."""
+    return db.session.execute(
+        select(distinct(Variation.size)).where(Variation.product_id.in_(ids)).order_by(Variation.size)
+    ).scalars().all()
+
+
+def _preview_stock(ids, size, stock):
+    variations, products, current = db.session.execute(
+        select(func.count(Variation.id), func.count(distinct(Variation.product_id)),
+               func.coalesce(func.sum(Variation.stock), 0))
+        .where(Variation.product_id.in_(ids), Variation.size == size)
+    ).one()
+    lines = [f'{variations} variação(ões) do tamanho {size} em {products} produto(s)',
+             f'Estoque total do tamanho: {current} → {stock * variations}']
+    missing = _count_selected(ids) - products
+    if missing:
+        lines.append(f'{missing} produto(s) selecionado(s) não têm o tamanho {size} (ficam como estão)')
+    return lines
+
+
+def _apply_stock(conn, ids, size, stock):
+    return conn.execute(
+        update(Variation).where(Variation.product_id.in_(ids), Variation.size == size).values(stock=stock)
+    ).rowcount
+
+
+# --- Promoções ---
+
+def _members(ids, promotion_id):
+    table = promotion_product_association
+    return db.session.execute(
+        select(func.count()).select_from(table)
+        .where(table.c.promotion_id == promotion_id, table.c.product_id.in_(ids))
+    ).scalar()
+
+
+def _preview_promotion_add(ids, promotion_id):
+    total, members = _count_selected(ids), _members(ids, promotion_id)
+    promotion = db.session.get(Promotion, promotion_id)
+    return [f'{total} produto(s) selecionado(s)',
+            f'{members} já estão em "{promotion}"; {total - members} serão incluídos']
+
+
+def _preview_promotion_remove(ids, promotion_id):
+    members = _members(ids, promotion_id)
+    promotion = db.session.get(Promotion, promotion_id)
+    return [f'{members} produto(s) selecionado(s) estão em "{promotion}" e serão retirados']
+
+
+def _apply_promotion_add(conn, ids, promotion_id):
+    table = promotion_product_association
+    stmt = sqlite_insert(table).from_select(
+        ['promotion_id', 'product_id'],
+        select(literal(promotion_id), Product.id).where(_selected(ids))
+    ).on_conflict_do_nothing()
+    return conn.execute(stmt).rowcount
+
+
+def _apply_promotion_remove(conn, ids, promotion_id):
+    table = promotion_product_association
+    return conn.execute(
+        delete(table).where(table.c.promotion_id == promotion_id, table.c.product_id.in_(ids))
+    ).rowcount
+
+
+OPERATIONS = {
+    'ativar': Operation('Ativar', (), lambda ids: _preview_active(ids, True),
+                        lambda conn, ids: _apply_active(conn, ids, True), ('search',)),
+    'desativar': Operation('Desativar', (), lambda ids: _preview_active(ids, False),
+                           lambda conn, ids: _apply_active(conn, ids, False), ('search',)),
+    'preco': Operation('Reajustar preço', ('percentual',), _preview_price, _apply_price, ('prices',)),
+    'estoque': Operation('Definir estoque de um tamanho', ('tamanho', 'estoque'),
+                         _preview_stock, _apply_stock, ()),
+    'promocao_incluir': Operation('Incluir em promoção', ('promocao',),
+                                  _preview_promotion_add, _apply_promotion_add, ('prices',)),
+    'promocao_remover': Operation('Retirar de promoção', ('promocao',),
+                                  _preview_promotion_remove, _apply_promotion_remove, ('prices',)),
+}
+
+
+def preview(name, ids, params):
+    return OPERATIONS[name].preview(ids, **params)
+
+
+def apply(name, ids, params):
+    """Executa a operação numa transação e invalida os dependentes uma vez."""
+    import search
+
+    operation = OPERATIONS[name]
+    with db.engine.begin() as conn:
+        changed = operation.apply(conn, ids, **params)
+        if 'search' in operation.refresh:
+            search.reindex(conn.connection.driver_connection, ids)
+    _after_write(ids, prices='prices' in operation.refresh)
+    return changed
+
+
+def _after_write(ids, prices):
+    from cache import generations
+    from pricing import refresh_prices
+
+    if prices:
+        refresh_prices(ids)
+    generations.bump('home', 'catalog')
+
+
+# --- Duplicar ---
+
+# Copia as linhas filhas do produto :old para o :new (executemany)
+_COPY_CHILDREN = (
+    'INSERT INTO variation (size, stock, product_id) '
+    'SELECT size, stock, :new FROM variation WHERE product_id = :old ORDER BY id',
+    'INSERT INTO product_category_association (product_id, category_id) '
+    'SELECT :new, category_id FROM product_category_association WHERE product_id = :old',
+    'INSERT INTO product_section_association (product_id, section_id) '
+    'SELECT :new, section_id FROM product_section_association WHERE product_id = :old',
+)
+
+
+def duplicate(ids):
+    """
+    Cria uma cópia inativa de cada produto (nome + " (Cópia)", slug novo),
+    com variações, categorias e seções. Retorna os ids das cópias.
+    """
+    import search
+
+    product = Product.__table__
+    for attempt in range(slugs.RETRIES):
+        try:
+            with db.engine.begin() as conn:
+                originals = conn.execute(
+                    select(product.c.id, product.c.name, product.c.description,
+                           product.c.price, product.c.image)
+                    .where(product.c.id.in_(ids)).order_by(product.c.id)
+                ).all()
+                if not originals:
+                    return []
+                names = [f'{row.name} (Cópia)' for row in originals]
+                new_slugs = slugs.allocate(conn, Product, names)
+                conn.execute(insert(product), [
+                    {'name': name, 'slug': slug, 'description': row.description, 'price': row.price,
+                     'image': row.image, 'active': False, 'cart_add_count': 0, 'view_count': 0}
+                    for row, name, slug in zip(originals, names, new_slugs)
+                ])
+                new_ids = dict(conn.execute(
+                    select(product.c.slug, product.c.id).where(product.c.slug.in_(new_slugs))
+                ).all())
+                pairs = [{'old': row.id, 'new': new_ids[slug]} for row, slug in zip(originals, new_slugs)]
+                for sql in _COPY_CHILDREN:
+                    conn.execute(text(sql), pairs)
+                copies = [pair['new'] for pair in pairs]
+                search.reindex(conn.connection.driver_connection, copies)
+            break
+        except IntegrityError as e:
+            # Outro cadastro pegou um dos slugs entre a consulta e o commit
+            if not slugs.is_conflict(e, Product) or attempt == slugs.RETRIES - 1:
+                raise
+    _after_write(copies, prices=True)
+    return copies
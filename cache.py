@@ -0,0 +1,371 @@
+# cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+
+try:
+    import fcntl
+except ImportError:  # Windows (ambiente de desenvolvimento)
+    fcntl = None
+
+
+# --- Gerações de Cache (compartilhadas entre workers) ---
+# Cada "geração" é um contador guardado num arquivo em CACHE_DIR. Quando
+# um admin salva um modelo observado, o contador sobe (after_commit) e
+# todos os workers percebem na próxima checagem, que custa só um
+# `os.stat` (nenhuma query). Quem guarda dados em cache anota a geração
+# com que os montou e remonta quando ela muda.
+
+# Nome do modelo -> gerações invalidadas quando ele muda
+WATCHED_MODELS = {}
+
+
+def watch(generation, *model_names):
+    """Registra que salvar qualquer um desses modelos invalida `generation`."""
+    for name in model_names:
+        WATCHED_MODELS.setdefault(name, set()).add(generation)
+
+
+class Generations:
+
+    def __init__(self):
+        self.directory = None
+        self._seen = {}  # nome -> (mtime_ns, versão)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.directory = app.config['CACHE_DIR']
+        os.makedirs(self.directory, exist_ok=True)
+        app.extensions['cache_generations'] = self
+
+        for name, fn in (('after_flush', _collect_changes),
+                         ('after_commit', _bump_changes),
+                         ('after_rollback', _discard_changes)):
+            if not event.contains(db.session, name, fn):
+                event.listen(db.session, name, fn)
+
+    def _path(self, name):
+        return os.path.join(self.directory, f'{name}.gen')
+
+    def current(self, name):
+        """Versão atual da geração (0 se nunca foi invalidada)."""
+        if self.directory is None:
+            return 0
+        path = self._path(name)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+        seen = self._seen.get(name)
+        if seen and seen[0] == mtime:
+            return seen[1]
+        try:
+            with open(path, 'r', encoding='ascii') as f:
+                version = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            version = 0
+        self._seen[name] = (mtime, version)
+        return version
+
+    def snapshot(self, *names):
+        return tuple(self.current(name) for name in names)
+
+    def bump(self, *names):
+        """Incrementa as gerações (com lock entre processos)."""
+        if self.directory is None:
+            return
+        for name in names:
+            path = self._path(name)
+            with self._lock, open(path + '.lock', 'w') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._seen.pop(name, None)
+                    version = self.current(name) + 1
+                    tmp_path = f'{path}.{os.getpid()}.tmp'
+                    with open(tmp_path, 'w', encoding='ascii') as f:
+                        f.write(str(version))
+                    # os.replace é atômico: ninguém lê o arquivo pela metade
+                    os.replace(tmp_path, path)
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+generations = Generations()
+
+
+def product_generation(slug):
+    """
+    Geração de um produto só: a página de detalhe mostra o estoque de cada
+    tamanho e é invalidada a cada reserva dele (ver stock.py), sem derrubar
+    o resto do catálogo. O slug vem da URL, por isso vira um hash (nome de
+    arquivo seguro).
+    """
+    return 'product-' + hashlib.sha1(slug.encode('utf-8')).hexdigest()[:16]
+
+
+def _collect_changes(session, flush_context):
+    names = session.info.setdefault('cache_bump', set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        names.update(WATCHED_MODELS.get(type(obj).__name__, ()))
+
+
+def _bump_changes(session):
+    names = session.info.pop('cache_bump', None)
+    if names:
+        try:
+            generations.bump(*sorted(names))
+        except OSError as e:
+            print(f"Erro ao invalidar cache: {e}")
+
+
+def _discard_changes(session):
+    session.info.pop('cache_bump', None)
+
+
+# --- Cache dos Dados de Layout (header, footer, "sobre nós") ---
+# O context processor rodava 2 queries em TODA renderização (carrinho,
+# login, páginas de erro...). Agora os dados ficam em memória como
+# objetos simples (sem sessão do SQLAlchemy) até a geração 'layout' mudar.
+
+watch('layout', 'HeaderCategory', 'Category', 'FooterLink', 'TextSection')
+
+
+def _build_layout():
+    from models import Category, FooterLink, HeaderCategory, TextSection
+
+    def category_data(category):
+        if category is None:
+            return None
+        return SimpleNamespace(id=category.id, name=category.name, slug=category.slug)
+
+    header_categories = [
+        SimpleNamespace(id=h.id, name=h.name, category=category_data(h.category))
+        for h in HeaderCategory.query.options(joinedload(HeaderCategory.category))
+                                     .order_by(HeaderCategory.order).all()
+    ]
+    all_categories = [category_data(c) for c in Category.query.order_by(Category.name).all()]
+
+    footer_columns = {}
+    for link in FooterLink.query.order_by(FooterLink.column, FooterLink.order).all():
+        footer_columns.setdefault(link.column, []).append(
+            SimpleNamespace(title=link.title, url=link.url)
+        )
+
+    about = TextSection.query.filter_by(key='sobre-nos').first()
+    about_section = SimpleNamespace(title=about.title, content=about.content) if about else None
+
+    return {
+        'header_categories': header_categories,
+        'all_categories': all_categories,
+        'footer_columns': sorted(footer_columns.items()),
+        'about_section': about_section,
+    }
+
+
+class LayoutCache:
+
+    def __init__(self):
+        self._version = None
+        self._data = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = generations.current('layout')
+        if self._data is None or self._version != version:
+            with self._lock:
+                if self._data is None or self._version != version:
+                    self._data = _build_layout()
+                    self._version = version
+        return self._data
+
+
+layout_cache = LayoutCache()
+
+
+# --- Cache de Fragmentos/Páginas da Loja ---
+# Guarda o HTML do bloco `content` da home, do detalhe do produto e das
+# listagens. A chave inclui o caminho e as gerações dos modelos que a
+# página usa: quando um admin salva algo, a geração sobe e a chave antiga
+# simplesmente deixa de ser usada (e expira pelo TTL/LRU).
+# Header, footer, contador do carrinho e mensagens flash ficam FORA do
+# fragmento e são renderizados a cada request.
+
+watch('home', 'Banner', 'CircularCategory', 'ProductSection', 'TextSection')
+watch('catalog', 'Product', 'Variation', 'Category', 'Promotion')
+
+
+class NullCache:
+    """Backend que não guarda nada (CACHE_BACKEND = 'null')."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryCache:
+    """LRU em memória com TTL. Cada worker tem o seu."""
+
+    def __init__(self, max_entries=512, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileSystemCache:
+    """Um arquivo JSON por chave num diretório compartilhado pelos workers."""
+
+    PRUNE_EVERY = 200  # gravações entre limpezas de arquivos expirados
+
+    def __init__(self, directory, default_ttl=300):
+        self.directory = directory
+        self.default_ttl = default_ttl
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('key') != key or entry.get('expires_at', 0) < time.time():
+            return None
+        return entry.get('value')
+
+    def set(self, key, value, ttl=None):
+        path = self._path(key)
+        entry = {'key': key, 'expires_at': time.time() + (ttl or self.default_ttl), 'value': value}
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Erro ao gravar cache: {e}")
+            return
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """Apaga os arquivos expirados (ou de gerações antigas, que expiram igual)."""
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    expired = json.load(f).get('expires_at', 0) < now
+                if expired:
+                    os.remove(path)
+            except (OSError, ValueError):
+                continue
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+class FragmentCache:
+
+    def __init__(self):
+        self.backend = NullCache()
+        self.enabled = False
+
+    def init_app(self, app):
+        kind = app.config.get('CACHE_BACKEND', 'memory')
+        ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+        if kind == 'filesystem':
+            directory = os.path.join(app.config['CACHE_DIR'], 'fragments')
+            self.backend = FileSystemCache(directory, default_ttl=ttl)
+        elif kind == 'memory':
+            self.backend = MemoryCache(app.config.get('CACHE_MAX_ENTRIES', 512), default_ttl=ttl)
+        else:
+            self.backend = NullCache()
+        self.enabled = kind in ('filesystem', 'memory')
+        app.extensions['fragment_cache'] = self
+
+    def get_or_set(self, key, generation_names, producer, ttl=None):
+        """
+        Retorna o valor em cache para `key` nas gerações atuais ou chama
+        `producer()` (que deve retornar algo serializável em JSON) e guarda.
+        Com `key` None (ver `request_key`), só chama o producer.
+        """
+        if not self.enabled or key is None:
+            return producer()
+        versions = '/'.join(f'{name}:{generations.current(name)}' for name in generation_names)
+        full_key = f'{key}|{versions}'
+        value = self.backend.get(full_key)
+        if value is None:
+            value = producer()
+            self.backend.set(full_key, value, ttl)
+        return value
+
+
+def request_key(path, args, allowed=()):
+    """
+    Chave de cache de uma página: o caminho e só os parâmetros que a rota
+    lê (`allowed`), em ordem de nome. Com qualquer outro parâmetro (?x=1,
+    ?x=2, ...) retorna None e a página sai sem cache: lixo na URL não cria
+    entradas novas.
+    """
+    if any(name not in allowed for name in args):
+        return None
+    items = [(name, value) for name, values in sorted(args.lists()) for value in values]
+    return f'{path}?{urlencode(items)}' if items else path
+
+
+fragment_cache = FragmentCache()
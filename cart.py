@@ -0,0 +1,117 @@
+# cart.py
+from dataclasses import dataclass, field
+
+from sqlalchemy.orm import joinedload
+
+from models import Product, Variation
+
+
+# --- Serviço do Carrinho ---
+# `carrinho()` e `criar_pedido()` faziam Variation.query.get() por item,
+# depois variation.product e product.current_price (~3 queries por linha).
+# Aqui todas as linhas são resolvidas de uma vez: um SELECT ... IN (...)
+# com produto e preço efetivo já carregados.
+
+@dataclass
+class CartLine:
+    variation: Variation
+    product: Product
+    quantity: int
+    unit_price: float
+    promotion_id: int = None  # promoção aplicada no unit_price
+
+    @property
+    def subtotal(self):
+        return self.unit_price * self.quantity
+
+    @property
+    def summary(self):
+        """Formato usado em Order.items_summary: '2x Vestido (M)'."""
+        return f"{self.quantity}x {self.product.name} ({self.variation.size})"
+
+    @property
+    def whatsapp_line(self):
+        return f"- {self.quantity}x {self.product.name} (Tamanho: {self.variation.size}) - R$ {self.subtotal:.2f}"
+
+
+@dataclass
+class CartSnapshot:
+    lines: list = field(default_factory=list)
+    # IDs que estavam na sessão mas não existem mais no banco
+    missing_ids: list = field(default_factory=list)
+
+    @property
+    def total(self):
+        return sum(line.subtotal for line in self.lines)
+
+    @property
+    def item_count(self):
+        return sum(line.quantity for line in self.lines)
+
+    @property
+    def is_empty(self):
+        return not self.lines
+
+    @property
+    def items_summary(self):
+        return ", ".join(line.summary for line in self.lines)
+
+    @property
+    def whatsapp_message(self):
+        message_lines = ["Olá! Gostaria de fazer o seguinte pedido:\n"]
+        message_lines.extend(line.whatsapp_line for line in self.lines)
+        message_lines.append(f"\n*Total: R$ {self.total:.2f}*")
+        return "\n".join(message_lines)
+
+    def template_items(self):
+        """Itens no formato que o carrinho.html já espera."""
+        return [{
+            'product': line.product,
+            'variation': line.variation,
+            'quantity': line.quantity,
+            'subtotal': line.subtotal,
+        } for line in self.lines]
+
+
+def _parse_ids(var_ids):
+    ids = []
+    for var_id in var_ids:
+        try:
+            ids.append(int(var_id))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def load_variations(var_ids):
+    """Variações (com produto e preço efetivo) por id, numa única query."""
+    ids = _parse_ids(var_ids)
+    if not ids:
+        return {}
+    variations = Variation.query.filter(Variation.id.in_(ids)).options(
+        joinedload(Variation.product).selectinload(Product.effective_price)
+    ).all()
+    return {variation.id: variation for variation in variations}
+
+
+def resolve_cart(cart_session):
+    """Monta o CartSnapshot a partir do dicionário {variation_id: quantidade}."""
+    variations = load_variations(cart_session.keys())
+    snapshot = CartSnapshot()
+    for var_id_str, quantity in cart_session.items():
+        try:
+            variation = variations.get(int(var_id_str))
+        except (TypeError, ValueError):
+            variation = None
+        if variation is None:
+            snapshot.missing_ids.append(var_id_str)
+            continue
+        product = variation.product
+        snapshot.lines.append(CartLine(
+            variation=variation,
+            product=product,
+            quantity=quantity,
+            unit_price=product.current_price,
+            promotion_id=product.active_promotion_id,
+        ))
+    return snapshot
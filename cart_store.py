@@ -0,0 +1,233 @@
+# cart_store.py
+import datetime
+import json
+import re
+import secrets
+import threading
+import time
+
+from flask import g, request, session
+from flask.cli import AppGroup
+from sqlalchemy import and_, delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from models import Cart
+
+
+# --- Carrinho no Servidor ---
+# O carrinho ficava na sessão do Flask (cookie assinado): cada alteração
+# reserializava e reassinava o cookie, que ia e voltava em toda requisição.
+# Agora os itens ficam na tabela `cart` e o cookie `carrinho` leva só um
+# id aleatório (22 caracteres).
+#
+# - Leitura: 1 SELECT por requisição (guardado em `g`), e nenhuma se o
+#   visitante não tem carrinho.
+# - Validade: CART_TTL_DAYS desde a última alteração (renovada a cada
+#   gravação, junto com o cookie).
+# - Varredura: carrinhos vencidos com itens viram 'abandonado', vazios são
+#   apagados, e os já contabilizados somem após CART_RETENTION_DAYS. Roda
+#   sozinha a cada CART_SWEEP_INTERVAL segundos (em quem gravar um
+#   carrinho) ou com `flask cart sweep`.
+
+OPEN = 'aberto'
+CONVERTED = 'convertido'
+ABANDONED = 'abandonado'
+
+COOKIE_NAME = 'carrinho'
+_ID_RE = re.compile(r'^[A-Za-z0-9_-]{16,32}$')
+
+
+def _count(items):
+    return sum(items.values())
+
+
+class CartStore:
+
+    def __init__(self):
+        self.ttl = datetime.timedelta(days=7)
+        self.retention = datetime.timedelta(days=90)
+        self.sweep_interval = 3600.0
+        self._last_sweep = time.monotonic()
+        self._sweep_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = datetime.timedelta(days=app.config.get('CART_TTL_DAYS', 7))
+        self.retention = datetime.timedelta(days=app.config.get('CART_RETENTION_DAYS', 90))
+        self.sweep_interval = float(app.config.get('CART_SWEEP_INTERVAL', 3600))
+        app.after_request(self._set_cookie)
+        app.extensions['cart_store'] = self
+        app.cli.add_command(cart_cli)
+
+    # --- Carrinho da requisição atual ---
+
+    def _cookie_id(self):
+        cart_id = request.cookies.get(COOKIE_NAME)
+        return cart_id if cart_id and _ID_RE.match(cart_id) else None
+
+    def _state(self):
+        """(id, itens) do visitante, lidos uma vez por requisição."""
+        if 'cart_state' not in g:
+            cart_id, items = self._cookie_id(), {}
+            if cart_id:
+                row = db.session.execute(
+                    select(Cart.items).where(
+                        Cart.id == cart_id, Cart.status == OPEN,
+                        Cart.expires_at > datetime.datetime.now()
+                    )
+                ).first()
+                if row is None:
+                    cart_id = None  # vencido ou já finalizado: começa outro
+                else:
+                    items = json.loads(row.items or '{}')
+            g.cart_state = (cart_id, items)
+            # Carrinho antigo, ainda no cookie de sessão: migra para a tabela
+            legacy = session.pop('cart', None) if 'cart' in session else None
+            if legacy:
+                for var_id, quantity in legacy.items():
+                    items[str(var_id)] = items.get(str(var_id), 0) + quantity
+                self.save(items)
+        return g.cart_state
+
+    def load(self):
+        """Cópia dos itens {variation_id (str): quantidade}."""
+        return dict(self._state()[1])
+
+    def item_count(self):
+        return _count(self._state()[1])
+
+    def save(self, items):
+        """Grava os itens do visitante (cria o carrinho na primeira vez)."""
+        cart_id = self._state()[0] or secrets.token_urlsafe(16)
+        items = {str(k): int(v) for k, v in items.items() if int(v) > 0}
+        now = datetime.datetime.now()
+        values = {
+            'items': json.dumps(items, separators=(',', ':')),
+            'item_count': _count(items),
+            'updated_at': now,
+            'expires_at': now + self.ttl,
+        }
+        stmt = sqlite_insert(Cart.__table__).values(id=cart_id, status=OPEN, created_at=now, **values)
+        stmt = stmt.on_conflict_do_update(index_elements=['id'], set_=values)
+        with db.engine.begin() as conn:
+            conn.execute(stmt)
+        g.cart_state = (cart_id, items)
+        g.cart_cookie = cart_id
+        self._maybe_sweep()
+
+    def clear(self):
+        self.save({})
+
+    def mark_converted(self, order, session=None):
+        """
+        Marca o carrinho como convertido no pedido `order`, na mesma
+        transação (chame antes do commit do pedido).
+        """
+        cart_id = self._state()[0]
+        if cart_id is None:
+            return
+        (session or db.session).execute(
+            update(Cart).where(Cart.id == cart_id).values(
+                status=CONVERTED, order_id=order.id, updated_at=datetime.datetime.now()
+            )
+        )
+        g.cart_state = (None, {})
+        g.cart_cookie = ''  # apaga o cookie
+
+    def _set_cookie(self, response):
+        cart_id = g.get('cart_cookie')
+        if cart_id is None:
+            return response
+        if cart_id:
+            response.set_cookie(COOKIE_NAME, cart_id, max_age=int(self.ttl.total_seconds()),
+                                httponly=True, samesite='Lax', secure=request.is_secure)
+        else:
+            response.delete_cookie(COOKIE_NAME)
+        return response
+
+    # --- Varredura (TTL) ---
+
+    def _maybe_sweep(self):
+        if time.monotonic() - self._last_sweep < self.sweep_interval:
+            return
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = time.monotonic()
+            self.sweep()
+        except Exception as e:
+            print(f"Erro na varredura de carrinhos: {e}")
+        finally:
+            self._sweep_lock.release()
+
+    def sweep(self, now=None):
+        """Retorna (abandonados, vazios apagados, antigos apagados)."""
+        now = now or datetime.datetime.now()
+        expired = and_(Cart.status == OPEN, Cart.expires_at <= now)
+        with db.engine.begin() as conn:
+            abandoned = conn.execute(
+                update(Cart).where(expired, Cart.item_count > 0)
+                .values(status=ABANDONED, updated_at=Cart.expires_at)
+            ).rowcount
+            empty = conn.execute(delete(Cart).where(expired)).rowcount
+            old = conn.execute(
+                delete(Cart).where(Cart.status != OPEN, Cart.updated_at < now - self.retention)
+            ).rowcount
+        return abandoned, empty, old
+
+    # --- Métricas ---
+
+    def metrics(self, start, end):
+        """
+        Carrinhos convertidos/abandonados no período (pela data em que
+        viraram pedido ou venceram) e carrinhos abertos agora.
+        """
+        rows = db.session.execute(
+            select(Cart.status, func.count(), func.coalesce(func.sum(Cart.item_count), 0))
+            .where(Cart.updated_at >= start, Cart.updated_at <= end,
+                   Cart.status.in_((CONVERTED, ABANDONED)))
+            .group_by(Cart.status)
+        ).all()
+        by_status = {status: (count, items) for status, count, items in rows}
+        open_carts = db.session.execute(
+            select(func.count()).select_from(Cart).where(
+                Cart.status == OPEN, Cart.item_count > 0,
+                Cart.expires_at > datetime.datetime.now()
+            )
+        ).scalar()
+        converted = by_status.get(CONVERTED, (0, 0))[0]
+        abandoned, abandoned_items = by_status.get(ABANDONED, (0, 0))
+        finished = converted + abandoned
+        return {
+            'abertos': open_carts,
+            'convertidos': converted,
+            'abandonados': abandoned,
+            'itens_abandonados': abandoned_items,
+            'taxa_abandono': (abandoned / finished * 100) if finished else 0.0,
+        }
+
+
+cart_store = CartStore()
+
+
+# --- Comandos CLI: flask cart sweep/stats ---
+
+cart_cli = AppGroup('cart', help='Carrinhos guardados no servidor.')
+
+
+@cart_cli.command('sweep')
+def sweep_command():
+    """Marca os carrinhos vencidos como abandonados e apaga os antigos."""
+    abandoned, empty, old = cart_store.sweep()
+    print(f"{abandoned} abandonado(s), {empty} vazio(s) e {old} antigo(s) removido(s).")
+
+
+@cart_cli.command('stats')
+def stats_command():
+    """Carrinhos abertos e convertidos/abandonados nos últimos 30 dias."""
+    end = datetime.datetime.now()
+    metrics = cart_store.metrics(end - datetime.timedelta(days=30), end)
+    print(f"Abertos agora: {metrics['abertos']}")
+    print(f"Últimos 30 dias: {metrics['convertidos']} convertido(s), "
+          f"{metrics['abandonados']} abandonado(s) ({metrics['itens_abandonados']} itens), "
+          f"abandono de {metrics['taxa_abandono']:.1f}%")
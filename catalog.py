@@ -0,0 +1,261 @@
+# catalog.py
+import base64
+import json
+from contextlib import contextmanager
+
+from sqlalchemy import event, tuple_
+from sqlalchemy.orm import joinedload, selectinload
+
+from extensions import db
+from models import (Banner, CircularCategory, Product,
+                    ProductSection, product_category_association)
+from pricing import effective_price_expr, join_effective_price
+
+
+# --- Camada de Consultas do Catálogo ---
+# Os templates acessam `current_price`/`is_on_sale` (effective_price) e
+# `categories` em cada card (o estoque já vem nas colunas do produto).
+# Com lazy loading isso vira 2-3 SELECTs por produto (N+1). Aqui os
+# relacionamentos são carregados com `selectinload`: uma consulta por
+# relacionamento, não por produto.
+
+def product_card_options():
+    """Opções de carregamento para tudo que um card/detalhe de produto usa."""
+    return (
+        # Preço final pré-calculado (pricing.py): dispensa carregar as promoções
+        selectinload(Product.effective_price),
+        selectinload(Product.categories),
+    )
+
+
+def active_products_query():
+    """Produtos ativos, já com preço efetivo e categorias (ver product_card_options)."""
+    return Product.query.filter(Product.active == True)\
+                        .options(*product_card_options())
+
+
+def category_products_query(category):
+    """
+    Produtos ativos de uma categoria (filtro feito no SQL, via associação).
+    Subquery em vez de join: o WHERE da query fica autocontido e serve de
+    escopo para as contagens das facetas (ver facets.py).
+    """
+    in_category = db.select(product_category_association.c.product_id)\
+                    .where(product_category_association.c.category_id == category.id)
+    return active_products_query().filter(Product.id.in_(in_category))
+
+
+# Valores aceitos em `?ordem=` nas listagens (além da ordem por nome)
+SORT_OPTIONS = ('menor-preco', 'maior-preco')
+
+
+# --- Paginação por Keyset (Seek) ---
+# OFFSET obriga o SQLite a percorrer todas as linhas anteriores, então a
+# página 200 fica 200x mais lenta que a primeira. Aqui a página seguinte
+# começa "depois da última chave vista" ((name, id) ou (preço, id)), o que
+# custa o mesmo em qualquer profundidade.
+
+DEFAULT_PAGE_SIZE = 24
+PAGE_SIZES = (24, 48, 96)
+
+
+def _sort_keys(ordem):
+    """Colunas da chave de ordenação e se a ordem é decrescente."""
+    if ordem == 'menor-preco':
+        return (effective_price_expr(), Product.id), False
+    if ordem == 'maior-preco':
+        return (effective_price_expr(), Product.id), True
+    return (Product.name, Product.id), False
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _is_number(value):
+    # bool é subclasse de int, mas não é chave válida
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def decode_cursor(token, ordem=None):
+    """
+    Retorna a chave do cursor, ou None se o token for inválido. A chave
+    precisa ter os tipos da ordenação `ordem` (nome: texto; preço: número)
+    e um id inteiro: um token forjado volta para a primeira página em vez
+    de chegar ao SQL.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != 2:
+        return None
+    key, product_id = values
+    keys, _ = _sort_keys(ordem)
+    valid_key = isinstance(key, str) if keys[0] is Product.name else _is_number(key)
+    if not valid_key or not isinstance(product_id, int) or isinstance(product_id, bool):
+        return None
+    return values
+
+
+def parse_page_size(value, allowed=PAGE_SIZES, default=DEFAULT_PAGE_SIZE):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value in allowed else default
+
+
+class KeysetPage:
+    """Uma página de resultados e os cursores para a anterior/próxima."""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(query, ordem=None, after=None, before=None, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Pagina `query` (de Product) por keyset. `after`/`before` são tokens de
+    cursor (ver `encode_cursor`); cada página custa O(per_page) no banco.
+    """
+    keys, descending = _sort_keys(ordem)
+    if keys[0] is not Product.name:
+        # Ordena pelo preço de venda (tabela product_price) no SQL
+        query = join_effective_price(query)
+    key_tuple = tuple_(*keys)
+
+    def key_of(product):
+        if keys[0] is Product.name:
+            return (product.name, product.id)
+        # Mesmo valor do COALESCE usado no SQL
+        effective = product.effective_price
+        return (effective.current_price if effective else product.price, product.id)
+
+    def ordered(q, reverse):
+        desc = descending != reverse
+        return q.order_by(*[k.desc() if desc else k for k in keys])
+
+    def seek(q, cursor, forward):
+        # Avança na direção da ordenação (ou volta, se forward=False)
+        if forward != descending:
+            return q.filter(key_tuple > tuple_(*cursor))
+        return q.filter(key_tuple < tuple_(*cursor))
+
+    after_key = decode_cursor(after, ordem)
+    before_key = decode_cursor(before, ordem) if after_key is None else None
+
+    if before_key is not None:
+        rows = ordered(seek(query, before_key, forward=False), reverse=True)\
+            .limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next = True
+    else:
+        q = query if after_key is None else seek(query, after_key, forward=True)
+        rows = ordered(q, reverse=False).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        # Só existe página anterior se há algo antes do cursor
+        has_prev = after_key is not None and bool(items) and ordered(
+            seek(query, key_of(items[0]), forward=False), reverse=True
+        ).with_entities(Product.id).limit(1).first() is not None
+
+    if not items:
+        return KeysetPage(items, per_page)
+    return KeysetPage(
+        items, per_page,
+        next_cursor=encode_cursor(key_of(items[-1])) if has_next else None,
+        prev_cursor=encode_cursor(key_of(items[0])) if has_prev else None,
+    )
+
+
+def get_active_product(slug):
+    """Produto ativo pelo slug, com tudo que a página de detalhe usa."""
+    return active_products_query().options(selectinload(Product.variations))\
+                                  .filter(Product.slug == slug).first_or_404()
+
+
+def home_sections():
+    """Seções da home com os produtos (e seus relacionamentos) já carregados."""
+    products = selectinload(ProductSection.products)
+    return ProductSection.query.options(
+        products.selectinload(Product.effective_price),
+    ).all()
+
+
+def home_circular_categories(section):
+    return CircularCategory.query.filter_by(section=section)\
+                                 .options(joinedload(CircularCategory.category))\
+                                 .order_by(CircularCategory.order).all()
+
+
+def home_banners():
+    return Banner.query.options(joinedload(Banner.product))\
+                       .order_by(Banner.order).all()
+
+
+# --- Contador de Queries (para testes e para caçar regressões N+1) ---
+
+class QueryCounter:
+    """Guarda os SQLs executados enquanto o contador está ativo."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """
+    Conta as queries executadas dentro do bloco.
+
+        with count_queries() as counter:
+            client.get('/produtos')
+        print(counter.count)
+    """
+    engine = engine or db.engine
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter._on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter._on_execute)
+
+
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    """Falha (AssertionError) se o bloco executar mais de `limit` queries."""
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        listing = '\n'.join(f'  {i + 1}. {sql}' for i, sql in enumerate(counter.statements))
+        raise AssertionError(
+            f'Esperado no máximo {limit} queries, mas foram executadas {counter.count}:\n{listing}'
+        )
@@ -0,0 +1,548 @@
+# catalog_io.py
+import csv
+import json
+import sqlite3
+import sys
+
+import click
+from flask.cli import AppGroup
+from slugify import slugify
+
+import slugs
+from extensions import db
+from models import Category, Product
+
+
+# --- Importação/Exportação do Catálogo em Lote ---
+# Cadastrar uma coleção nova pelo admin é um formulário por produto.
+# `flask catalog import` lê um CSV ou JSONL (uma linha por produto) e
+# grava produtos, variações, categorias e promoções em lotes: cada lote é
+# uma transação com `executemany`, e os slugs são resolvidos com uma
+# consulta por lote (não uma por linha, ver slugs.py). `flask catalog export` gera o
+# mesmo formato, página a página, com memória constante.
+#
+# Colunas (CSV) / chaves (JSONL):
+#
+#     slug         chave do upsert: se existir, o produto é atualizado;
+#                  sem slug (ou slug novo) o produto é criado
+#     name, description, price, image, active
+#     categories   nomes, separados por "|" no CSV (criadas se não existirem)
+#     promotions   nomes de promoções já cadastradas, separados por "|"
+#     variations   "P:10|M:5|G:0" no CSV; [{"size": "P", "stock": 10}, ...]
+#                  ou {"P": 10, ...} no JSONL
+#
+# No CSV, célula vazia = "não informado" (mantém o valor atual); no JSONL
+# só as chaves presentes são gravadas (null limpa description/image). Por
+# padrão categorias, promoções e tamanhos são acrescentados; com
+# --substituir ficam exatamente os do arquivo (tamanhos fora dele ficam
+# com estoque 0, sem apagar a variação de pedidos e carrinhos).
+#
+# Linhas inválidas são relatadas (com o número da linha) e puladas. Se um
+# lote falhar no banco, ele é regravado linha a linha para achar a culpada.
+# Triggers cuidam do estoque do produto (stock.py); índice de busca, preço
+# efetivo e cache são atualizados aqui, já que o ORM não vê estas escritas.
+
+FIELDS = ('slug', 'name', 'description', 'price', 'image', 'active',
+          'categories', 'promotions', 'variations')
+FORMATS = ('csv', 'jsonl')
+LIST_SEP = '|'
+BATCH_SIZE = 500
+EXPORT_PAGE_SIZE = 500
+# Colunas da tabela product que o arquivo pode alterar
+PRODUCT_COLUMNS = ('name', 'description', 'price', 'image', 'active')
+TRUE_VALUES = ('1', 'true', 'sim', 's', 'yes', 'y')
+FALSE_VALUES = ('0', 'false', 'nao', 'não', 'n', 'no')
+
+
+class RowError(ValueError):
+    """Linha inválida: relatada e pulada, o resto do arquivo segue."""
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    if path.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if path.lower().endswith('.csv'):
+        return 'csv'
+    raise click.BadParameter('Não deu para saber o formato pela extensão; use --formato.')
+
+
+def _marks(values):
+    return ', '.join('?' * len(values))
+
+
+# --- Leitura (uma linha por vez) ---
+
+def read_rows(stream, fmt):
+    """Gera (número da linha, dict) sem carregar o arquivo inteiro."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        unknown = [name for name in reader.fieldnames or () if name not in FIELDS]
+        if unknown:
+            raise click.ClickException(f"Colunas desconhecidas: {', '.join(unknown)}. "
+                                       f"Aceitas: {', '.join(FIELDS)}.")
+        for raw in reader:
+            # Célula vazia = não informado
+            yield reader.line_num, {k: v for k, v in raw.items() if k and v not in (None, '')}
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as e:
+            yield line_number, RowError(f'JSON inválido: {e}')
+            continue
+        if not isinstance(raw, dict):
+            yield line_number, RowError('cada linha precisa ser um objeto JSON')
+            continue
+        yield line_number, raw
+
+
+# --- Validação de cada campo ---
+
+def _text(value, field, max_length=None, required=False):
+    if value is None:
+        if required:
+            raise RowError(f'{field} não pode ser vazio')
+        return None
+    value = str(value).strip()
+    if required and not value:
+        raise RowError(f'{field} não pode ser vazio')
+    if max_length and len(value) > max_length:
+        raise RowError(f'{field} passa de {max_length} caracteres')
+    return value or None
+
+
+def _price(value):
+    try:
+        price = float(value.replace(',', '.')) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        raise RowError(f'preço inválido: {value!r}')
+    if price < 0:
+        raise RowError(f'preço negativo: {value!r}')
+    return round(price, 2)
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise RowError(f'active inválido: {value!r} (use 1/0, sim/não)')
+
+
+def _names(value, field):
+    if isinstance(value, str):
+        value = value.split(LIST_SEP)
+    if not isinstance(value, list):
+        raise RowError(f'{field} precisa ser uma lista')
+    names = []
+    for name in value:
+        name = str(name).strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _variations(value):
+    if isinstance(value, str):
+        pairs = []
+        for part in filter(None, (p.strip() for p in value.split(LIST_SEP))):
+            size, sep, stock = part.rpartition(':')
+            if not sep:
+                raise RowError(f'variação sem estoque: {part!r} (use TAMANHO:ESTOQUE)')
+            pairs.append((size, stock))
+    elif isinstance(value, dict):
+        pairs = list(value.items())
+    elif isinstance(value, list):
+        try:
+            pairs = [(item['size'], item.get('stock', 0)) for item in value]
+        except (TypeError, KeyError):
+            raise RowError('variations: cada item precisa de "size" (e "stock")')
+    else:
+        raise RowError('variations em formato inválido')
+
+    variations = {}
+    for size, stock in pairs:
+        size = str(size).strip()
+        if not size or len(size) > 50:
+            raise RowError(f'tamanho inválido: {size!r}')
+        if size in variations:
+            raise RowError(f'tamanho repetido: {size!r}')
+        try:
+            stock = int(stock)
+        except (TypeError, ValueError):
+            raise RowError(f'estoque inválido para {size}: {stock!r}')
+        if stock < 0:
+            raise RowError(f'estoque negativo para {size}')
+        variations[size] = stock
+    return variations
+
+
+def parse_row(raw):
+    """Normaliza uma linha do arquivo; só os campos presentes entram no dict."""
+    unknown = [key for key in raw if key not in FIELDS]
+    if unknown:
+        raise RowError(f"campos desconhecidos: {', '.join(unknown)}")
+    row = {}
+    if raw.get('slug') is not None:
+        row['slug'] = slugify(str(raw['slug']))[:150]
+        if not row['slug']:
+            raise RowError(f"slug inválido: {raw['slug']!r}")
+    if 'name' in raw:
+        row['name'] = _text(raw['name'], 'name', 150, required=True)
+    if 'description' in raw:
+        row['description'] = _text(raw['description'], 'description')
+    if 'price' in raw:
+        row['price'] = _price(raw['price'])
+    if 'image' in raw:
+        row['image'] = _text(raw['image'], 'image', 200)
+    if 'active' in raw:
+        row['active'] = _bool(raw['active'])
+    for field in ('categories', 'promotions'):
+        if field in raw:
+            row[field] = _names(raw[field] or [], field)
+    if 'variations' in raw:
+        row['variations'] = _variations(raw['variations'] or {})
+    return row
+
+
+# --- Importação ---
+
+class CatalogImporter:
+    """Acumula linhas válidas e grava de `batch_size` em `batch_size`."""
+
+    def __init__(self, batch_size=BATCH_SIZE, replace=False, dry_run=False, report=print):
+        self.batch_size = batch_size
+        self.replace = replace
+        self.dry_run = dry_run
+        self.report = report
+        self.created = self.updated = self.failed = 0
+        self.touched = set()  # ids dos produtos gravados (para o cache/preços)
+        self._batch = []
+        self._batch_slugs = set()
+        # Categorias e promoções são poucas: nome -> id em memória
+        with db.engine.connect() as conn:
+            raw = conn.connection.driver_connection
+            self.categories = dict(raw.execute('SELECT name, id FROM category'))
+            self.promotions = dict(raw.execute('SELECT name, id FROM promotion'))
+
+    def error(self, line, message):
+        self.failed += 1
+        self.report(f'linha {line}: {message}')
+
+    def add(self, line, raw):
+        if isinstance(raw, RowError):
+            self.error(line, raw)
+            return
+        try:
+            row = parse_row(raw)
+            missing = [name for name in row.get('promotions', ()) if name not in self.promotions]
+            if missing:
+                raise RowError(f"promoção não cadastrada: {', '.join(missing)}")
+        except RowError as e:
+            self.error(line, e)
+            return
+        # Mesmo slug duas vezes no lote: grava o lote antes (a 2ª é update)
+        if row.get('slug') in self._batch_slugs:
+            self.flush()
+        if 'slug' in row:
+            self._batch_slugs.add(row['slug'])
+        self._batch.append((line, row))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        batch, self._batch, self._batch_slugs = self._batch, [], set()
+        if not batch:
+            return
+        try:
+            self._commit_with_slug_retry(batch)
+        except sqlite3.Error:
+            # Algum conflito no banco: regrava linha a linha para relatar só as culpadas
+            for line, row in batch:
+                try:
+                    self._commit([(line, row)])
+                except sqlite3.Error as e:
+                    self.error(line, f'erro no banco: {e}')
+
+    def _commit_with_slug_retry(self, batch):
+        # Outro cadastro pegou um slug alocado para o lote: realoca e tenta de novo
+        for attempt in range(slugs.RETRIES):
+            try:
+                return self._commit(batch)
+            except sqlite3.IntegrityError as e:
+                conflict = slugs.is_conflict(e, Product) or slugs.is_conflict(e, Category)
+                if not conflict or attempt == slugs.RETRIES - 1:
+                    raise
+
+    def finish(self):
+        """Grava o que sobrou e invalida o cache da loja uma vez."""
+        self.flush()
+        if self.touched and not self.dry_run:
+            from cache import generations
+            generations.bump('home', 'catalog')
+
+    def _commit(self, batch):
+        from pricing import refresh_prices
+
+        with db.engine.connect() as conn:
+            transaction = conn.begin()
+            try:
+                created, updated, product_ids, new_categories, skipped = self._write(conn, batch)
+            except BaseException:
+                transaction.rollback()
+                raise
+            if self.dry_run:
+                transaction.rollback()
+            else:
+                transaction.commit()
+        for line, message in skipped:
+            self.error(line, message)
+        self.created += created
+        self.updated += updated
+        if self.dry_run:
+            return
+        self.categories.update(new_categories)
+        self.touched.update(product_ids)
+        refresh_prices(product_ids)
+
+    def _write(self, connection, batch):
+        """Grava um lote na conexão (sem commit); devolve contagens e linhas puladas."""
+        import search
+
+        conn = connection.connection.driver_connection
+        # 1. Quem já existe (pelo slug informado)
+        explicit = [row['slug'] for _, row in batch if 'slug' in row]
+        existing = {}
+        for i in range(0, len(explicit), 900):
+            chunk = explicit[i:i + 900]
+            existing.update((slug, pid) for pid, slug in conn.execute(
+                f'SELECT id, slug FROM product WHERE slug IN ({_marks(chunk)})', chunk))
+
+        updates, inserts, skipped = [], [], []
+        for line, row in batch:
+            if row.get('slug') in existing:
+                updates.append((existing[row['slug']], row))
+            elif 'name' not in row or 'price' not in row:
+                skipped.append((line, 'produto novo precisa de name e price'))
+            else:
+                inserts.append(row)
+
+        # 2. Slugs dos produtos novos sem slug: uma consulta para o lote
+        # (o row não é alterado: numa nova tentativa o slug é realocado)
+        generated = iter(slugs.allocate(
+            connection, Product, [row['name'] for row in inserts if 'slug' not in row],
+            reserved={row['slug'] for row in inserts if 'slug' in row}))
+        insert_slugs = [row['slug'] if 'slug' in row else next(generated) for row in inserts]
+
+        # 3. Categorias novas
+        new_categories = {}
+        wanted = {name for _, row in batch for name in row.get('categories', ())}
+        missing = sorted(wanted - set(self.categories))
+        if missing:
+            conn.executemany('INSERT INTO category (name, slug) VALUES (?, ?)',
+                             list(zip(missing, slugs.allocate(connection, Category, missing))))
+            new_categories = dict(conn.execute(
+                f'SELECT name, id FROM category WHERE name IN ({_marks(missing)})', missing))
+        categories = {**self.categories, **new_categories}
+
+        # 4. Produtos novos (ids recuperados pelo slug, que é único)
+        if inserts:
+            conn.executemany(
+                'INSERT INTO product (name, description, price, image, slug, active, cart_add_count, view_count) '
+                'VALUES (?, ?, ?, ?, ?, ?, 0, 0)',
+                [(row['name'], row.get('description'), row['price'], row.get('image'), slug,
+                  1 if row.get('active', True) else 0) for row, slug in zip(inserts, insert_slugs)])
+            ids = {}
+            for i in range(0, len(insert_slugs), 900):
+                chunk = insert_slugs[i:i + 900]
+                ids.update((slug, pid) for pid, slug in conn.execute(
+                    f'SELECT id, slug FROM product WHERE slug IN ({_marks(chunk)})', chunk))
+            targets = [(ids[slug], row) for row, slug in zip(inserts, insert_slugs)]
+        else:
+            targets = []
+
+        # 5. Produtos existentes: um UPDATE por combinação de colunas presentes
+        by_columns = {}
+        for product_id, row in updates:
+            columns = tuple(c for c in PRODUCT_COLUMNS if c in row)
+            if columns:
+                values = [int(row[c]) if c == 'active' else row[c] for c in columns]
+                by_columns.setdefault(columns, []).append((*values, product_id))
+        for columns, params in by_columns.items():
+            assignments = ', '.join(f'{column} = ?' for column in columns)
+            conn.executemany(f'UPDATE product SET {assignments} WHERE id = ?', params)
+        targets += updates
+
+        # 6. Variações, categorias e promoções
+        self._write_variations(conn, [(pid, row['variations']) for pid, row in targets
+                                      if 'variations' in row])
+        self._write_links(conn, 'product_category_association', 'category_id',
+                          [(pid, [categories[name] for name in row['categories']])
+                           for pid, row in targets if 'categories' in row])
+        self._write_links(conn, 'promotion_product_association', 'promotion_id',
+                          [(pid, [self.promotions[name] for name in row['promotions']])
+                           for pid, row in targets if 'promotions' in row])
+
+        product_ids = [pid for pid, _ in targets]
+        search.reindex(conn, product_ids)
+        return len(inserts), len(updates), product_ids, new_categories, skipped
+
+    def _write_variations(self, conn, items):
+        if not items:
+            return
+        product_ids = [pid for pid, _ in items]
+        current = {}
+        for i in range(0, len(product_ids), 900):
+            chunk = product_ids[i:i + 900]
+            for vid, pid, size in conn.execute(
+                    f'SELECT id, product_id, size FROM variation WHERE product_id IN ({_marks(chunk)})', chunk):
+                current.setdefault(pid, {}).setdefault(size, vid)
+
+        stock_updates, new_rows = [], []
+        for pid, variations in items:
+            sizes = current.get(pid, {})
+            for size, stock in variations.items():
+                if size in sizes:
+                    stock_updates.append((stock, sizes[size]))
+                else:
+                    new_rows.append((size, stock, pid))
+            if self.replace:
+                # Fora do arquivo: sem estoque (a variação fica por causa de pedidos/carrinhos)
+                stock_updates.extend((0, vid) for size, vid in sizes.items() if size not in variations)
+        conn.executemany('UPDATE variation SET stock = ? WHERE id = ?', stock_updates)
+        conn.executemany('INSERT INTO variation (size, stock, product_id) VALUES (?, ?, ?)', new_rows)
+
+    def _write_links(self, conn, table, column, items):
+        if not items:
+            return
+        if self.replace:
+            conn.executemany(f'DELETE FROM {table} WHERE product_id = ?', [(pid,) for pid, _ in items])
+        conn.executemany(f'INSERT OR IGNORE INTO {table} (product_id, {column}) VALUES (?, ?)',
+                         [(pid, other) for pid, others in items for other in others])
+
+
+def import_catalog(stream, fmt, **options):
+    """Importa `stream` (app context). Retorna o CatalogImporter com as contagens."""
+    importer = CatalogImporter(**options)
+    for line, raw in read_rows(stream, fmt):
+        importer.add(line, raw)
+    importer.finish()
+    return importer
+
+
+# --- Exportação (página a página) ---
+
+def iter_catalog(active_only=False, page_size=EXPORT_PAGE_SIZE):
+    """Gera um dict por produto no formato da importação, em ordem de id."""
+    with db.engine.connect() as conn:
+        raw = conn.connection.driver_connection
+        where = 'AND active = 1' if active_only else ''
+        last_id = 0
+        while True:
+            products = raw.execute(
+                f'SELECT id, slug, name, description, price, image, active FROM product '
+                f'WHERE id > ? {where} ORDER BY id LIMIT ?', (last_id, page_size)).fetchall()
+            if not products:
+                return
+            ids = [row[0] for row in products]
+            marks = _marks(ids)
+            variations, categories, promotions = {}, {}, {}
+            for pid, size, stock in raw.execute(
+                    f'SELECT product_id, size, stock FROM variation WHERE product_id IN ({marks}) '
+                    f'ORDER BY product_id, id', ids):
+                variations.setdefault(pid, []).append({'size': size, 'stock': stock})
+            for target, sql in (
+                (categories, 'SELECT a.product_id, c.name FROM product_category_association a '
+                             'JOIN category c ON c.id = a.category_id '
+                             f'WHERE a.product_id IN ({marks}) ORDER BY c.name'),
+                (promotions, 'SELECT a.product_id, p.name FROM promotion_product_association a '
+                             'JOIN promotion p ON p.id = a.promotion_id '
+                             f'WHERE a.product_id IN ({marks}) ORDER BY p.name'),
+            ):
+                for pid, name in raw.execute(sql, ids):
+                    target.setdefault(pid, []).append(name)
+
+            for pid, slug, name, description, price, image, active in products:
+                yield {
+                    'slug': slug,
+                    'name': name,
+                    'description': description,
+                    'price': price,
+                    'image': image,
+                    'active': bool(active),
+                    'categories': categories.get(pid, []),
+                    'promotions': promotions.get(pid, []),
+                    'variations': variations.get(pid, []),
+                }
+            last_id = ids[-1]
+
+
+def export_catalog(stream, fmt, active_only=False):
+    """Escreve o catálogo em `stream`. Retorna quantos produtos saíram."""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(FIELDS)
+    for product in iter_catalog(active_only=active_only):
+        if fmt == 'csv':
+            writer.writerow((
+                product['slug'], product['name'], product['description'] or '',
+                f"{product['price']:.2f}", product['image'] or '', 1 if product['active'] else 0,
+                LIST_SEP.join(product['categories']), LIST_SEP.join(product['promotions']),
+                LIST_SEP.join(f"{v['size']}:{v['stock']}" for v in product['variations']),
+            ))
+        else:
+            stream.write(json.dumps(product, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+# --- Comandos CLI: flask catalog import/export ---
+
+catalog_cli = AppGroup('catalog', help='Importação/exportação do catálogo em lote (CSV/JSONL).')
+
+
+@catalog_cli.command('import')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--formato', type=click.Choice(FORMATS), help='Padrão: pela extensão do arquivo.')
+@click.option('--lote', 'batch_size', default=BATCH_SIZE, show_default=True, help='Linhas por transação.')
+@click.option('--substituir', 'replace', is_flag=True,
+              help='Categorias, promoções e tamanhos ficam exatamente os do arquivo.')
+@click.option('--simular', 'dry_run', is_flag=True, help='Valida e grava, mas desfaz cada lote.')
+def import_command(arquivo, formato, batch_size, replace, dry_run):
+    """Cria/atualiza produtos a partir de um CSV ou JSONL (chave: slug)."""
+    fmt = detect_format(arquivo, formato) if arquivo != '-' else (formato or 'jsonl')
+    options = {'batch_size': max(1, batch_size), 'replace': replace, 'dry_run': dry_run}
+    if arquivo == '-':
+        importer = import_catalog(sys.stdin, fmt, **options)
+    else:
+        with open(arquivo, encoding='utf-8-sig', newline='') as stream:
+            importer = import_catalog(stream, fmt, **options)
+    prefix = '(simulação) ' if dry_run else ''
+    print(f"{prefix}{importer.created} criado(s), {importer.updated} atualizado(s), "
+          f"{importer.failed} linha(s) com erro.")
+    if importer.failed:
+        raise click.exceptions.Exit(1)
+
+
+@catalog_cli.command('export')
+@click.argument('arquivo', default='-', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--formato', type=click.Choice(FORMATS), help='Padrão: pela extensão do arquivo.')
+@click.option('--apenas-ativos', 'active_only', is_flag=True, help='Só produtos ativos.')
+def export_command(arquivo, formato, active_only):
+    """Exporta o catálogo inteiro no formato do import (padrão: JSONL na saída)."""
+    if arquivo == '-':
+        export_catalog(sys.stdout, formato or 'jsonl', active_only)
+        return
+    fmt = detect_format(arquivo, formato)
+    with open(arquivo, 'w', encoding='utf-8', newline='') as stream:
+        count = export_catalog(stream, fmt, active_only)
+    print(f"{count} produto(s) exportado(s) para {arquivo}.")
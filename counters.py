@@ -0,0 +1,246 @@
+# counters.py
+import atexit
+import json
+import os
+import threading
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+
+try:
+    import fcntl
+except ImportError:  # Windows (ambiente de desenvolvimento)
+    fcntl = None
+
+
+# --- Buffer de Contadores (Write-Behind) ---
+# Em vez de fazer um COMMIT a cada visita/view/adição ao carrinho,
+# os incrementos ficam acumulados em memória e são gravados de uma
+# só vez, num único UPDATE em lote, quando passa o intervalo de tempo
+# ou quando há incrementos pendentes demais.
+#
+# A gravação roda numa thread de fundo (uma por worker), nunca dentro
+# da request que fez o incremento: ela acorda a cada `flush_interval`
+# segundos, ou antes, quando o buffer passa de `flush_threshold`. Assim
+# um worker parado também grava o que tem pendente.
+
+class CounterBuffer:
+    """
+    Agrega incrementos de contadores e grava no banco em lote.
+
+    Chaves:
+      - ('model', <tabela>, <coluna>, <id>) -> ex: Product.view_count
+      - ('stat', <SiteStat.key>)            -> ex: 'total_visitas'
+
+    Com COUNTER_SPOOL_PATH configurado, os workers do gunicorn despejam
+    seus incrementos num arquivo de spool compartilhado e apenas um deles
+    (quem conseguir o lock) grava o spool no banco.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.flush_interval = 10.0
+        self.flush_threshold = 200
+        self.spool_path = None
+        self._pending = {}
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        self._exit_hook = False
+        self._thread = None
+        self._wake = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = float(app.config.get('COUNTER_FLUSH_INTERVAL', 10.0))
+        self.flush_threshold = int(app.config.get('COUNTER_FLUSH_THRESHOLD', 200))
+        self.spool_path = app.config.get('COUNTER_SPOOL_PATH')
+        if self.spool_path and fcntl is None:
+            # Sem flock não dá para compartilhar o spool com segurança
+            self.spool_path = None
+        app.extensions['counter_buffer'] = self
+        # Garante que nenhuma contagem se perca quando o worker encerrar.
+        # Uma vez só: cada create_app() (benchmarks, admin sob demanda)
+        # chama init_app de novo no mesmo objeto
+        if not self._exit_hook:
+            atexit.register(self.flush)
+            self._exit_hook = True
+
+    # --- API de incremento ---
+
+    def incr(self, model, column, row_id, amount=1):
+        """Incrementa `model.column` da linha `row_id` (ex: Product.view_count)."""
+        key = ('model', model.__tablename__, column, int(row_id))
+        self._add(key, amount)
+
+    def incr_stat(self, key, amount=1):
+        """Incrementa a estatística `SiteStat.key` (cria a chave se não existir)."""
+        self._add(('stat', key), amount)
+
+    def _add(self, key, amount):
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + amount
+            self._pending_count += 1
+            full = self._pending_count >= self.flush_threshold
+        wake = self._start_flusher()
+        if full:
+            wake.set()
+
+    # --- Thread de gravação ---
+
+    def _start_flusher(self):
+        """
+        Inicia a thread no primeiro incremento de cada processo: threads não
+        sobrevivem ao fork dos workers do gunicorn. Retorna o Event que a acorda.
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._wake = threading.Event()
+                    self._thread = threading.Thread(
+                        target=self._run, args=(self._wake,), name='counter-flush', daemon=True
+                    )
+                    self._thread.start()
+        return self._wake
+
+    def _run(self, wake):
+        while True:
+            wake.wait(self.flush_interval)
+            wake.clear()
+            if self._pending:
+                self.flush()
+
+    # --- Gravação ---
+
+    def flush(self):
+        """Grava os incrementos pendentes (no banco ou no spool compartilhado)."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._pending_count = 0
+
+        if self.app is None:
+            return
+
+        if self.spool_path:
+            try:
+                self._append_spool(pending)
+            except Exception as e:
+                self._merge_back(pending)
+                print(f"Erro ao gravar spool de contadores: {e}")
+                return
+            try:
+                self._drain_spool()
+            except Exception as e:
+                print(f"Erro ao gravar contadores: {e}")
+        elif pending:
+            try:
+                self._write(pending)
+            except Exception as e:
+                # Devolve os incrementos ao buffer para a próxima tentativa
+                self._merge_back(pending)
+                print(f"Erro ao gravar contadores: {e}")
+
+    def _merge_back(self, pending):
+        with self._lock:
+            for key, amount in pending.items():
+                self._pending[key] = self._pending.get(key, 0) + amount
+                self._pending_count += 1
+
+    def _write(self, pending):
+        """Aplica todos os incrementos numa única transação."""
+        from models import SiteStat
+
+        by_column = {}
+        stats = []
+        for key, amount in pending.items():
+            if not amount:
+                continue
+            if key[0] == 'stat':
+                stats.append({'key': key[1], 'value': amount})
+            else:
+                _, table_name, column, row_id = key
+                by_column.setdefault((table_name, column), []).append(
+                    {'_row_id': row_id, '_amount': amount}
+                )
+
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                for (table_name, column), params in by_column.items():
+                    table = db.metadata.tables[table_name]
+                    col = table.c[column]
+                    stmt = (
+                        update(table)
+                        .where(table.c.id == bindparam('_row_id'))
+                        .values({column: db.func.coalesce(col, 0) + bindparam('_amount')})
+                    )
+                    conn.execute(stmt, params)
+
+                if stats:
+                    stmt = sqlite_insert(SiteStat.__table__)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=['key'],
+                        set_={'value': db.func.coalesce(SiteStat.__table__.c.value, 0) + stmt.excluded.value}
+                    )
+                    conn.execute(stmt, stats)
+
+    # --- Spool compartilhado entre workers ---
+
+    @staticmethod
+    def _encode(pending):
+        return [[list(key), amount] for key, amount in pending.items() if amount]
+
+    def _append_spool(self, pending):
+        lines = self._encode(pending)
+        if not lines:
+            return
+        with open(self.spool_path, 'a', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(json.dumps(lines) + '\n')
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _drain_spool(self):
+        """Só um worker por vez (lock não-bloqueante) grava o spool no banco."""
+        if not os.path.exists(self.spool_path):
+            return
+        with open(self.spool_path + '.lock', 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # Outro worker já está gravando
+            try:
+                with open(self.spool_path, 'r+', encoding='utf-8') as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    try:
+                        content = f.read()
+                        f.seek(0)
+                        f.truncate()
+                    finally:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+                merged = {}
+                for line in content.splitlines():
+                    if not line.strip():
+                        continue
+                    for key, amount in json.loads(line):
+                        key = tuple(key)
+                        merged[key] = merged.get(key, 0) + amount
+                if not merged:
+                    return
+                try:
+                    self._write(merged)
+                except Exception:
+                    # Devolve ao spool para não perder as contagens
+                    self._append_spool(merged)
+                    raise
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+counter_buffer = CounterBuffer()
@@ -0,0 +1,197 @@
+# facets.py
+import re
+from dataclasses import dataclass, field
+
+from sqlalchemy import and_, case, distinct, func, or_, select
+
+from extensions import db
+from models import Category, Product, ProductPrice, Variation, product_category_association
+
+
+# --- Filtros Facetados das Listagens ---
+# /produtos e /categoria/<slug> aceitam filtros combináveis na URL:
+#
+#     ?tamanho=M&tamanho=G   tamanhos (qualquer um deles)
+#     ?categoria=feminino    categorias (qualquer uma; na página de uma
+#                            categoria, restringe ainda mais)
+#     ?preco=100-200         faixas de preço (qualquer uma)
+#     ?promocao=1            só com promoção vigente
+#     ?estoque=1             só com estoque (e, com tamanho, estoque naquele tamanho)
+#
+# Todos os filtros viram cláusulas `Product.id IN (subselect)` no SQL, e as
+# contagens de cada faceta saem de um GROUP BY por faceta, calculado com
+# todos os OUTROS filtros aplicados (assim marcar "M" não zera a contagem
+# de "G"). O resultado inteiro fica no cache de fragmentos junto com a
+# página (geração 'catalog'), então combinações repetidas não vão ao banco.
+
+# Parâmetros da URL lidos por `FacetSelection.from_args()`
+ARG_NAMES = ('tamanho', 'categoria', 'preco', 'promocao', 'estoque')
+
+# (chave na URL, rótulo, mínimo inclusive, máximo exclusivo)
+PRICE_BUCKETS = (
+    ('ate-100', 'Até R$ 100', None, 100),
+    ('100-200', 'R$ 100 a R$ 200', 100, 200),
+    ('200-400', 'R$ 200 a R$ 400', 200, 400),
+    ('acima-400', 'Acima de R$ 400', 400, None),
+)
+PRICE_BUCKET_KEYS = tuple(bucket[0] for bucket in PRICE_BUCKETS)
+
+# Ordem natural das grades de roupa; o resto vem depois (números em ordem numérica)
+SIZE_ORDER = ('PP', 'P', 'M', 'G', 'GG', 'XG', 'XGG', 'EG', 'EGG', 'U', 'ÚNICO')
+MAX_VALUES = 20  # valores aceitos por faceta na URL
+
+
+def size_sort_key(size):
+    upper = size.strip().upper()
+    if upper in SIZE_ORDER:
+        return (0, SIZE_ORDER.index(upper), '')
+    if re.fullmatch(r'\d+', upper):
+        return (1, int(upper), '')
+    return (2, 0, upper)
+
+
+def effective_price():
+    """Preço de venda como subquery correlacionada (não exige join na query)."""
+    current = select(ProductPrice.current_price)\
+        .where(ProductPrice.product_id == Product.id)\
+        .correlate(Product).scalar_subquery()
+    return func.coalesce(current, Product.price)
+
+
+def _price_condition(minimum, maximum, price):
+    conditions = []
+    if minimum is not None:
+        conditions.append(price >= minimum)
+    if maximum is not None:
+        conditions.append(price < maximum)
+    return and_(*conditions)
+
+
+def _in_stock_ids(sizes):
+    return select(Variation.product_id).where(Variation.stock > 0, Variation.size.in_(sizes))
+
+
+@dataclass
+class FacetSelection:
+    sizes: list = field(default_factory=list)
+    categories: list = field(default_factory=list)  # slugs
+    prices: list = field(default_factory=list)  # chaves de PRICE_BUCKETS
+    on_sale: bool = False
+    in_stock: bool = False
+
+    @classmethod
+    def from_args(cls, args):
+        def values(name):
+            seen = []
+            for value in args.getlist(name):
+                value = value.strip()
+                if value and value not in seen:
+                    seen.append(value)
+            return seen[:MAX_VALUES]
+
+        return cls(
+            sizes=values('tamanho'),
+            categories=values('categoria'),
+            prices=[p for p in values('preco') if p in PRICE_BUCKET_KEYS],
+            on_sale=args.get('promocao') == '1',
+            in_stock=args.get('estoque') == '1',
+        )
+
+    @property
+    def is_empty(self):
+        return not (self.sizes or self.categories or self.prices or self.on_sale or self.in_stock)
+
+    def clauses(self, exclude=None):
+        """Cláusulas SQL (sobre Product) dos filtros, menos a faceta `exclude`."""
+        clauses = []
+        if self.sizes and exclude != 'sizes':
+            if self.in_stock:
+                clauses.append(Product.id.in_(_in_stock_ids(self.sizes)))
+            else:
+                clauses.append(Product.id.in_(
+                    select(Variation.product_id).where(Variation.size.in_(self.sizes))
+                ))
+        if self.categories and exclude != 'categories':
+            clauses.append(Product.id.in_(
+                select(product_category_association.c.product_id)
+                .join(Category, Category.id == product_category_association.c.category_id)
+                .where(Category.slug.in_(self.categories))
+            ))
+        if self.prices and exclude != 'prices':
+            price = effective_price()
+            clauses.append(or_(*[
+                _price_condition(minimum, maximum, price)
+                for key, _, minimum, maximum in PRICE_BUCKETS if key in self.prices
+            ]))
+        if self.on_sale and exclude != 'on_sale':
+            clauses.append(Product.id.in_(
+                select(ProductPrice.product_id).where(ProductPrice.promotion_id.isnot(None))
+            ))
+        if self.in_stock and exclude != 'in_stock':
+            clauses.append(Product.in_stock == True)  # coluna mantida por stock.py
+        return clauses
+
+    def apply(self, query):
+        clauses = self.clauses()
+        return query.filter(*clauses) if clauses else query
+
+
+# --- Contagens ---
+
+def facet_counts(scope, selection, current_category=None):
+    """
+    Contagens de cada faceta. `scope` é a condição base da listagem
+    (ex: `query.whereclause`: produtos ativos [da categoria]).
+    """
+    def where(exclude):
+        return [scope, *selection.clauses(exclude=exclude)]
+
+    # Tamanhos: produtos distintos com aquele tamanho (com estoque, se filtrado)
+    size_query = select(Variation.size, func.count(distinct(Variation.product_id)))\
+        .join(Product, Product.id == Variation.product_id)\
+        .where(*where('sizes'))\
+        .group_by(Variation.size)
+    if selection.in_stock:
+        size_query = size_query.where(Variation.stock > 0)
+    sizes = sorted(db.session.execute(size_query).all(), key=lambda row: size_sort_key(row[0]))
+
+    category_query = select(Category.slug, Category.name, func.count())\
+        .join(product_category_association, product_category_association.c.category_id == Category.id)\
+        .join(Product, Product.id == product_category_association.c.product_id)\
+        .where(*where('categories'))\
+        .group_by(Category.id)\
+        .order_by(Category.name)
+    if current_category is not None:
+        category_query = category_query.where(Category.id != current_category.id)
+    categories = db.session.execute(category_query).all()
+
+    price = effective_price()
+    bucket = case(*[
+        (_price_condition(minimum, maximum, price), key)
+        for key, _, minimum, maximum in PRICE_BUCKETS
+    ])
+    price_counts = dict(db.session.execute(
+        select(bucket, func.count()).select_from(Product).where(*where('prices')).group_by(bucket)
+    ).all())
+
+    def count_with(exclude, extra):
+        return db.session.execute(
+            select(func.count()).select_from(Product).where(*where(exclude), *extra)
+        ).scalar()
+
+    on_sale = count_with('on_sale', FacetSelection(on_sale=True).clauses())
+    in_stock = count_with('in_stock', FacetSelection(in_stock=True).clauses())
+
+    # Formato simples (JSON) porque vai para o cache de fragmentos
+    return {
+        'sizes': [{'value': size, 'count': count, 'selected': size in selection.sizes}
+                  for size, count in sizes],
+        'categories': [{'value': slug, 'label': name, 'count': count,
+                        'selected': slug in selection.categories}
+                       for slug, name, count in categories],
+        'prices': [{'value': key, 'label': label, 'count': price_counts.get(key, 0),
+                    'selected': key in selection.prices}
+                   for key, label, _, _ in PRICE_BUCKETS if price_counts.get(key) or key in selection.prices],
+        'on_sale': {'count': on_sale, 'selected': selection.on_sale},
+        'in_stock': {'count': in_stock, 'selected': selection.in_stock},
+    }
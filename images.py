@@ -0,0 +1,294 @@
+# images.py
+import hashlib
+import json
+import os
+import re
+import threading
+
+from flask import current_app, url_for
+from flask.cli import AppGroup
+from markupsafe import Markup, escape
+
+from cache import generations
+from jobs import task
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Sem Pillow as imagens continuam sendo servidas como enviadas
+    Image = ImageOps = None
+
+
+# --- Derivadas Responsivas das Imagens Enviadas ---
+# As páginas serviam o arquivo original do upload em todo lugar: a bolinha
+# de categoria (60px) baixava a foto inteira. Depois de cada upload geramos
+# versões menores em larguras fixas, em WebP e JPEG, salvas ao lado do
+# original com o hash do conteúdo no nome:
+#
+#     product_vestido.jpg -> product_vestido.3f2a9c1b7e4d.w640.webp
+#
+# O hash muda quando a imagem muda, então as derivadas podem ser servidas
+# com cache longo. A lista do que foi gerado fica num manifesto JSON
+# (`<original>.derivatives.json`) lido pelo helper `responsive_image()`
+# dos templates, que monta o <picture> com srcset/sizes. A geração roda
+# no worker da fila de tarefas (`flask jobs worker`, ver jobs.py); até lá
+# a página usa o original.
+
+WIDTHS = (120, 320, 640, 960, 1600)
+FORMATS = {
+    # formato -> (extensão, mime, opções do Pillow)
+    'webp': ('webp', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'gif', 'webp')
+MANIFEST_SUFFIX = '.derivatives.json'
+HASH_LENGTH = 12
+
+# Nome de uma derivada: <base>.<hash>.w<largura>.<ext>
+DERIVATIVE_RE = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})\.w(?P<width>\d+)\.(?P<ext>webp|jpg)$' % HASH_LENGTH)
+
+
+def pillow_available():
+    return Image is not None
+
+
+def is_source_image(filename):
+    """Arquivo original enviado (não uma derivada nem um manifesto)."""
+    if filename.endswith(MANIFEST_SUFFIX) or DERIVATIVE_RE.match(filename):
+        return False
+    return filename.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def manifest_path(directory, filename):
+    return os.path.join(directory, filename + MANIFEST_SUFFIX)
+
+
+def derivative_name(filename, digest, width, fmt):
+    stem = os.path.splitext(filename)[0]
+    return f'{stem}.{digest}.w{width}.{FORMATS[fmt][0]}'
+
+
+def _target_widths(original_width):
+    widths = [w for w in WIDTHS if w < original_width]
+    # Até a maior largura, a própria largura original também entra (recomprimida)
+    if original_width <= WIDTHS[-1]:
+        widths.append(original_width)
+    return widths
+
+
+def _prepare(image, fmt):
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        # JPEG não tem transparência: fundo branco em vez de preto
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.split()[-1])
+        return background
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA')
+    return image
+
+
+def remove_derivatives(directory, filename, keep_hash=None):
+    """Apaga as derivadas (e o manifesto) de um original."""
+    stem = os.path.splitext(filename)[0]
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        match = DERIVATIVE_RE.match(name)
+        if match and match.group('stem') == stem and match.group('hash') != keep_hash:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+    if keep_hash is None:
+        try:
+            os.remove(manifest_path(directory, filename))
+        except OSError:
+            pass
+
+
+def process_image(directory, filename, force=False):
+    """
+    Gera as derivadas de `directory/filename` e grava o manifesto.
+    Retorna o manifesto (dict) ou None se o arquivo não puder ser processado.
+    """
+    if not pillow_available() or not is_source_image(filename):
+        return None
+    source = os.path.join(directory, filename)
+    if not os.path.isfile(source):
+        return None
+
+    digest = content_hash(source)
+    if not force:
+        existing = read_manifest(directory, filename)
+        if existing and existing.get('hash') == digest:
+            return existing
+
+    with Image.open(source) as opened:
+        if getattr(opened, 'is_animated', False):
+            return None  # GIF animado: redimensionar perderia a animação
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+
+    manifest = {'source': filename, 'hash': digest, 'width': image.width,
+                'height': image.height, 'variants': {}}
+    for fmt, (ext, mime, options) in FORMATS.items():
+        prepared = _prepare(image, fmt)
+        variants = []
+        for width in _target_widths(image.width):
+            name = derivative_name(filename, digest, width, fmt)
+            path = os.path.join(directory, name)
+            if force or not os.path.exists(path):
+                if width < prepared.width:
+                    height = max(1, round(prepared.height * width / prepared.width))
+                    resized = prepared.resize((width, height), Image.Resampling.LANCZOS)
+                else:
+                    resized = prepared
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                resized.save(tmp_path, fmt.upper(), **options)
+                os.replace(tmp_path, path)
+            variants.append({'file': name, 'width': width})
+        manifest['variants'][fmt] = variants
+
+    tmp_manifest = f'{manifest_path(directory, filename)}.{os.getpid()}.tmp'
+    with open(tmp_manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, manifest_path(directory, filename))
+
+    # Derivadas de uma versão anterior da imagem (mesmo nome, outro hash)
+    remove_derivatives(directory, filename, keep_hash=digest)
+    return manifest
+
+
+# --- Leitura dos Manifestos (com cache por mtime) ---
+
+_manifests = {}  # caminho -> (mtime_ns, manifesto)
+_manifests_lock = threading.Lock()
+
+
+def read_manifest(directory, filename):
+    path = manifest_path(directory, filename)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _manifests.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    with _manifests_lock:
+        _manifests[path] = (mtime, manifest)
+    return manifest
+
+
+# --- Helpers de Template ---
+
+def _upload_url(name):
+    return url_for('static', filename='uploads/' + name)
+
+
+def image_srcset(filename, fmt='webp'):
+    """Valor do atributo srcset ('' se não houver derivadas)."""
+    if not filename:
+        return ''
+    manifest = read_manifest(current_app.config['UPLOAD_FOLDER'], filename)
+    if not manifest:
+        return ''
+    return ', '.join(f"{_upload_url(v['file'])} {v['width']}w"
+                     for v in manifest['variants'].get(fmt, []))
+
+
+def _attrs(attrs):
+    parts = []
+    for key, value in attrs.items():
+        if value is None or value is False:
+            continue
+        key = key.rstrip('_').replace('_', '-')  # class_ -> class, data_x -> data-x
+        parts.append(f'{key}="{escape(value)}"')
+    return ' '.join(parts)
+
+
+def responsive_image(filename, alt='', sizes='100vw', **attrs):
+    """
+    <picture> com WebP + JPEG em várias larguras. Sem derivadas (imagem
+    antiga ainda não processada, Pillow ausente) cai no <img> original.
+
+        {{ responsive_image(produto.image, produto.name, sizes='(min-width: 992px) 25vw, 50vw',
+                            class_='card-img-top') }}
+    """
+    attrs.setdefault('loading', 'lazy')
+    img_attrs = dict(src=_upload_url(filename), alt=alt, **attrs)
+
+    manifest = read_manifest(current_app.config['UPLOAD_FOLDER'], filename) if filename else None
+    if not manifest:
+        return Markup(f'<img {_attrs(img_attrs)}>')
+
+    jpeg = manifest['variants'].get('jpeg') or []
+    if jpeg:
+        img_attrs['src'] = _upload_url(jpeg[-1]['file'])
+        img_attrs['srcset'] = image_srcset(filename, 'jpeg')
+        img_attrs['sizes'] = sizes
+
+    webp = image_srcset(filename, 'webp')
+    source = f'<source type="image/webp" srcset="{escape(webp)}" sizes="{escape(sizes)}">' if webp else ''
+    return Markup(f'<picture>{source}<img {_attrs(img_attrs)}></picture>')
+
+
+# --- Tarefa em Segundo Plano ---
+
+@task('images.process')
+def process_image_task(directory, filename):
+    """Executada pelo `flask jobs worker` (ver jobs.py)."""
+    if process_image(directory, filename) is not None:
+        # As páginas em cache ainda apontam para o original
+        generations.bump('home', 'catalog')
+
+
+# --- Comando CLI: flask images backfill ---
+
+images_cli = AppGroup('images', help='Derivadas responsivas das imagens enviadas.')
+
+
+@images_cli.command('backfill')
+def backfill_command():
+    """Gera as derivadas que faltam para os arquivos em UPLOAD_FOLDER."""
+    if not pillow_available():
+        print("Pillow não está instalado (pip install Pillow).")
+        return
+    directory = current_app.config['UPLOAD_FOLDER']
+    processed = skipped = failed = 0
+    for name in sorted(os.listdir(directory)):
+        if not is_source_image(name):
+            continue
+        try:
+            manifest = process_image(directory, name)
+        except (OSError, ValueError) as e:
+            print(f"  erro em {name}: {e}")
+            failed += 1
+            continue
+        if manifest is None:
+            skipped += 1
+        else:
+            processed += 1
+
+    # As páginas em cache ainda apontam para os originais
+    generations.bump('home', 'catalog')
+    print(f"Derivadas prontas para {processed} imagem(ns); {skipped} ignorada(s); {failed} erro(s).")
+
+
+def init_app(app):
+    app.jinja_env.globals.update(responsive_image=responsive_image, image_srcset=image_srcset)
+    app.cli.add_command(images_cli)
@@ -0,0 +1,297 @@
+# instrumentation.py
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+
+from flask import abort, current_app, g, has_request_context, request, Response
+from flask import before_render_template, template_rendered
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# --- Métricas de Desempenho por Requisição ---
+# Para cada requisição: endpoint, tempo total, tempo de template, número
+# de queries e tempo de SQL. Os números saem de três lugares:
+#
+# - before_request/after_request do Flask (tempo total e registro);
+# - eventos before/after_cursor_execute do SQLAlchemy (cada query);
+# - sinais before_render_template/template_rendered do Flask (e o
+#   `timed_template()` usado pelo render_content_block).
+#
+# A resposta ganha o cabeçalho `Server-Timing` (aparece no DevTools do
+# navegador). As últimas METRICS_BUFFER_SIZE amostras de cada endpoint
+# ficam num buffer circular em memória, de onde saem p50/p95/p99 para a
+# página "Desempenho" do admin e para o `/metrics` (formato Prometheus,
+# ligado com METRICS_ENDPOINT). Queries acima de METRICS_SLOW_QUERY_MS
+# são impressas com o SQL e a linha do nosso código que as disparou.
+#
+# Os números são de cada processo: com vários workers do gunicorn, cada
+# um tem o seu buffer (a página mostra o worker que a atendeu).
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERCENTILES = (50, 95, 99)
+SLOW_QUERY_LOG_SIZE = 50
+
+
+def percentile(sorted_values, p):
+    """Percentil por posição (nearest-rank) de uma lista já ordenada."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))  # teto sem float
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def call_site():
+    """'arquivo.py:linha em função' do primeiro frame do projeto (fora daqui)."""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        filename = os.path.abspath(frame.filename)
+        if not filename.startswith(PROJECT_DIR) or filename == os.path.abspath(__file__):
+            continue
+        if f'{os.sep}site-packages{os.sep}' in filename or f'{os.sep}.venv{os.sep}' in filename:
+            continue
+        return f'{os.path.relpath(filename, PROJECT_DIR)}:{frame.lineno} em {frame.name}'
+    return '?'
+
+
+class RequestTimer:
+    """Acumuladores da requisição atual (guardado em `g`)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self._template_starts = []
+
+
+class EndpointStats:
+
+    def __init__(self, size):
+        self.count = 0
+        self.total_time = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.errors = 0
+        # (tempo total, tempo de SQL, queries, tempo de template)
+        self.samples = deque(maxlen=size)
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.enabled = True
+        self.slow_query_ms = 100.0
+        self.buffer_size = 1000
+        self._endpoints = {}
+        self._slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self._slow_total = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.slow_query_ms = float(app.config.get('METRICS_SLOW_QUERY_MS', 100))
+        self.buffer_size = int(app.config.get('METRICS_BUFFER_SIZE', 1000))
+        app.extensions['request_metrics'] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._template_started, app)
+        template_rendered.connect(self._template_finished, app)
+        # No Engine (classe): vale para o engine do Flask-SQLAlchemy e para
+        # os criados depois (workers da fila, benchmarks)
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+        if app.config.get('METRICS_ENDPOINT', False):
+            app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    # --- Requisição ---
+
+    def _start_request(self):
+        g.request_timer = RequestTimer()
+
+    def _finish_request(self, response):
+        timer = g.pop('request_timer', None)
+        if timer is None:
+            return response
+        elapsed = time.perf_counter() - timer.started
+        endpoint = request.endpoint or '(404)'
+        if endpoint != 'static':
+            self.record(endpoint, elapsed, timer, error=response.status_code >= 500)
+        response.headers.add('Server-Timing', ', '.join((
+            f'app;dur={elapsed * 1000:.1f}',
+            f'db;dur={timer.sql_time * 1000:.1f};desc="{timer.sql_count} queries"',
+            f'tpl;dur={timer.template_time * 1000:.1f}',
+        )))
+        return response
+
+    def record(self, endpoint, elapsed, timer, error=False):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats(self.buffer_size)
+            stats.count += 1
+            stats.total_time += elapsed
+            stats.sql_count += timer.sql_count
+            stats.sql_time += timer.sql_time
+            stats.template_time += timer.template_time
+            stats.errors += 1 if error else 0
+            stats.samples.append((elapsed, timer.sql_time, timer.sql_count, timer.template_time))
+
+    # --- Templates ---
+
+    def _template_started(self, sender, template, context, **extra):
+        timer = g.get('request_timer')
+        if timer is not None:
+            timer._template_starts.append(time.perf_counter())
+
+    def _template_finished(self, sender, template, context, **extra):
+        timer = g.get('request_timer')
+        if timer is not None and timer._template_starts:
+            started = timer._template_starts.pop()
+            if not timer._template_starts:  # render_template dentro de outro não conta 2x
+                timer.template_time += time.perf_counter() - started
+
+    # --- Queries lentas ---
+
+    def slow_query(self, statement, elapsed):
+        site = call_site()
+        endpoint = request.endpoint if has_request_context() else None
+        entry = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'ms': elapsed * 1000,
+            'endpoint': endpoint or '-',
+            'site': site,
+            'statement': ' '.join(statement.split()),
+        }
+        with self._lock:
+            self._slow_queries.append(entry)
+            self._slow_total += 1
+        print(f"Query lenta ({entry['ms']:.1f} ms) em {site} [{entry['endpoint']}]: {entry['statement']}")
+
+    # --- Leitura ---
+
+    def snapshot(self):
+        """Resumo por endpoint (ordenado pelo tempo total gasto)."""
+        with self._lock:
+            items = [(name, stats.count, stats.total_time, stats.sql_count, stats.sql_time,
+                      stats.template_time, stats.errors, list(stats.samples))
+                     for name, stats in self._endpoints.items()]
+        rows = []
+        for name, count, total_time, sql_count, sql_time, template_time, errors, samples in items:
+            times = sorted(sample[0] for sample in samples)
+            row = {
+                'endpoint': name,
+                'count': count,
+                'errors': errors,
+                'samples': len(samples),
+                'total_time': total_time,
+                'avg_ms': total_time / count * 1000,
+                'max_ms': times[-1] * 1000 if times else 0.0,
+                'avg_sql_count': sql_count / count,
+                'avg_sql_ms': sql_time / count * 1000,
+                'avg_template_ms': template_time / count * 1000,
+                'sql_count': sql_count,
+                'sql_time': sql_time,
+            }
+            for p in PERCENTILES:
+                row[f'p{p}_ms'] = percentile(times, p) * 1000
+            rows.append(row)
+        rows.sort(key=lambda row: row['total_time'], reverse=True)
+        return rows
+
+    def slow_queries(self):
+        with self._lock:
+            return list(reversed(self._slow_queries))
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._slow_queries.clear()
+            self._slow_total = 0
+
+    # --- /metrics (texto do Prometheus) ---
+
+    def prometheus_text(self):
+        rows = self.snapshot()
+        with self._lock:
+            slow_total = self._slow_total
+        lines = [
+            '# HELP oba_request_duration_seconds Tempo das requisições (quantis das últimas amostras).',
+            '# TYPE oba_request_duration_seconds summary',
+        ]
+        for row in rows:
+            label = f'endpoint="{row["endpoint"]}"'
+            for p in PERCENTILES:
+                lines.append(f'oba_request_duration_seconds{{{label},quantile="{p / 100:g}"}} '
+                             f'{row[f"p{p}_ms"] / 1000:.6f}')
+            lines.append(f'oba_request_duration_seconds_sum{{{label}}} {row["total_time"]:.6f}')
+            lines.append(f'oba_request_duration_seconds_count{{{label}}} {row["count"]}')
+
+        counters = (
+            ('oba_request_errors_total', 'Respostas 5xx.', 'errors', '{}'),
+            ('oba_sql_queries_total', 'Queries executadas.', 'sql_count', '{}'),
+            ('oba_sql_seconds_total', 'Tempo gasto em SQL.', 'sql_time', '{:.6f}'),
+        )
+        for name, help_text, key, fmt in counters:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for row in rows:
+                lines.append(f'{name}{{endpoint="{row["endpoint"]}"}} {fmt.format(row[key])}')
+        lines.append(f'# HELP oba_slow_queries_total Queries acima de {self.slow_query_ms:g} ms.')
+        lines.append('# TYPE oba_slow_queries_total counter')
+        lines.append(f'oba_slow_queries_total {slow_total}')
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        """Protegido: admin logado ou `Authorization: Bearer <METRICS_TOKEN>`."""
+        token = current_app.config.get('METRICS_TOKEN')
+        authorized = current_user.is_authenticated or (
+            token and request.headers.get('Authorization') == f'Bearer {token}'
+        )
+        if not authorized:
+            abort(403)
+        return Response(self.prometheus_text(), mimetype='text/plain; version=0.0.4')
+
+
+request_metrics = RequestMetrics()
+
+
+@contextmanager
+def timed_template():
+    """Soma o bloco ao tempo de template da requisição (renders sem sinal)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer = g.get('request_timer') if has_request_context() else None
+        if timer is not None and not timer._template_starts:
+            timer.template_time += time.perf_counter() - started
+
+
+# --- Eventos do SQLAlchemy ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if has_request_context():
+        timer = g.get('request_timer')
+        if timer is not None:
+            timer.sql_count += 1
+            timer.sql_time += elapsed
+    if elapsed * 1000 >= request_metrics.slow_query_ms:
+        request_metrics.slow_query(statement, elapsed)
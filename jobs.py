@@ -0,0 +1,272 @@
+# jobs.py
+import datetime
+import json
+import signal
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from models import Job
+
+
+# --- Fila de Tarefas em Segundo Plano ---
+# Trabalho lento disparado por um save do admin (gerar derivadas de
+# imagem, por exemplo) prendia o worker do gunicorn até terminar. Agora o
+# admin só grava uma linha na tabela `job`, na MESMA transação do save
+# (se o save falhar, a tarefa some junto), e responde na hora. O processo
+# `flask jobs worker` busca as tarefas e executa num ProcessPoolExecutor.
+#
+# Para criar uma tarefa:
+#
+#     @task('images.process')
+#     def process_image_task(directory, filename): ...
+#
+#     enqueue('images.process', {'directory': d, 'filename': f}, key=f'images.process:{f}')
+#
+# O payload precisa ser serializável em JSON. A função deve ser
+# idempotente: em caso de erro ela é executada de novo (com espera
+# crescente) até `max_attempts` vezes.
+
+PENDING = 'pendente'
+RUNNING = 'executando'
+DONE = 'concluido'
+FAILED = 'falhou'
+STATUSES = (PENDING, RUNNING, DONE, FAILED)
+
+BACKOFF_SECONDS = 5  # espera antes da 2ª tentativa; dobra a cada falha
+
+# Nome da tarefa -> função
+TASKS = {}
+
+
+def task(name):
+    def decorator(fn):
+        TASKS[name] = fn
+        return fn
+    return decorator
+
+
+def enqueue(task_name, payload=None, key=None, max_attempts=3, delay=0, session=None):
+    """
+    Enfileira uma tarefa na transação da sessão (commit junto com o resto).
+    Com `key`, uma tarefa ainda pendente/em execução com a mesma chave não
+    é duplicada; uma já concluída ou que falhou volta para a fila.
+    """
+    if task_name not in TASKS:
+        raise ValueError(f"Tarefa desconhecida: {task_name!r}")
+    now = datetime.datetime.now()
+    table = Job.__table__
+    stmt = sqlite_insert(table).values(
+        task=task_name,
+        payload=json.dumps(payload or {}, sort_keys=True),
+        idempotency_key=key,
+        status=PENDING,
+        attempts=0,
+        max_attempts=max_attempts,
+        run_after=now + datetime.timedelta(seconds=delay),
+        created_at=now,
+    )
+    if key is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['idempotency_key'],
+            set_={
+                'payload': stmt.excluded.payload,
+                'status': PENDING,
+                'attempts': 0,
+                'max_attempts': stmt.excluded.max_attempts,
+                'last_error': None,
+                'run_after': stmt.excluded.run_after,
+                'started_at': None,
+                'finished_at': None,
+            },
+            where=table.c.status.in_((DONE, FAILED)),
+        )
+    (session or db.session).execute(stmt)
+
+
+# --- Controle das Tarefas (usado pelo worker) ---
+
+def claim(limit, now=None):
+    """Marca até `limit` tarefas prontas como 'executando' e as retorna."""
+    now = now or datetime.datetime.now()
+    table = Job.__table__
+    ready = select(table.c.id).where(
+        table.c.status == PENDING, table.c.run_after <= now
+    ).order_by(table.c.id).limit(limit)
+    with db.engine.begin() as conn:
+        # UPDATE único: dois workers nunca pegam a mesma tarefa
+        return conn.execute(
+            update(table)
+            .where(table.c.id.in_(ready), table.c.status == PENDING)
+            .values(status=RUNNING, started_at=now, attempts=table.c.attempts + 1)
+            .returning(table.c.id, table.c.task, table.c.payload,
+                       table.c.attempts, table.c.max_attempts)
+        ).all()
+
+
+def finish(job, error=None, now=None):
+    """Registra o resultado de uma tarefa reivindicada por `claim()`."""
+    now = now or datetime.datetime.now()
+    table = Job.__table__
+    if error is None:
+        values = {'status': DONE, 'finished_at': now, 'last_error': None}
+    elif job.attempts < job.max_attempts:
+        delay = BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+        values = {'status': PENDING, 'last_error': error,
+                  'run_after': now + datetime.timedelta(seconds=delay)}
+    else:
+        values = {'status': FAILED, 'finished_at': now, 'last_error': error}
+    with db.engine.begin() as conn:
+        conn.execute(update(table).where(table.c.id == job.id).values(**values))
+    return values['status']
+
+
+def requeue_stale(timeout_seconds, now=None):
+    """Devolve à fila tarefas 'executando' de um worker que morreu no meio."""
+    now = now or datetime.datetime.now()
+    table = Job.__table__
+    with db.engine.begin() as conn:
+        return conn.execute(
+            update(table)
+            .where(table.c.status == RUNNING,
+                   table.c.started_at < now - datetime.timedelta(seconds=timeout_seconds))
+            .values(status=PENDING, run_after=now)
+        ).rowcount
+
+
+def retry(job_ids):
+    """Volta tarefas (que falharam) para a fila, zerando as tentativas."""
+    table = Job.__table__
+    with db.engine.begin() as conn:
+        return conn.execute(
+            update(table)
+            .where(table.c.id.in_(job_ids), table.c.status != RUNNING)
+            .values(status=PENDING, attempts=0, last_error=None, finished_at=None,
+                    run_after=datetime.datetime.now())
+        ).rowcount
+
+
+def status_counts():
+    table = Job.__table__
+    with db.engine.connect() as conn:
+        rows = conn.execute(select(table.c.status, func.count()).group_by(table.c.status)).all()
+    return {status: count for status, count in rows}
+
+
+# --- Processos Filhos do Pool ---
+# Cada processo monta a própria app (engine, caches, registro de tarefas)
+# uma vez só, no initializer, e executa as tarefas dentro do app_context.
+
+_worker_app = None
+
+
+def _init_worker():
+    global _worker_app
+    # Ctrl+C é tratado pelo processo principal, que espera as tarefas em curso
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from app import create_app
+    _worker_app = create_app()
+
+
+def _execute(task_name, payload):
+    """Roda a tarefa; retorna None ou o traceback (texto) do erro."""
+    try:
+        with _worker_app.app_context():
+            TASKS[task_name](**json.loads(payload))
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+def run_worker(processes=2, poll_interval=1.0, once=False, stale_after=600):
+    """
+    Laço principal: reivindica tarefas enquanto houver processos livres e
+    registra os resultados. Com `once`, sai quando não houver mais tarefas
+    prontas. SIGTERM/SIGINT encerram depois das tarefas em execução.
+    """
+    requeued = requeue_stale(stale_after)
+    if requeued:
+        print(f"{requeued} tarefa(s) presa(s) voltaram para a fila.")
+
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        print("Encerrando depois das tarefas em execução...")
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    running = {}  # future -> linha da tarefa
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as pool:
+        while True:
+            free = processes - len(running)
+            if free > 0 and not stopping:
+                for job in claim(free):
+                    try:
+                        running[pool.submit(_execute, job.task, job.payload)] = job
+                    except BrokenProcessPool as e:
+                        finish(job, f"Pool de processos quebrado: {e}")
+                        stopping = True
+
+            if not running:
+                if once or stopping:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    error = future.result()
+                except Exception as e:  # processo filho morreu (BrokenProcessPool)
+                    error = f"{type(e).__name__}: {e}"
+                    stopping = True
+                status = finish(job, error)
+                print(f"Tarefa #{job.id} {job.task}: {status}"
+                      + (f" (tentativa {job.attempts}/{job.max_attempts})" if error else ""))
+
+
+# --- Comandos CLI: flask jobs worker/status/retry-failed ---
+
+jobs_cli = AppGroup('jobs', help='Fila de tarefas em segundo plano.')
+
+
+@jobs_cli.command('worker')
+@click.option('--processes', '-p', type=int, default=None, help='Processos no pool (padrão: JOBS_PROCESSES).')
+@click.option('--poll', type=float, default=None, help='Segundos entre buscas na fila.')
+@click.option('--once', is_flag=True, help='Executa as tarefas prontas e sai.')
+def worker_command(processes, poll, once):
+    """Executa as tarefas da fila."""
+    processes = processes or current_app.config['JOBS_PROCESSES']
+    poll = poll or current_app.config['JOBS_POLL_INTERVAL']
+    print(f"Worker iniciado com {processes} processo(s). Tarefas: {', '.join(sorted(TASKS)) or '-'}")
+    run_worker(processes=processes, poll_interval=poll, once=once,
+               stale_after=current_app.config['JOBS_STALE_AFTER'])
+
+
+@jobs_cli.command('status')
+def status_command():
+    """Mostra quantas tarefas há em cada status."""
+    counts = status_counts()
+    for status in STATUSES:
+        print(f"  {status:<11} {counts.get(status, 0)}")
+
+
+@jobs_cli.command('retry-failed')
+def retry_failed_command():
+    """Volta para a fila todas as tarefas que falharam."""
+    table = Job.__table__
+    with db.engine.connect() as conn:
+        ids = conn.execute(select(table.c.id).where(table.c.status == FAILED)).scalars().all()
+    print(f"{retry(ids) if ids else 0} tarefa(s) de volta na fila.")
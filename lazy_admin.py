@@ -0,0 +1,113 @@
+# lazy_admin.py
+import threading
+
+from flask import Flask
+
+from extensions import db, login_manager, bcrypt
+import sqlite_tuning
+import images
+from assets import static_assets
+from instrumentation import request_metrics
+
+
+# --- Admin Montado Sob Demanda ---
+# O create_app() roda em cada worker do gunicorn, e montar o admin custa
+# caro: importar Flask-Admin, WTForms e CKEditor e construir uma ModelView
+# (com formulários e filtros) para cada modelo. A maioria dos workers só
+# atende a loja e nunca vê um /admin.
+#
+# Com ADMIN_LAZY (padrão), a loja sobe sem nada disso e o admin vira um
+# app Flask à parte, construído na primeira requisição a /admin. Ele fica
+# "montado" na frente da loja por um middleware WSGI (`LazyAdminDispatcher`).
+# Não dá para registrar as rotas do Flask-Admin na própria loja nesse
+# momento: o Flask recusa blueprints novos depois da primeira requisição.
+#
+# Os dois apps dividem a configuração, o banco, o login (mesma SECRET_KEY,
+# mesmo cookie de sessão) e as métricas. As rotas de um são espelhadas no
+# outro só para o url_for() funcionar (ex: o admin redireciona para
+# 'login'; a loja manda o login para 'admin.index').
+#
+# Com ADMIN_LAZY=0 o admin volta a ser montado no próprio create_app().
+
+PREFIX = '/admin'
+
+
+def create_admin_app(storefront):
+    """App do painel (rotas do Flask-Admin sob /admin) com a config da loja."""
+    # Imports pesados só aqui, na primeira requisição ao admin
+    from flask_ckeditor import CKEditor
+    from admin import init_admin
+
+    app = Flask(storefront.import_name,
+                static_folder=storefront.static_folder,
+                template_folder=storefront.template_folder)
+    app.config.from_mapping(storefront.config)
+
+    # Sem create_all/migrações e sem os serviços da loja (contadores,
+    # carrinho): já foram iniciados pelo create_app() deste processo, e os
+    # eventos de sessão (cache, preços, busca, estoque) são globais.
+    db.init_app(app)
+    sqlite_tuning.init_app(app, db)
+    request_metrics.init_app(app)
+    login_manager.init_app(app)
+    bcrypt.init_app(app)
+    CKEditor(app)
+    images.init_app(app)
+    static_assets.init_app(app)
+    init_admin(app)
+
+    mirror_url_rules(storefront, app, lambda rule: not rule.rule.startswith(PREFIX))
+    return app
+
+
+def mirror_url_rules(source, target, predicate):
+    """Copia as regras de `source` para `target` sem view (só para url_for)."""
+    existing = set(target.view_functions)
+    for rule in source.url_map.iter_rules():
+        if rule.endpoint in existing or not predicate(rule):
+            continue
+        target.add_url_rule(rule.rule, rule.endpoint, methods=rule.methods,
+                            defaults=rule.defaults, subdomain=rule.subdomain, host=rule.host)
+
+
+def register_placeholder(app):
+    """Endpoint 'admin.index' na loja, para o url_for() antes do admin existir."""
+    app.add_url_rule(f'{PREFIX}/', 'admin.index')
+
+
+class LazyAdminDispatcher:
+    """
+    Middleware WSGI: /admin e /admin/... vão para o app do admin (criado
+    na primeira vez por `factory()`); o resto segue para a loja.
+    """
+
+    def __init__(self, storefront_wsgi, factory, prefix=PREFIX):
+        self.storefront_wsgi = storefront_wsgi
+        self.factory = factory
+        self.prefix = prefix
+        self._admin = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._admin is not None
+
+    def admin_app(self):
+        if self._admin is None:
+            with self._lock:
+                if self._admin is None:
+                    self._admin = self.factory()
+        return self._admin
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path == self.prefix or path.startswith(self.prefix + '/'):
+            return self.admin_app()(environ, start_response)
+        return self.storefront_wsgi(environ, start_response)
+
+
+def init_app(app):
+    """Liga o admin sob demanda na loja (ver ADMIN_LAZY no app.py)."""
+    register_placeholder(app)
+    app.wsgi_app = LazyAdminDispatcher(app.wsgi_app, lambda: create_admin_app(app))
+    app.extensions['lazy_admin'] = app.wsgi_app
@@ -0,0 +1,187 @@
+# migrations.py
+from flask.cli import AppGroup
+
+from extensions import db
+
+
+# --- Migrações de Schema ---
+# `db.create_all()` só cria tabelas novas: não adiciona índices nem colunas
+# em tabelas que já existem no banco de produção. As migrações abaixo
+# cobrem essa parte. A versão aplicada fica em `PRAGMA user_version`
+# e cada migração roda uma única vez, em ordem, dentro de uma transação.
+#
+# Para criar uma nova: escreva uma função que recebe a conexão sqlite3,
+# decore com @migration(<próximo número>, '<descrição>') e pronto.
+# Use sempre IF NOT EXISTS / checagens, pois num banco novo o
+# `create_all()` já pode ter criado o objeto declarado em models.py.
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+def column_exists(conn, table, column):
+    """Útil para migrações que adicionam colunas (ALTER TABLE ... ADD COLUMN)."""
+    return any(row[1] == column for row in conn.execute(f'PRAGMA table_info("{table}")'))
+
+
+@migration(1, 'Índices das colunas de filtro/ordenação mais usadas')
+def add_hot_column_indexes(conn):
+    statements = [
+        # Dashboard: status + período (COUNT, SUM, GROUP BY status/dia)
+        'CREATE INDEX IF NOT EXISTS ix_order_status_created_at ON "order" (status, created_at, total_price)',
+        'CREATE INDEX IF NOT EXISTS ix_order_created_at ON "order" (created_at)',
+        # Listagem da loja (WHERE active ORDER BY name, id)
+        'CREATE INDEX IF NOT EXISTS ix_product_active_name_id ON product (active, name, id)',
+        # Ordenações feitas em toda renderização da home/header
+        'CREATE INDEX IF NOT EXISTS ix_circular_category_section_order ON circular_category (section, "order")',
+        'CREATE INDEX IF NOT EXISTS ix_banner_order ON banner ("order")',
+        'CREATE INDEX IF NOT EXISTS ix_header_category_order ON header_category ("order")',
+        # Joins de estoque e de categoria/promoção a partir do produto
+        'CREATE INDEX IF NOT EXISTS ix_variation_product_id ON variation (product_id)',
+        'CREATE INDEX IF NOT EXISTS ix_product_category_association_category_id '
+        'ON product_category_association (category_id, product_id)',
+        'CREATE INDEX IF NOT EXISTS ix_promotion_product_association_product_id '
+        'ON promotion_product_association (product_id, promotion_id)',
+    ]
+    for sql in statements:
+        conn.execute(sql)
+    conn.execute('ANALYZE')
+
+
+@migration(2, 'Preenche o resumo diário de pedidos (order_daily_stats)')
+def backfill_order_daily_stats(conn):
+    from rollups import REBUILD_SQL
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS order_daily_stats ('
+        'day DATE NOT NULL, status VARCHAR(30) NOT NULL, '
+        'count INTEGER NOT NULL, revenue FLOAT NOT NULL, '
+        'PRIMARY KEY (day, status))'
+    )
+    conn.execute('DELETE FROM order_daily_stats')
+    conn.execute(REBUILD_SQL)
+
+
+@migration(3, 'Índice de busca de produtos (FTS5)')
+def create_product_search_index(conn):
+    import search
+    search.create_index(conn)
+    search.reindex(conn)
+
+
+@migration(4, 'Resumo de estoque no produto (colunas + triggers) e reservas')
+def add_stock_summary(conn):
+    import stock
+    if not column_exists(conn, 'product', 'total_stock'):
+        conn.execute('ALTER TABLE product ADD COLUMN total_stock INTEGER NOT NULL DEFAULT 0')
+    if not column_exists(conn, 'product', 'in_stock'):
+        conn.execute('ALTER TABLE product ADD COLUMN in_stock BOOLEAN NOT NULL DEFAULT 0')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS stock_reservation ('
+        'id INTEGER NOT NULL PRIMARY KEY, '
+        'order_id INTEGER NOT NULL REFERENCES "order" (id), '
+        'variation_id INTEGER NOT NULL REFERENCES variation (id), '
+        'quantity INTEGER NOT NULL, created_at DATETIME NOT NULL, '
+        'expires_at DATETIME, released_at DATETIME)'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_stock_reservation_order_id ON stock_reservation (order_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_stock_reservation_released_expires '
+                 'ON stock_reservation (released_at, expires_at)')
+    stock.create_triggers(conn)
+    stock.refresh_summary(conn)
+
+
+@migration(5, 'Itens de pedido (order_item) a partir do items_summary')
+def add_order_items(conn):
+    import order_items
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS order_item ('
+        'id INTEGER NOT NULL PRIMARY KEY, '
+        'order_id INTEGER NOT NULL REFERENCES "order" (id), '
+        'variation_id INTEGER REFERENCES variation (id), '
+        'product_id INTEGER REFERENCES product (id), '
+        'product_name VARCHAR(150) NOT NULL, size VARCHAR(50), '
+        'quantity INTEGER NOT NULL, unit_price FLOAT NOT NULL, '
+        'promotion_id INTEGER REFERENCES promotion (id))'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_order_item_order_id '
+                 'ON order_item (order_id, product_id, quantity, unit_price)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_order_item_product_id ON order_item (product_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_order_item_promotion_id ON order_item (promotion_id)')
+    order_items.backfill(conn)
+
+
+# --- Execução ---
+
+def current_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations(engine=None, verbose=False):
+    """
+    Aplica as migrações pendentes. Seguro para vários workers subindo ao
+    mesmo tempo: o BEGIN IMMEDIATE faz os outros esperarem e, quando
+    conseguem o lock, já encontram a versão atualizada.
+    """
+    engine = engine or db.engine
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        previous_isolation = conn.isolation_level
+        conn.isolation_level = None  # Nós controlamos BEGIN/COMMIT
+        try:
+            applied = []
+            for version, description, fn in MIGRATIONS:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    if current_version(conn) >= version:
+                        conn.execute('ROLLBACK')
+                        continue
+                    fn(conn)
+                    conn.execute(f'PRAGMA user_version = {int(version)}')
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+                applied.append((version, description))
+                if verbose:
+                    print(f"Migração {version} aplicada: {description}")
+            return applied
+        finally:
+            conn.isolation_level = previous_isolation
+    finally:
+        raw.close()
+
+
+# --- Comandos CLI: flask migrations upgrade/status ---
+
+migrations_cli = AppGroup('migrations', help='Migrações do schema do banco.')
+
+
+@migrations_cli.command('upgrade')
+def upgrade_command():
+    """Aplica as migrações pendentes."""
+    db.create_all()
+    applied = run_migrations(verbose=True)
+    if not applied:
+        print("Nenhuma migração pendente.")
+
+
+@migrations_cli.command('status')
+def status_command():
+    """Mostra a versão do banco e as migrações pendentes."""
+    raw = db.engine.raw_connection()
+    try:
+        version = current_version(raw.driver_connection)
+    finally:
+        raw.close()
+    print(f"Versão atual do banco: {version}")
+    for number, description, _ in MIGRATIONS:
+        mark = 'x' if number <= version else ' '
+        print(f"  [{mark}] {number:03d} {description}")
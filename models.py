@@ -8,12 +8,15 @@ import datetime
 # Esta tabela "liga" produtos a categorias
 product_category_association = db.Table('product_category_association',
     db.Column('product_id', db.Integer, db.ForeignKey('product.id'), primary_key=True),
-    db.Column('category_id', db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    db.Column('category_id', db.Integer, db.ForeignKey('category.id'), primary_key=True),
+    # A PK começa por product_id; este índice atende "produtos da categoria X"
+    db.Index('ix_product_category_association_category_id', 'category_id', 'product_id')
 )
 
 promotion_product_association = db.Table('promotion_product_association',
     db.Column('promotion_id', db.Integer, db.ForeignKey('promotion.id'), primary_key=True),
-    db.Column('product_id', db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    db.Column('product_id', db.Integer, db.ForeignKey('product.id'), primary_key=True),
+    db.Index('ix_promotion_product_association_product_id', 'product_id', 'promotion_id')
 )
 
 class Promotion(db.Model):
@@ -39,10 +42,14 @@ class Promotion(db.Model):
     @property
     def is_currently_active(self):
         """Verifica se a promoção está ativa E dentro da data"""
+        return self.is_active_at()
+
+    def is_active_at(self, now=None):
+        """Mesma regra de `is_currently_active`, mas num instante qualquer."""
         if not self.is_active:
             return False
         
-        now = datetime.datetime.now()
+        now = now or datetime.datetime.now()
         # Se tem data de início e ainda não começou
         if self.start_date and now < self.start_date:
             return False
@@ -72,7 +79,7 @@ class HeaderCategory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
-    order = db.Column(db.Integer, default=0)
+    order = db.Column(db.Integer, default=0, index=True)
     def __str__(self): return self.name
     category = db.relationship('Category', backref='header_links', lazy=True)
 
@@ -84,6 +91,9 @@ class HeaderCategory(db.Model):
     
 # Modelos para as Categorias Circulares (Bolinhas) (sem alterações)
 class CircularCategory(db.Model):
+    __table_args__ = (
+        db.Index('ix_circular_category_section_order', 'section', 'order'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     image_url = db.Column(db.String(200), nullable=False)
@@ -107,13 +117,17 @@ class Banner(db.Model):
     link_url = db.Column(db.String(200), default="#", nullable=True)
     title = db.Column(db.String(150))
     subtitle = db.Column(db.String(200))
-    order = db.Column(db.Integer, default=0)
+    order = db.Column(db.Integer, default=0, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=True)
     product = db.relationship('Product', backref='banners', lazy=True)
     def __str__(self): return self.title or f"Banner {self.id}"
 
 # --- 3. MODELO DE PRODUTO ATUALIZADO ---
 class Product(db.Model):
+    __table_args__ = (
+        # Listagem: WHERE active ORDER BY name, id (paginação por keyset)
+        db.Index('ix_product_active_name_id', 'active', 'name', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
     description = db.Column(db.Text, nullable=True)
@@ -123,6 +137,10 @@ class Product(db.Model):
     active = db.Column(db.Boolean, default=True)
     cart_add_count = db.Column(db.Integer, default=0)
 
+    # Resumo das variações, mantido por triggers do SQLite (ver stock.py)
+    total_stock = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    in_stock = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
+
     view_count = db.Column(db.Integer, default=0) 
     
     categories = relationship('Category', ...)
@@ -138,48 +156,99 @@ class Product(db.Model):
     
     variations = relationship('Variation', backref='product', lazy=True, cascade='all, delete-orphan')
 
-    @property
-    def active_promotion(self):
-        """Encontra a primeira promoção ativa para este produto."""
+    # Preço efetivo pré-calculado (ver pricing.py)
+    effective_price = relationship('ProductPrice', uselist=False, viewonly=True)
+
+    def compute_active_promotion(self, now=None):
+        """Percorre as promoções e encontra a primeira ativa (cálculo completo)."""
         if not self.promotions:
             return None
         
         for promo in self.promotions:
-            if promo.is_currently_active:
+            if promo.is_active_at(now):
                 return promo # Retorna a primeira promoção válida
         return None
 
-    @property
-    def is_on_sale(self):
-        """Retorna True se houver uma promoção ativa."""
-        return self.active_promotion is not None
-
-    @property
-    def current_price(self):
-        """Retorna o preço final (promocional ou cheio)."""
-        promo = self.active_promotion
+    def compute_price(self, promo):
+        """Aplica o desconto da promoção (se houver) ao preço cheio."""
         if promo:
             # Calcula o desconto
             discount_factor = 1.0 - (promo.discount_percent / 100.0)
             return round(self.price * discount_factor, 2)
         
         return self.price
-    
+
+    def _fresh_effective_price(self):
+        """Retorna a linha da tabela de preços se ela ainda estiver válida."""
+        effective = self.effective_price
+        if effective is not None and effective.is_valid():
+            return effective
+        return None
+
+    @property
+    def active_promotion(self):
+        """Encontra a primeira promoção ativa para este produto."""
+        effective = self._fresh_effective_price()
+        if effective is not None:
+            return effective.promotion
+        return self.compute_active_promotion()
+
     @property
-    def total_stock(self):
-        if not self.variations:
-            return 0
-        return sum(var.stock for var in self.variations)
+    def is_on_sale(self):
+        """Retorna True se houver uma promoção ativa."""
+        effective = self._fresh_effective_price()
+        if effective is not None:
+            return effective.promotion_id is not None
+        return self.compute_active_promotion() is not None
+
+    @property
+    def active_promotion_id(self):
+        """Id da promoção ativa, sem carregar a promoção (pedido/itens)."""
+        effective = self._fresh_effective_price()
+        if effective is not None:
+            return effective.promotion_id
+        promo = self.compute_active_promotion()
+        return promo.id if promo else None
 
+    @property
+    def current_price(self):
+        """Retorna o preço final (promocional ou cheio)."""
+        effective = self._fresh_effective_price()
+        if effective is not None:
+            return effective.current_price
+        return self.compute_price(self.compute_active_promotion())
+    
     def __str__(self):
         return self.name
 
+# --- Projeção do Preço Efetivo ---
+# Uma linha por produto com o preço final já calculado. Mantida por
+# pricing.py sempre que um Produto/Promoção muda ou quando uma data de
+# início/fim de promoção passa (`valid_until`).
+class ProductPrice(db.Model):
+    __tablename__ = 'product_price'
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    current_price = db.Column(db.Float, nullable=False, index=True)
+    promotion_id = db.Column(db.Integer, db.ForeignKey('promotion.id'), nullable=True, index=True)
+    # Próxima data em que alguma promoção do produto começa/termina
+    valid_until = db.Column(db.DateTime, nullable=True, index=True)
+
+    promotion = relationship('Promotion', viewonly=True)
+
+    def is_valid(self, now=None):
+        if self.valid_until is None:
+            return True
+        return (now or datetime.datetime.now()) < self.valid_until
+
+    def __str__(self):
+        return f"Produto #{self.product_id}: R$ {self.current_price:.2f}"
+
 # Novo Modelo para Variações (Tamanho/Estoque) (sem alterações)
 class Variation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     size = db.Column(db.String(50), nullable=False)
     stock = db.Column(db.Integer, nullable=False, default=0)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
     
     def __str__(self):
         return f"{self.product.name} - {self.size} ({self.stock} unid.)"
@@ -216,8 +285,13 @@ class FooterLink(db.Model):
     def __str__(self): return f"{self.title} (Coluna {self.column})"
 
 class Order(db.Model):
+    __table_args__ = (
+        # Dashboard: filtra por status e período, agrupa por dia.
+        # total_price no fim deixa o índice "cobrindo" a soma da receita
+        db.Index('ix_order_status_created_at', 'status', 'created_at', 'total_price'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    created_at = db.Column(db.DateTime, default=datetime.datetime.now)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.now, index=True)
     total_price = db.Column(db.Float, nullable=False)
     
     # Salva os itens do carrinho como um texto simples
@@ -228,9 +302,104 @@ class Order(db.Model):
 
     status = db.Column(db.String(30), nullable=False, default='Pendente')
 
+    # Itens estruturados (items_summary continua para o WhatsApp/listagem)
+    items = relationship('OrderItem', backref='order', cascade='all, delete-orphan',
+                         order_by='OrderItem.id')
+
     def __str__(self):
         return f"Pedido #{self.id} - R${self.total_price:.2f} ({self.status})"
 
+# --- Itens do Pedido ---
+# Uma linha por item do carrinho, gravadas em lote pelo checkout (ver
+# order_items.py). Nome e tamanho ficam copiados: o relatório continua
+# certo mesmo se o produto for renomeado ou apagado depois.
+class OrderItem(db.Model):
+    __tablename__ = 'order_item'
+    __table_args__ = (
+        # Receita por produto/tamanho/promoção: agrega a partir dos pedidos
+        # do período (ix_order_status_created_at) e chega nos itens por aqui;
+        # as colunas somadas no índice evitam ler a tabela
+        db.Index('ix_order_item_order_id', 'order_id', 'product_id', 'quantity', 'unit_price'),
+        db.Index('ix_order_item_product_id', 'product_id'),
+        db.Index('ix_order_item_promotion_id', 'promotion_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    # Vazios em itens históricos cujo produto/tamanho não existe mais
+    variation_id = db.Column(db.Integer, db.ForeignKey('variation.id'), nullable=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=True)
+    product_name = db.Column(db.String(150), nullable=False)
+    size = db.Column(db.String(50), nullable=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_price = db.Column(db.Float, nullable=False)  # já com o desconto
+    promotion_id = db.Column(db.Integer, db.ForeignKey('promotion.id'), nullable=True)
+
+    product = relationship('Product')
+    promotion = relationship('Promotion')
+
+    @property
+    def subtotal(self):
+        return self.unit_price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product_name} ({self.size})"
+
+# --- Reservas de Estoque ---
+# Quantidade baixada do estoque por um pedido (ver stock.py). Enquanto
+# `released_at` estiver vazio, cancelar o pedido devolve a quantidade.
+class StockReservation(db.Model):
+    __tablename__ = 'stock_reservation'
+    __table_args__ = (
+        # `flask stock release-expired`: reservas ativas já vencidas
+        db.Index('ix_stock_reservation_released_expires', 'released_at', 'expires_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    variation_id = db.Column(db.Integer, db.ForeignKey('variation.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    expires_at = db.Column(db.DateTime, nullable=True)
+    released_at = db.Column(db.DateTime, nullable=True)
+
+    def __str__(self):
+        state = 'liberada' if self.released_at else 'ativa'
+        return f"Pedido #{self.order_id}: {self.quantity}x variação #{self.variation_id} ({state})"
+
+# --- Resumo Diário de Pedidos (para o Dashboard) ---
+# Uma linha por (dia, status) com quantidade e receita. Mantida de forma
+# incremental a cada pedido inserido/alterado (ver rollups.py).
+class OrderDailyStat(db.Model):
+    __tablename__ = 'order_daily_stats'
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(30), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.count} pedido(s), R$ {self.revenue:.2f}"
+
+# --- Carrinhos (guardados no servidor) ---
+# O cookie leva só o `id`; os itens ficam aqui (ver cart_store.py).
+# Carrinhos vencidos com itens viram 'abandonado' e os que viraram
+# pedido, 'convertido' (métricas do dashboard).
+class Cart(db.Model):
+    __table_args__ = (
+        # Varredura: abertos já vencidos; dashboard: status x período
+        db.Index('ix_cart_status_expires_at', 'status', 'expires_at'),
+        db.Index('ix_cart_status_updated_at', 'status', 'updated_at'),
+    )
+    id = db.Column(db.String(32), primary_key=True)
+    items = db.Column(db.Text, nullable=False, default='{}')  # JSON {variation_id: qtd}
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='aberto')
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __str__(self):
+        return f"Carrinho {self.id[:8]} ({self.item_count} itens, {self.status})"
+
 # --- NOVO MODELO 2: Estatísticas do Site ---
 # Um lugar simples para guardar contadores (ex: "total_visitas")
 class SiteStat(db.Model):
@@ -241,6 +410,57 @@ class SiteStat(db.Model):
     def __str__(self):
         return f"{self.key}: {self.value}"
 
+# --- Fila de Tarefas em Segundo Plano ---
+# Trabalho pesado disparado pelo admin (ex: gerar derivadas de imagens)
+# entra aqui e é executado pelo `flask jobs worker` (ver jobs.py).
+class Job(db.Model):
+    __table_args__ = (
+        # O worker busca "pendentes cujo horário já chegou", em ordem
+        db.Index('ix_job_status_run_after', 'status', 'run_after', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    # Enfileirar de novo com a mesma chave não duplica a tarefa
+    idempotency_key = db.Column(db.String(255), unique=True, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pendente')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    last_error = db.Column(db.Text, nullable=True)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __str__(self):
+        return f"Tarefa #{self.id} {self.task} ({self.status})"
+
+# --- Notificações de Pedido (outbox) ---
+# Gravada na mesma transação do pedido e entregue pelo
+# `flask outbox dispatch` aos canais configurados (ver outbox.py).
+class OutboxMessage(db.Model):
+    __tablename__ = 'outbox'
+    __table_args__ = (
+        # O dispatcher busca "pendentes cujo horário já chegou", em ordem
+        db.Index('ix_outbox_status_run_after', 'status', 'run_after', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    event = db.Column(db.String(50), nullable=False)  # ex: 'pedido.criado'
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(20), nullable=False, default='pendente')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Canais que já receberam a mensagem (JSON): a nova tentativa só
+    # reenvia para os que falharam
+    delivered = db.Column(db.Text, nullable=False, default='[]')
+    last_error = db.Column(db.Text, nullable=True)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    started_at = db.Column(db.DateTime, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def __str__(self):
+        return f"Notificação #{self.id} {self.event} ({self.status})"
+
 # --- 4. MODELO DE USUÁRIO PARA AUTENTICAÇÃO ---
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
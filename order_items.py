@@ -0,0 +1,143 @@
+# order_items.py
+import re
+
+from sqlalchemy import func, insert, select
+
+from extensions import db
+from models import Order, OrderItem, Promotion
+
+
+# --- Itens do Pedido ---
+# `Order.items_summary` é um texto ("2x Vestido (M), 1x Saia (G)"): o
+# "top produtos" do dashboard tinha que usar Product.cart_add_count e a
+# busca de pedidos por produto era um LIKE na tabela inteira.
+#
+# Agora `criar_pedido()` grava também uma linha por item em `order_item`
+# (um único executemany, com preço unitário e promoção do momento) e os
+# relatórios viram agregações indexadas: pedidos do período
+# (ix_order_status_created_at) -> itens (ix_order_item_order_id).
+#
+# Pedidos antigos ganham itens pela migração 5, que lê o items_summary
+# (`backfill()`). O texto não tem preço por item: o total do pedido é
+# dividido proporcionalmente ao preço atual de cada produto.
+
+# Status que contam como venda nos relatórios (igual à receita do dashboard)
+SOLD = ('Concluído',)
+
+# "2x Vestido Ankara (M)"; o nome pode ter parênteses ("Vestido (Cópia) (M)")
+SUMMARY_ITEM = re.compile(r'(\d+)x (.+?) \(([^()]*)\)(?:, |$)')
+
+
+def record(lines, order, session=None):
+    """Grava os itens (CartLine) do pedido na transação da sessão."""
+    session = session or db.session
+    if order.id is None:
+        session.flush()
+    session.execute(insert(OrderItem.__table__), [{
+        'order_id': order.id,
+        'variation_id': line.variation.id,
+        'product_id': line.product.id,
+        'product_name': line.product.name,
+        'size': line.variation.size,
+        'quantity': line.quantity,
+        'unit_price': line.unit_price,
+        'promotion_id': line.promotion_id,
+    } for line in lines])
+
+
+# --- Pedidos Antigos (items_summary) ---
+
+def parse_summary(summary):
+    """[(quantidade, nome, tamanho)] do items_summary; [] se fugir do formato."""
+    summary = (summary or '').strip()
+    items, position = [], 0
+    for match in SUMMARY_ITEM.finditer(summary):
+        if match.start() != position:
+            return []
+        items.append((int(match.group(1)), match.group(2), match.group(3)))
+        position = match.end()
+    return items if position == len(summary) else []
+
+
+def _unit_prices(total, items, products):
+    """Divide o total do pedido entre os itens, proporcional ao preço atual."""
+    prices = [products[name][1] if name in products else None for _, name, _ in items]
+    known = [price for price in prices if price]
+    # Produto que não existe mais: preço médio dos outros itens
+    fallback = sum(known) / len(known) if known else 1.0
+    weights = [price or fallback for price in prices]
+    base = sum(quantity * weight for (quantity, _, _), weight in zip(items, weights))
+    factor = (total or 0) / base if base else 0
+    return [round(weight * factor, 2) for weight in weights]
+
+
+def backfill(conn):
+    """
+    Cria os itens dos pedidos que ainda não têm, a partir do items_summary
+    (conexão sqlite3, usada pela migração). Produto e variação são achados
+    pelo nome e tamanho; sem correspondência, ficam vazios. Retorna
+    (pedidos convertidos, itens criados, pedidos ignorados).
+    """
+    # Nomes repetidos: fica o produto mais antigo
+    products = {name: (product_id, price) for product_id, name, price in
+                conn.execute('SELECT id, name, price FROM product ORDER BY id DESC')}
+    variations = {(product_id, size): variation_id for variation_id, product_id, size in
+                  conn.execute('SELECT id, product_id, size FROM variation ORDER BY id DESC')}
+    orders = conn.execute(
+        'SELECT id, total_price, items_summary FROM "order" o '
+        'WHERE items_summary IS NOT NULL AND items_summary != \'\' '
+        'AND NOT EXISTS (SELECT 1 FROM order_item i WHERE i.order_id = o.id)'
+    ).fetchall()
+
+    rows, converted, skipped = [], 0, 0
+    for order_id, total, summary in orders:
+        items = parse_summary(summary)
+        if not items:
+            skipped += 1
+            continue
+        converted += 1
+        for (quantity, name, size), unit_price in zip(items, _unit_prices(total, items, products)):
+            product_id = products[name][0] if name in products else None
+            rows.append((order_id, variations.get((product_id, size)), product_id,
+                         name[:150], size[:50], quantity, unit_price))
+    conn.executemany(
+        'INSERT INTO order_item (order_id, variation_id, product_id, product_name, size, quantity, unit_price) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+    )
+    return converted, len(rows), skipped
+
+
+# --- Relatórios ---
+
+def _report(key, label, start_date, end_date, limit=None, outerjoin=None):
+    """[(rótulo, quantidade, receita)] agrupado por `key`, maior receita primeiro."""
+    revenue = func.sum(OrderItem.quantity * OrderItem.unit_price)
+    query = (
+        select(label, func.sum(OrderItem.quantity), revenue)
+        .select_from(Order)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.status.in_(SOLD), Order.created_at.between(start_date, end_date))
+        .group_by(key)
+        .order_by(revenue.desc())
+    )
+    if outerjoin is not None:
+        query = query.outerjoin(*outerjoin)
+    if limit:
+        query = query.limit(limit)
+    return db.session.execute(query).all()
+
+
+def top_products(start_date, end_date, limit=5):
+    # Itens antigos sem produto correspondente agrupam pelo nome
+    key = func.coalesce(OrderItem.product_id, OrderItem.product_name)
+    return _report(key, func.max(OrderItem.product_name), start_date, end_date, limit)
+
+
+def revenue_by_size(start_date, end_date):
+    size = func.coalesce(OrderItem.size, '-')
+    return _report(size, size, start_date, end_date)
+
+
+def revenue_by_promotion(start_date, end_date):
+    return _report(OrderItem.promotion_id, func.coalesce(Promotion.name, 'Sem promoção'),
+                   start_date, end_date, outerjoin=(Promotion, Promotion.id == OrderItem.promotion_id))
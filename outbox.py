@@ -0,0 +1,416 @@
+# outbox.py
+import asyncio
+import datetime
+import json
+import signal
+import smtplib
+import urllib.request
+from email.message import EmailMessage
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, delete, func, insert, select, update
+
+from extensions import db
+from models import OutboxMessage
+
+
+# --- Notificações de Pedido (outbox) ---
+# A loja só ficava sabendo de um pedido novo olhando o dashboard. Avisar
+# direto do checkout (webhook, e-mail...) deixaria a finalização do pedido
+# tão lenta quanto o canal mais lento, e um canal fora do ar derrubaria o
+# checkout ou perderia o aviso.
+#
+# Agora `criar_pedido()` só grava uma linha na tabela `outbox`, na MESMA
+# transação do pedido (se o pedido falhar, o aviso some junto). O processo
+# `flask outbox dispatch` (asyncio) busca as mensagens em lotes e entrega
+# cada uma a todos os canais ao mesmo tempo. Um canal que falha não atrasa
+# os outros: a mensagem volta para a fila com espera crescente e a nova
+# tentativa só reenvia para os canais que ainda não receberam.
+#
+# Canais (OUTBOX_SINKS, separados por vírgula):
+#   webhook -> POST JSON em OUTBOX_WEBHOOK_URL
+#   email   -> SMTP em OUTBOX_SMTP_HOST:OUTBOX_SMTP_PORT (ex: um servidor
+#              local de testes como `python -m aiosmtpd -n -l localhost:1025`)
+#   log     -> uma linha JSON por mensagem em OUTBOX_LOG_PATH
+#
+# Para criar um canal novo:
+#
+#     @sink('telegram')
+#     class TelegramSink:
+#         def __init__(self, config): ...
+#         async def send(self, message): ...   # levanta exceção se falhar
+
+PENDING = 'pendente'
+SENDING = 'enviando'
+SENT = 'enviado'
+FAILED = 'falhou'
+STATUSES = (PENDING, SENDING, SENT, FAILED)
+
+ORDER_CREATED = 'pedido.criado'
+
+BACKOFF_SECONDS = 5  # espera antes da 2ª tentativa; dobra a cada falha
+MAX_BACKOFF_SECONDS = 3600
+
+# Nome do canal -> classe
+SINKS = {}
+
+
+def sink(name):
+    def decorator(cls):
+        cls.name = name
+        SINKS[name] = cls
+        return cls
+    return decorator
+
+
+def publish(event, payload, session=None):
+    """Grava a mensagem na transação da sessão (commit junto com o resto)."""
+    now = datetime.datetime.now()
+    (session or db.session).execute(insert(OutboxMessage.__table__).values(
+        event=event,
+        payload=json.dumps(payload, sort_keys=True, default=str),
+        status=PENDING,
+        attempts=0,
+        delivered='[]',
+        run_after=now,
+        created_at=now,
+    ))
+
+
+def publish_order_created(order, session=None):
+    """Aviso de pedido novo (o pedido já precisa ter id: faça flush antes)."""
+    publish(ORDER_CREATED, {
+        'order_id': order.id,
+        'created_at': order.created_at,
+        'total_price': order.total_price,
+        'items_summary': order.items_summary,
+        'whatsapp_url': order.whatsapp_url,
+    }, session)
+
+
+def render_text(message):
+    """Assunto e corpo legíveis da mensagem (e-mail)."""
+    payload = message['payload']
+    if message['event'] == ORDER_CREATED:
+        subject = f"Novo pedido #{payload['order_id']} - R$ {payload['total_price']:.2f}"
+        body = (f"{subject}\n\n{payload.get('items_summary') or ''}\n\n"
+                f"Conversa no WhatsApp: {payload.get('whatsapp_url') or '-'}\n")
+        return subject, body
+    return message['event'], json.dumps(payload, indent=2, ensure_ascii=False)
+
+
+# --- Canais ---
+# As bibliotecas usadas (urllib, smtplib) são bloqueantes: cada envio roda
+# numa thread (asyncio.to_thread) e o laço continua livre para os outros.
+
+@sink('webhook')
+class WebhookSink:
+    def __init__(self, config):
+        self.url = config.get('OUTBOX_WEBHOOK_URL')
+        if not self.url:
+            raise ValueError('Canal webhook sem OUTBOX_WEBHOOK_URL.')
+        self.timeout = config['OUTBOX_SINK_TIMEOUT']
+
+    async def send(self, message):
+        await asyncio.to_thread(self._post, message)
+
+    def _post(self, message):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(message, ensure_ascii=False).encode('utf-8'),
+            method='POST',
+            headers={
+                'Content-Type': 'application/json',
+                # Reenvios da mesma mensagem têm a mesma chave
+                'Idempotency-Key': f"outbox-{message['id']}",
+            },
+        )
+        # Respostas 4xx/5xx levantam HTTPError
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+@sink('email')
+class EmailSink:
+    def __init__(self, config):
+        self.recipients = [r.strip() for r in (config.get('OUTBOX_EMAIL_TO') or '').split(',') if r.strip()]
+        if not self.recipients:
+            raise ValueError('Canal email sem OUTBOX_EMAIL_TO.')
+        self.sender = config['OUTBOX_EMAIL_FROM']
+        self.host = config['OUTBOX_SMTP_HOST']
+        self.port = config['OUTBOX_SMTP_PORT']
+        self.timeout = config['OUTBOX_SINK_TIMEOUT']
+
+    async def send(self, message):
+        await asyncio.to_thread(self._send, message)
+
+    def _send(self, message):
+        subject, body = render_text(message)
+        email = EmailMessage()
+        email['Subject'] = subject
+        email['From'] = self.sender
+        email['To'] = ', '.join(self.recipients)
+        email.set_content(body)
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(email)
+
+
+@sink('log')
+class LogFileSink:
+    def __init__(self, config):
+        self.path = config['OUTBOX_LOG_PATH']
+
+    async def send(self, message):
+        await asyncio.to_thread(self._append, message)
+
+    def _append(self, message):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(message, ensure_ascii=False) + '\n')
+
+
+def build_sinks(config):
+    """Instancia os canais de OUTBOX_SINKS (ValueError se algum for inválido)."""
+    names = [n.strip() for n in config['OUTBOX_SINKS'].split(',') if n.strip()]
+    unknown = [n for n in names if n not in SINKS]
+    if unknown:
+        raise ValueError(f"Canal desconhecido: {', '.join(unknown)} (disponíveis: {', '.join(sorted(SINKS))})")
+    return [SINKS[name](config) for name in names]
+
+
+# --- Controle das Mensagens (usado pelo dispatcher) ---
+
+def claim(limit, now=None):
+    """Marca até `limit` mensagens prontas como 'enviando' e as retorna."""
+    now = now or datetime.datetime.now()
+    table = OutboxMessage.__table__
+    ready = select(table.c.id).where(
+        table.c.status == PENDING, table.c.run_after <= now
+    ).order_by(table.c.id).limit(limit)
+    with db.engine.begin() as conn:
+        # UPDATE único: dois dispatchers nunca pegam a mesma mensagem
+        return conn.execute(
+            update(table)
+            .where(table.c.id.in_(ready), table.c.status == PENDING)
+            .values(status=SENDING, started_at=now, attempts=table.c.attempts + 1)
+            .returning(table.c.id, table.c.event, table.c.payload, table.c.created_at,
+                       table.c.attempts, table.c.delivered)
+        ).all()
+
+
+def finish(results, max_attempts, now=None):
+    """
+    Registra o resultado de um lote num único executemany. `results` é uma
+    lista de (linha de `claim()`, canais entregues, erro ou None).
+    Retorna {status: quantidade}.
+    """
+    now = now or datetime.datetime.now()
+    table = OutboxMessage.__table__
+    params, counts = [], {}
+    for message, delivered, error in results:
+        values = {'b_id': message.id, 'b_delivered': json.dumps(sorted(delivered)),
+                  'b_error': error, 'b_run_after': now, 'b_sent_at': None}
+        if error is None:
+            values.update(b_status=SENT, b_sent_at=now)
+        elif message.attempts < max_attempts:
+            delay = min(BACKOFF_SECONDS * 2 ** (message.attempts - 1), MAX_BACKOFF_SECONDS)
+            values.update(b_status=PENDING, b_run_after=now + datetime.timedelta(seconds=delay))
+        else:
+            values.update(b_status=FAILED)
+        params.append(values)
+        counts[values['b_status']] = counts.get(values['b_status'], 0) + 1
+    if params:
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(table).where(table.c.id == bindparam('b_id')).values(
+                    status=bindparam('b_status'), delivered=bindparam('b_delivered'),
+                    last_error=bindparam('b_error'), run_after=bindparam('b_run_after'),
+                    sent_at=bindparam('b_sent_at'),
+                ),
+                params,
+            )
+    return counts
+
+
+def requeue_stale(timeout_seconds, now=None):
+    """Devolve à fila mensagens 'enviando' de um dispatcher que morreu no meio."""
+    now = now or datetime.datetime.now()
+    table = OutboxMessage.__table__
+    with db.engine.begin() as conn:
+        return conn.execute(
+            update(table)
+            .where(table.c.status == SENDING,
+                   table.c.started_at < now - datetime.timedelta(seconds=timeout_seconds))
+            .values(status=PENDING, run_after=now)
+        ).rowcount
+
+
+def retry(message_ids):
+    """Volta mensagens (que falharam) para a fila, zerando as tentativas."""
+    table = OutboxMessage.__table__
+    with db.engine.begin() as conn:
+        return conn.execute(
+            update(table)
+            .where(table.c.id.in_(message_ids), table.c.status != SENDING)
+            .values(status=PENDING, attempts=0, last_error=None, sent_at=None,
+                    run_after=datetime.datetime.now())
+        ).rowcount
+
+
+def purge(days, now=None):
+    """Apaga mensagens já enviadas há mais de `days` dias."""
+    now = now or datetime.datetime.now()
+    table = OutboxMessage.__table__
+    with db.engine.begin() as conn:
+        return conn.execute(
+            delete(table).where(table.c.status == SENT,
+                                table.c.sent_at < now - datetime.timedelta(days=days))
+        ).rowcount
+
+
+def status_counts():
+    table = OutboxMessage.__table__
+    with db.engine.connect() as conn:
+        rows = conn.execute(select(table.c.status, func.count()).group_by(table.c.status)).all()
+    return {status: count for status, count in rows}
+
+
+# --- Dispatcher (asyncio) ---
+
+class Dispatcher:
+    """
+    Busca lotes da outbox e entrega cada mensagem a todos os canais em
+    paralelo. `concurrency` limita os envios simultâneos por canal (para
+    não abrir 50 conexões SMTP de uma vez).
+    """
+
+    def __init__(self, sinks, batch_size=50, max_attempts=8, timeout=10.0, concurrency=10):
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.limits = {s.name: asyncio.Semaphore(concurrency) for s in sinks}
+        self.stopping = asyncio.Event()
+
+    def stop(self):
+        if not self.stopping.is_set():
+            print("Encerrando depois do lote em andamento...")
+        self.stopping.set()
+
+    async def _send(self, sink_, message):
+        """None se entregou; senão a mensagem de erro."""
+        async with self.limits[sink_.name]:
+            try:
+                await asyncio.wait_for(sink_.send(message), self.timeout)
+            except asyncio.TimeoutError:
+                return f"{sink_.name}: sem resposta em {self.timeout:g}s"
+            except Exception as e:
+                return f"{sink_.name}: {type(e).__name__}: {e}"
+        return None
+
+    async def deliver(self, row):
+        """Envia a mensagem aos canais que ainda não a receberam."""
+        delivered = set(json.loads(row.delivered or '[]'))
+        message = {'id': row.id, 'event': row.event, 'created_at': str(row.created_at),
+                   'payload': json.loads(row.payload)}
+        pending = [s for s in self.sinks if s.name not in delivered]
+        errors = await asyncio.gather(*(self._send(s, message) for s in pending))
+        delivered.update(s.name for s, error in zip(pending, errors) if error is None)
+        failures = [error for error in errors if error is not None]
+        return row, delivered, '\n'.join(failures) or None
+
+    async def run_batch(self):
+        """Processa um lote; retorna quantas mensagens foram reivindicadas."""
+        batch = claim(self.batch_size)
+        if batch:
+            results = await asyncio.gather(*(self.deliver(row) for row in batch))
+            counts = finish(results, self.max_attempts)
+            print(f"Lote de {len(batch)}: "
+                  + ', '.join(f"{count} {status}" for status, count in sorted(counts.items())))
+        return len(batch)
+
+    async def run(self, poll_interval=1.0, once=False):
+        """
+        Laço principal. Com `once`, sai quando não houver mais mensagens
+        prontas. SIGTERM/SIGINT encerram depois do lote em andamento.
+        """
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(signum, self.stop)
+            except (NotImplementedError, RuntimeError):  # Windows / fora da thread principal
+                pass
+
+        while not self.stopping.is_set():
+            if await self.run_batch():
+                continue
+            if once:
+                break
+            try:
+                await asyncio.wait_for(self.stopping.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+# --- Comandos CLI: flask outbox dispatch/status/retry-failed/purge ---
+
+outbox_cli = AppGroup('outbox', help='Notificações de pedidos (outbox).')
+
+
+@outbox_cli.command('dispatch')
+@click.option('--batch', type=int, default=None, help='Mensagens por lote (padrão: OUTBOX_BATCH_SIZE).')
+@click.option('--poll', type=float, default=None, help='Segundos entre buscas na fila.')
+@click.option('--once', is_flag=True, help='Envia as mensagens prontas e sai.')
+def dispatch_command(batch, poll, once):
+    """Entrega as notificações pendentes aos canais configurados."""
+    config = current_app.config
+    try:
+        sinks = build_sinks(config)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if not sinks:
+        raise click.ClickException('Nenhum canal em OUTBOX_SINKS.')
+
+    requeued = requeue_stale(config['OUTBOX_STALE_AFTER'])
+    if requeued:
+        print(f"{requeued} mensagem(ns) presa(s) voltaram para a fila.")
+
+    print(f"Dispatcher iniciado. Canais: {', '.join(s.name for s in sinks)}")
+
+    async def main():
+        dispatcher = Dispatcher(
+            sinks,
+            batch_size=batch or config['OUTBOX_BATCH_SIZE'],
+            max_attempts=config['OUTBOX_MAX_ATTEMPTS'],
+            timeout=config['OUTBOX_SINK_TIMEOUT'],
+            concurrency=config['OUTBOX_CONCURRENCY'],
+        )
+        await dispatcher.run(poll_interval=poll or config['OUTBOX_POLL_INTERVAL'], once=once)
+
+    asyncio.run(main())
+
+
+@outbox_cli.command('status')
+def status_command():
+    """Mostra quantas mensagens há em cada status."""
+    counts = status_counts()
+    for status in STATUSES:
+        print(f"  {status:<9} {counts.get(status, 0)}")
+
+
+@outbox_cli.command('retry-failed')
+def retry_failed_command():
+    """Volta para a fila todas as mensagens que falharam."""
+    table = OutboxMessage.__table__
+    with db.engine.connect() as conn:
+        ids = conn.execute(select(table.c.id).where(table.c.status == FAILED)).scalars().all()
+    print(f"{retry(ids) if ids else 0} mensagem(ns) de volta na fila.")
+
+
+@outbox_cli.command('purge')
+@click.option('--dias', type=int, default=None, help='Idade mínima (padrão: OUTBOX_RETENTION_DAYS).')
+def purge_command(dias):
+    """Apaga as mensagens já enviadas mais antigas."""
+    days = dias if dias is not None else current_app.config['OUTBOX_RETENTION_DAYS']
+    print(f"{purge(days)} mensagem(ns) enviada(s) apagada(s).")
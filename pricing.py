@@ -0,0 +1,243 @@
+# pricing.py
+import datetime
+import time
+from itertools import chain
+
+from flask.cli import AppGroup
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from cache import generations
+from extensions import db
+from models import Product, ProductPrice, Promotion, promotion_product_association
+
+
+# --- Tabela de Preço Efetivo ---
+# `Product.current_price` percorria todas as promoções (e chamava
+# `datetime.now()`) a cada acesso. Agora o preço final fica materializado
+# em `product_price` e é recalculado:
+#   1. quando um Produto ou Promoção é salvo (eventos da sessão);
+#   2. quando passa uma data de início/fim de promoção (`valid_until`).
+
+CHUNK_SIZE = 500  # SQLite limita a quantidade de parâmetros por query
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), CHUNK_SIZE):
+        yield ids[i:i + CHUNK_SIZE]
+
+
+def _next_boundary(promos, now):
+    """Próximo instante em que alguma das promoções começa ou termina."""
+    candidates = []
+    for promo in promos:
+        if promo.start_date and promo.start_date > now:
+            candidates.append(promo.start_date)
+        if promo.end_date and promo.end_date >= now:
+            candidates.append(promo.end_date)
+    return min(candidates) if candidates else None
+
+
+def _build_rows(conn, product_ids, now):
+    """Calcula as linhas de `product_price` para os produtos informados."""
+    product_table = Product.__table__
+    promo_table = Promotion.__table__
+    assoc = promotion_product_association
+
+    prices = {}
+    promos_by_product = {}
+    for chunk in _chunks(product_ids):
+        for row in conn.execute(select(product_table.c.id, product_table.c.price)
+                                .where(product_table.c.id.in_(chunk))):
+            prices[row.id] = row.price
+
+        promo_rows = conn.execute(
+            select(assoc.c.product_id, promo_table)
+            .join(promo_table, promo_table.c.id == assoc.c.promotion_id)
+            .where(assoc.c.product_id.in_(chunk), promo_table.c.is_active == True)
+            .order_by(promo_table.c.id)
+        )
+        for row in promo_rows:
+            promos_by_product.setdefault(row.product_id, []).append(row)
+
+    rows = []
+    for product_id, price in prices.items():
+        promos = promos_by_product.get(product_id, [])
+        active = next((p for p in promos if Promotion.is_active_at(p, now)), None)
+        if active:
+            current_price = round(price * (1.0 - (active.discount_percent or 0.0) / 100.0), 2)
+        else:
+            current_price = price
+        rows.append({
+            'product_id': product_id,
+            'current_price': current_price,
+            'promotion_id': active.id if active else None,
+            'valid_until': _next_boundary(promos, now),
+        })
+    return rows
+
+
+def refresh_prices(product_ids=None, now=None):
+    """
+    Recalcula o preço efetivo dos produtos (todos, se `product_ids` for None)
+    numa única transação. Produtos que não existem mais têm a linha removida.
+    """
+    now = now or datetime.datetime.now()
+    price_table = ProductPrice.__table__
+
+    with db.engine.begin() as conn:
+        if product_ids is None:
+            product_ids = conn.execute(select(Product.__table__.c.id)).scalars().all()
+            conn.execute(delete(price_table).where(
+                price_table.c.product_id.not_in(select(Product.__table__.c.id))
+            ))
+        product_ids = set(product_ids)
+        if not product_ids:
+            return 0
+
+        rows = _build_rows(conn, product_ids, now)
+        if rows:
+            stmt = sqlite_insert(price_table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['product_id'],
+                set_={
+                    'current_price': stmt.excluded.current_price,
+                    'promotion_id': stmt.excluded.promotion_id,
+                    'valid_until': stmt.excluded.valid_until,
+                }
+            )
+            conn.execute(stmt, rows)
+
+        missing = product_ids - {row['product_id'] for row in rows}
+        for chunk in _chunks(missing):
+            conn.execute(delete(price_table).where(price_table.c.product_id.in_(chunk)))
+    return len(rows)
+
+
+# --- Expressões SQL (ordenar/filtrar pelo preço de venda) ---
+
+def effective_price_expr():
+    """Preço final no SQL. Requer `join_effective_price` na query."""
+    return func.coalesce(ProductPrice.current_price, Product.price)
+
+
+def join_effective_price(query):
+    return query.outerjoin(ProductPrice, ProductPrice.product_id == Product.id)
+
+
+# --- Manutenção automática ---
+
+class PriceProjection:
+    """Liga os eventos da sessão e o recálculo por data de promoção."""
+
+    # De quanto em quanto tempo relemos o próximo `valid_until` do banco
+    # (outro worker pode ter salvo uma promoção com data mais próxima)
+    RELOAD_INTERVAL = 60
+
+    def __init__(self, app=None):
+        self.app = None
+        self._next_boundary = None
+        self._reload_at = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['price_projection'] = self
+        app.cli.add_command(prices_cli)
+
+        for name, fn in (('after_flush', _collect_changes),
+                         ('after_commit', _apply_changes),
+                         ('after_rollback', _discard_changes)):
+            if not event.contains(db.session, name, fn):
+                event.listen(db.session, name, fn)
+
+        app.before_request(self.refresh_if_stale)
+
+    def schedule_reload(self):
+        self._reload_at = 0.0
+
+    def refresh_if_stale(self):
+        """Chamado antes de cada request: custo de uma comparação no caso comum."""
+        now = datetime.datetime.now()
+        boundary_passed = self._next_boundary is not None and now >= self._next_boundary
+        if not boundary_passed and time.monotonic() < self._reload_at:
+            return
+
+        try:
+            price_table = ProductPrice.__table__
+            with db.engine.connect() as conn:
+                has_rows = conn.execute(select(price_table.c.product_id).limit(1)).first()
+                stale_ids = conn.execute(
+                    select(price_table.c.product_id).where(price_table.c.valid_until <= now)
+                ).scalars().all()
+            if not has_rows:
+                refresh_prices(now=now)  # Primeira carga
+            elif stale_ids:
+                refresh_prices(stale_ids, now=now)
+                # Uma promoção começou/terminou: páginas em cache mostram o preço antigo
+                generations.bump('catalog')
+
+            with db.engine.connect() as conn:
+                self._next_boundary = conn.execute(
+                    select(func.min(price_table.c.valid_until))
+                ).scalar()
+        except Exception as e:
+            print(f"Erro ao atualizar preços: {e}")
+        self._reload_at = time.monotonic() + self.RELOAD_INTERVAL
+
+
+def _collect_changes(session, flush_context):
+    """Anota quais produtos precisam de recálculo (roda dentro do flush)."""
+    product_ids = session.info.setdefault('pricing_dirty', set())
+    deleted_promo_ids = []
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Product) and obj.id is not None:
+            product_ids.add(obj.id)
+        elif isinstance(obj, Promotion):
+            history = inspect(obj).attrs.products.history
+            for product in chain(history.added, history.unchanged, history.deleted):
+                if product.id is not None:
+                    product_ids.add(product.id)
+            if obj in session.deleted:
+                deleted_promo_ids.append(obj.id)
+            else:
+                product_ids.update(p.id for p in obj.products if p.id is not None)
+
+    if deleted_promo_ids:
+        # Produtos que usavam a promoção apagada
+        product_ids.update(session.execute(
+            select(ProductPrice.product_id).where(ProductPrice.promotion_id.in_(deleted_promo_ids))
+        ).scalars())
+
+
+def _apply_changes(session):
+    product_ids = session.info.pop('pricing_dirty', None)
+    if product_ids:
+        try:
+            refresh_prices(product_ids)
+        except Exception as e:
+            print(f"Erro ao recalcular preços: {e}")
+        # As datas podem ter mudado: relê o próximo `valid_until` no próximo request
+        price_projection.schedule_reload()
+
+
+def _discard_changes(session):
+    session.info.pop('pricing_dirty', None)
+
+
+# --- Comando CLI: flask prices refresh ---
+
+prices_cli = AppGroup('prices', help='Tabela de preço efetivo dos produtos.')
+
+
+@prices_cli.command('refresh')
+def refresh_command():
+    """Recalcula o preço efetivo de todos os produtos."""
+    total = refresh_prices()
+    print(f"{total} preço(s) recalculado(s).")
+
+
+price_projection = PriceProjection()
@@ -0,0 +1,144 @@
+# rollups.py
+import datetime
+
+from flask.cli import AppGroup
+from sqlalchemy import and_, delete, event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+from models import Order, OrderDailyStat
+
+
+# --- Resumo Diário de Pedidos ---
+# O dashboard fazia 5 agregações sobre TODA a tabela de pedidos a cada
+# visita. Agora cada INSERT/UPDATE/DELETE de Order aplica um "delta" em
+# `order_daily_stats` (dia, status, quantidade, receita) na mesma
+# transação, e o dashboard lê só essa tabela.
+#
+# Cobre tudo que passa pelo ORM: criar_pedido(), quick_update_status()
+# e as edições (inclusive inline) do OrderView. Para alterações feitas
+# fora do ORM, rode `flask rollups backfill`.
+
+def _as_day(value):
+    if value is None:
+        return datetime.date.today()
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.fromisoformat(str(value)).date()
+
+
+def apply_deltas(connection, deltas):
+    """
+    Soma os deltas [(dia, status, quantidade, receita), ...] no resumo.
+    Linhas que chegam a zero pedidos são removidas.
+    """
+    merged = {}
+    for day, status, count, revenue in deltas:
+        key = (day, status)
+        old_count, old_revenue = merged.get(key, (0, 0.0))
+        merged[key] = (old_count + count, old_revenue + (revenue or 0.0))
+
+    rows = [
+        {'day': day, 'status': status, 'count': count, 'revenue': revenue}
+        for (day, status), (count, revenue) in merged.items()
+        if count or revenue
+    ]
+    if not rows:
+        return
+
+    table = OrderDailyStat.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['day', 'status'],
+        set_={
+            'count': table.c.count + stmt.excluded.count,
+            'revenue': table.c.revenue + stmt.excluded.revenue,
+        }
+    )
+    connection.execute(stmt, rows)
+    for row in rows:
+        connection.execute(delete(table).where(and_(
+            table.c.day == row['day'], table.c.status == row['status'], table.c.count <= 0
+        )))
+
+
+def _stored_row(connection, order_id):
+    """Valores do pedido como estão no banco (antes do UPDATE/DELETE)."""
+    table = Order.__table__
+    return connection.execute(
+        select(table.c.created_at, table.c.status, table.c.total_price)
+        .where(table.c.id == order_id)
+    ).first()
+
+
+@event.listens_for(Order, 'after_insert')
+def _order_inserted(mapper, connection, target):
+    apply_deltas(connection, [
+        (_as_day(target.created_at), target.status, 1, target.total_price)
+    ])
+
+
+@event.listens_for(Order, 'before_update')
+def _order_updating(mapper, connection, target):
+    old = _stored_row(connection, target.id)
+    if old is None:
+        return
+    new_day = _as_day(target.created_at)
+    old_day = _as_day(old.created_at)
+    if (old_day, old.status, old.total_price) == (new_day, target.status, target.total_price):
+        return
+    apply_deltas(connection, [
+        (old_day, old.status, -1, -(old.total_price or 0.0)),
+        (new_day, target.status, 1, target.total_price),
+    ])
+
+
+@event.listens_for(Order, 'before_delete')
+def _order_deleting(mapper, connection, target):
+    old = _stored_row(connection, target.id)
+    if old is None:
+        return
+    apply_deltas(connection, [
+        (_as_day(old.created_at), old.status, -1, -(old.total_price or 0.0))
+    ])
+
+
+# --- Reconstrução completa ---
+
+REBUILD_SQL = (
+    'INSERT INTO order_daily_stats (day, status, count, revenue) '
+    'SELECT date(created_at), status, count(*), coalesce(sum(total_price), 0) '
+    'FROM "order" WHERE created_at IS NOT NULL GROUP BY date(created_at), status'
+)
+
+
+def rebuild(connection):
+    """Recalcula o resumo inteiro a partir da tabela de pedidos."""
+    connection.execute(db.text('DELETE FROM order_daily_stats'))
+    connection.execute(db.text(REBUILD_SQL))
+
+
+# --- Leitura (dashboard) ---
+
+def load_range(start_date, end_date):
+    """Linhas do resumo entre as datas (inclusive), numa única query."""
+    return OrderDailyStat.query.filter(
+        OrderDailyStat.day >= _as_day(start_date),
+        OrderDailyStat.day <= _as_day(end_date)
+    ).order_by(OrderDailyStat.day).all()
+
+
+# --- Comando CLI: flask rollups backfill ---
+
+rollups_cli = AppGroup('rollups', help='Resumo diário de pedidos do dashboard.')
+
+
+@rollups_cli.command('backfill')
+def backfill_command():
+    """Reconstrói order_daily_stats a partir de todos os pedidos."""
+    with db.engine.begin() as conn:
+        rebuild(conn)
+        total = conn.execute(db.text('SELECT count(*) FROM order_daily_stats')).scalar()
+    print(f"Resumo reconstruído: {total} linha(s) (dia x status).")
@@ -0,0 +1,238 @@
+# search.py
+import html
+import re
+from itertools import chain
+
+from flask.cli import AppGroup
+from sqlalchemy import event, inspect
+from text_unidecode import unidecode
+
+from extensions import db
+from models import Category, Product
+
+
+# --- Busca de Produtos (SQLite FTS5) ---
+# A loja não tinha busca. A tabela virtual `product_search` indexa nome,
+# descrição (sem HTML) e nomes das categorias de cada produto, com
+# rowid = product.id (a loja filtra `active`; o admin busca em todos).
+# O texto é gravado normalizado (unidecode + minúsculas, como o slugify
+# faz), então "calca" encontra "Calça". O ranking é BM25 com peso maior
+# para o nome.
+#
+# O índice é atualizado depois do commit (eventos da sessão, como em
+# pricing.py) para os produtos que mudaram. Para reconstruir tudo:
+# `flask search reindex`.
+
+INDEX_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5("
+    "name, categories, description, active UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2', "
+    "prefix = '2 3 4')"
+)
+# Pesos do bm25 na ordem das colunas: nome, categorias, descrição, active
+BM25_WEIGHTS = (10.0, 4.0, 1.0, 0.0)
+MAX_TERMS = 8
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACE_RE = re.compile(r'\s+')
+_TERM_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """'Vestido <b>Ankara</b> Ção' -> 'vestido ankara cao'."""
+    if not text:
+        return ''
+    text = html.unescape(_TAG_RE.sub(' ', text))
+    return _SPACE_RE.sub(' ', unidecode(text)).strip().lower()
+
+
+def match_expression(query, prefix=True):
+    """
+    Converte o texto digitado numa expressão MATCH segura: cada termo entre
+    aspas (nada de operadores do FTS5 vindos do usuário) e, com `prefix`,
+    o último termo vira prefixo para o autocompletar ("vest" -> vestido).
+    """
+    terms = _TERM_RE.findall(normalize(query))[:MAX_TERMS]
+    if not terms:
+        return None
+    parts = [f'"{term}"' for term in terms]
+    if prefix:
+        parts[-1] += '*'
+    return ' '.join(parts)
+
+
+# --- Manutenção do Índice ---
+# As funções abaixo recebem a conexão sqlite3 "crua" (como as migrações):
+# use `with db.engine.begin() as conn: reindex(conn.connection.driver_connection)`.
+
+def create_index(conn):
+    conn.execute(INDEX_DDL)
+
+
+_DOCUMENTS_SQL = (
+    "SELECT p.id, p.name, p.description, group_concat(c.name, ' '), p.active "
+    "FROM product p "
+    "LEFT JOIN product_category_association pca ON pca.product_id = p.id "
+    "LEFT JOIN category c ON c.id = pca.category_id "
+    "WHERE 1 = 1 {where} "
+    "GROUP BY p.id"
+)
+
+
+def reindex(conn, product_ids=None, batch_size=500):
+    """
+    Reindexa os produtos informados (ou todos). Produtos apagados
+    simplesmente saem do índice. Retorna quantos foram indexados.
+    """
+    if product_ids is None:
+        conn.execute('DELETE FROM product_search')
+        batches = [None]
+    else:
+        ids = sorted(set(product_ids))
+        batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+
+    indexed = 0
+    for batch in batches:
+        if batch is None:
+            rows = conn.execute(_DOCUMENTS_SQL.format(where='')).fetchall()
+        else:
+            marks = ', '.join('?' * len(batch))
+            conn.execute(f'DELETE FROM product_search WHERE rowid IN ({marks})', batch)
+            rows = conn.execute(_DOCUMENTS_SQL.format(where=f'AND p.id IN ({marks})'), batch).fetchall()
+        conn.executemany(
+            'INSERT INTO product_search (rowid, name, categories, description, active) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(pid, normalize(name), normalize(categories), normalize(description), 1 if active else 0)
+             for pid, name, description, categories, active in rows]
+        )
+        indexed += len(rows)
+    return indexed
+
+
+# --- Sincronização via eventos da sessão ---
+
+def _collect_changes(session, flush_context):
+    product_ids = session.info.setdefault('search_products', set())
+    category_ids = session.info.setdefault('search_categories', set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Product) and obj.id is not None:
+            product_ids.add(obj.id)
+        elif isinstance(obj, Category):
+            state = inspect(obj)
+            history = state.attrs.products.history
+            # Só os produtos que entraram/saíram da categoria: `unchanged`
+            # carregaria todos os produtos dela a cada edição (ex: só a imagem)
+            products = chain(history.added, history.deleted)
+            if obj in session.deleted:
+                # Apagada: o flush já carregou a coleção para limpar a associação
+                products = chain(products, history.unchanged)
+            for product in products:
+                if product.id is not None:
+                    product_ids.add(product.id)
+            # Nome mudou: todos os produtos dela, por um SELECT no commit
+            if obj.id is not None and obj not in session.deleted and state.attrs.name.history.has_changes():
+                category_ids.add(obj.id)
+
+
+def _apply_changes(session):
+    product_ids = session.info.pop('search_products', None) or set()
+    category_ids = session.info.pop('search_categories', None)
+    if not product_ids and not category_ids:
+        return
+    try:
+        with db.engine.begin() as conn:
+            raw = conn.connection.driver_connection
+            if category_ids:
+                marks = ', '.join('?' * len(category_ids))
+                product_ids.update(pid for (pid,) in raw.execute(
+                    f'SELECT product_id FROM product_category_association WHERE category_id IN ({marks})',
+                    sorted(category_ids)
+                ))
+            if product_ids:
+                reindex(raw, product_ids)
+    except Exception as e:
+        print(f"Erro ao atualizar o índice de busca: {e}")
+
+
+def _discard_changes(session):
+    session.info.pop('search_products', None)
+    session.info.pop('search_categories', None)
+
+
+def init_app(app):
+    for name, fn in (('after_flush', _collect_changes),
+                     ('after_commit', _apply_changes),
+                     ('after_rollback', _discard_changes)):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
+    app.cli.add_command(search_cli)
+
+
+# --- Consultas ---
+
+def matching_ids_sql(active_only=True):
+    """SELECT dos rowids que casam com :q (para usar como subquery)."""
+    active = ' AND active = 1' if active_only else ''
+    return f'SELECT rowid FROM product_search WHERE product_search MATCH :q{active}'
+
+
+def search_product_ids(query, limit=24, offset=0, prefix=True):
+    """IDs dos produtos ativos que casam com `query`, do mais relevante ao menos."""
+    expression = match_expression(query, prefix=prefix)
+    if expression is None:
+        return []
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    rows = db.session.execute(
+        db.text(
+            f'{matching_ids_sql()} '
+            f'ORDER BY bm25(product_search, {weights}), rowid LIMIT :limit OFFSET :offset'
+        ),
+        {'q': expression, 'limit': limit, 'offset': offset}
+    )
+    return [row[0] for row in rows]
+
+
+def search_products(query, limit=24, offset=0, options=()):
+    """Produtos (na ordem de relevância) que casam com `query`."""
+    ids = search_product_ids(query, limit=limit, offset=offset)
+    if not ids:
+        return []
+    products = Product.query.filter(Product.id.in_(ids), Product.active == True)\
+                            .options(*options).all()
+    by_id = {product.id: product for product in products}
+    return [by_id[pid] for pid in ids if pid in by_id]
+
+
+def filter_matching(query, text, active_only=False):
+    """Restringe uma query de Product aos que casam com `text` (busca do admin)."""
+    expression = match_expression(text)
+    if expression is None:
+        return query
+    subquery = db.text(matching_ids_sql(active_only)).bindparams(q=expression).columns(db.column('rowid'))
+    return query.filter(Product.id.in_(subquery))
+
+
+def suggest(query, limit=8):
+    """Dados mínimos para o autocompletar (sem carregar os modelos inteiros)."""
+    ids = search_product_ids(query, limit=limit)
+    if not ids:
+        return []
+    rows = db.session.query(Product.id, Product.name, Product.slug, Product.image)\
+                     .filter(Product.id.in_(ids)).all()
+    by_id = {row.id: row for row in rows}
+    return [by_id[pid] for pid in ids if pid in by_id]
+
+
+# --- Comando CLI: flask search reindex ---
+
+search_cli = AppGroup('search', help='Índice de busca de produtos (FTS5).')
+
+
+@search_cli.command('reindex')
+def reindex_command():
+    """Reconstrói o índice de busca inteiro."""
+    with db.engine.begin() as conn:
+        raw = conn.connection.driver_connection
+        create_index(raw)
+        total = reindex(raw)
+    print(f"{total} produto(s) indexado(s).")
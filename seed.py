@@ -0,0 +1,235 @@
+# seed.py
+import datetime
+import random
+
+import click
+from flask.cli import with_appcontext
+from slugify import slugify
+
+
+# --- Dados Sintéticos (catálogo + pedidos) ---
+# O oba_afro.db tem meia dúzia de produtos cadastrados à mão: nenhum
+# problema de desempenho aparece com ele. `flask seed` (ou `seed_database()`,
+# usada pelos benchmarks) gera um catálogo realista em escala configurável:
+# categorias, produtos com variações de tamanho, promoções, seções da home
+# e pedidos espalhados pelos últimos meses.
+#
+# A geração é determinística (--semente) e grava direto pela conexão
+# sqlite3 em lotes; no fim, as tabelas derivadas (preço efetivo, resumo
+# diário, índice de busca) são recalculadas como num deploy.
+
+PIECES = ('Vestido', 'Saia', 'Turbante', 'Camisa', 'Calça', 'Bata', 'Kimono', 'Conjunto',
+          'Macacão', 'Blusa', 'Bolsa', 'Colar', 'Brinco', 'Túnica', 'Short', 'Bermuda',
+          'Batinha', 'Jaqueta', 'Faixa', 'Pulseira')
+STYLES = ('Ankara', 'Kente', 'Bogolan', 'Estampado', 'Longo', 'Curto', 'Midi', 'Étnico',
+          'Tradicional', 'Básico', 'Festa', 'Algodão', 'Linho', 'Ajustável', 'Adire', 'Wax')
+COLORS = ('Amarelo', 'Laranja', 'Vermelho', 'Azul', 'Verde', 'Preto', 'Branco', 'Marrom',
+          'Dourado', 'Estampa Búzios', 'Terracota', 'Vinho')
+CATEGORY_NAMES = ('Feminino', 'Masculino', 'Infantil', 'Acessórios', 'Lançamentos', 'Plus Size',
+                  'Moda Praia', 'Turbantes', 'Bijuterias', 'Festa', 'Casual', 'Unissex',
+                  'Bolsas', 'Tecidos', 'Kids', 'Religiosos')
+SIZES = ('PP', 'P', 'M', 'G', 'GG', 'XG', 'U')
+WORDS = ('tecido', 'confortável', 'africano', 'costura', 'artesanal', 'caimento', 'elegante',
+         'ocasião', 'verão', 'inverno', 'padronagem', 'cores', 'vibrantes', 'tradição', 'cultura')
+# Distribuição dos status dos pedidos
+ORDER_STATUSES = (('Concluído', 0.6), ('Pendente', 0.25), ('Cancelado', 0.15))
+
+BATCH_SIZE = 5000
+
+
+def _batches(rows):
+    for i in range(0, len(rows), BATCH_SIZE):
+        yield rows[i:i + BATCH_SIZE]
+
+
+def _insert(conn, sql, rows):
+    for batch in _batches(rows):
+        conn.executemany(sql, batch)
+
+
+def _timestamp(value):
+    # Mesmo formato que o SQLAlchemy grava nas colunas DateTime do SQLite
+    return value.isoformat(' ')
+
+
+def _next_id(conn, table):
+    return (conn.execute(f'SELECT coalesce(max(id), 0) FROM "{table}"').fetchone()[0]) + 1
+
+
+def _sale_price(price, promotions, at):
+    """(promoção, preço unitário) vigentes em `at` (mesma regra do Product)."""
+    for promotion_id, is_active, starts, ends, discount in promotions:
+        if is_active and starts <= at <= ends:
+            return promotion_id, round(price * (1.0 - discount / 100.0), 2)
+    return None, price
+
+
+def generate(conn, products=1000, categories=12, promotions=5, orders=5000, months=12,
+             seed=42, now=None):
+    """
+    Insere os dados sintéticos (recebe a conexão sqlite3 crua; não faz
+    commit). Acrescenta ao que já existe. Retorna as quantidades geradas.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.datetime.now()
+    categories = min(categories, len(CATEGORY_NAMES))
+
+    # Categorias (nomes únicos: reaproveita as que já existirem)
+    existing = {name for (name,) in conn.execute('SELECT name FROM category')}
+    first_category = _next_id(conn, 'category')
+    category_rows = [(first_category + i, name, slugify(name), f'Peças da linha {name}.')
+                     for i, name in enumerate(n for n in CATEGORY_NAMES[:categories] if n not in existing)]
+    _insert(conn, 'INSERT INTO category (id, name, slug, description) VALUES (?, ?, ?, ?)', category_rows)
+    category_ids = [row[0] for row in conn.execute('SELECT id FROM category')]
+
+    # Produtos, variações e categorias de cada um
+    first_product = _next_id(conn, 'product')
+    product_rows, variation_rows, link_rows, prices = [], [], [], {}
+    for product_id in range(first_product, first_product + products):
+        name = f'{rng.choice(PIECES)} {rng.choice(STYLES)} {rng.choice(COLORS)}'
+        price = round(rng.choice((39.9, 59.9, 89.9, 129.9, 179.9, 249.9, 389.9, 520.0)) * rng.uniform(0.9, 1.1), 2)
+        prices[product_id] = (name, price)
+        description = '<p>' + ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 60))) + '</p>'
+        active = 1 if rng.random() < 0.92 else 0
+        product_rows.append((product_id, name, description, price, f'{slugify(name)}-{product_id}', active,
+                             rng.randint(0, 50), rng.randint(0, 2000)))
+        start = rng.randint(0, len(SIZES) - 3)
+        for size in SIZES[start:start + rng.randint(2, 5)]:
+            stock = 0 if rng.random() < 0.15 else rng.randint(1, 30)
+            variation_rows.append((size, stock, product_id))
+        for category_id in rng.sample(category_ids, min(len(category_ids), rng.randint(1, 3))):
+            link_rows.append((product_id, category_id))
+    _insert(conn, 'INSERT INTO product (id, name, description, price, slug, active, cart_add_count, view_count) '
+                  'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', product_rows)
+    _insert(conn, 'INSERT INTO variation (size, stock, product_id) VALUES (?, ?, ?)', variation_rows)
+    _insert(conn, 'INSERT INTO product_category_association (product_id, category_id) VALUES (?, ?)', link_rows)
+    product_ids = list(prices)
+
+    # Promoções: algumas vigentes, outras encerradas ou futuras
+    first_promotion = _next_id(conn, 'promotion')
+    promotion_rows, promo_links, promotions_by_product = [], [], {}
+    for i in range(promotions):
+        promotion_id = first_promotion + i
+        starts = now + datetime.timedelta(days=rng.randint(-60, 10))
+        ends = starts + datetime.timedelta(days=rng.randint(5, 60))
+        promotion_rows.append((promotion_id, f'Campanha {promotion_id}', 1 if rng.random() < 0.8 else 0,
+                               _timestamp(starts), _timestamp(ends), float(rng.choice((10, 15, 20, 30, 40)))))
+        for product_id in rng.sample(product_ids, min(len(product_ids), max(1, products // 20))):
+            promo_links.append((promotion_id, product_id))
+            promotions_by_product.setdefault(product_id, []).append(
+                (promotion_id, promotion_rows[-1][2], starts, ends, promotion_rows[-1][5]))
+    _insert(conn, 'INSERT INTO promotion (id, name, is_active, start_date, end_date, discount_percent) '
+                  'VALUES (?, ?, ?, ?, ?, ?)', promotion_rows)
+    _insert(conn, 'INSERT OR IGNORE INTO promotion_product_association (promotion_id, product_id) '
+                  'VALUES (?, ?)', promo_links)
+
+    # Home: header, bolinhas, banners e uma seção de destaques (só se vazia)
+    if product_ids and conn.execute('SELECT count(*) FROM product_section').fetchone()[0] == 0:
+        home_categories = category_ids[:6]
+        _insert(conn, 'INSERT INTO header_category (name, category_id, "order") VALUES (?, ?, ?)',
+                [(name, cid, i) for i, (cid, name) in enumerate(conn.execute(
+                    f'SELECT id, name FROM category WHERE id IN ({",".join("?" * len(home_categories))})',
+                    home_categories).fetchall())])
+        _insert(conn, 'INSERT INTO circular_category (name, image_url, category_id, "order", section) '
+                      'VALUES (?, ?, ?, ?, ?)',
+                [(f'Categoria {cid}', 'seed-circular.jpg', cid, i, 1 + i % 2)
+                 for i, cid in enumerate(home_categories)])
+        _insert(conn, 'INSERT INTO banner (image_url_desktop, link_url, title, subtitle, "order") '
+                      'VALUES (?, ?, ?, ?, ?)',
+                [('seed-banner.jpg', '/produtos', f'Coleção {i + 1}', 'Moda afro com identidade', i)
+                 for i in range(3)])
+        section_id = _next_id(conn, 'product_section')
+        conn.execute('INSERT INTO product_section (id, title) VALUES (?, ?)', (section_id, 'Destaques'))
+        _insert(conn, 'INSERT INTO product_section_association (product_id, section_id) VALUES (?, ?)',
+                [(pid, section_id) for pid in rng.sample(product_ids, min(4, len(product_ids)))])
+
+    # Pedidos espalhados pelos últimos `months` meses, com os itens
+    # (order_item) no mesmo formato que o checkout grava
+    variations = {}
+    for variation_id, product_id, size in conn.execute(
+            'SELECT id, product_id, size FROM variation WHERE product_id >= ? ORDER BY id', (first_product,)):
+        variations.setdefault(product_id, []).append((variation_id, size))
+    first_order = _next_id(conn, 'order')
+    order_rows, item_rows = [], []
+    statuses = [status for status, _ in ORDER_STATUSES]
+    weights = [weight for _, weight in ORDER_STATUSES]
+    span = datetime.timedelta(days=30 * months).total_seconds()
+    for order_id in range(first_order, first_order + (orders if product_ids else 0)):
+        created_at = now - datetime.timedelta(seconds=rng.uniform(0, span))
+        lines, total = [], 0.0
+        for product_id in rng.sample(product_ids, min(len(product_ids), rng.randint(1, 4))):
+            name, price = prices[product_id]
+            variation_id, size = rng.choice(variations[product_id])
+            quantity = rng.randint(1, 3)
+            promotion_id, unit_price = _sale_price(price, promotions_by_product.get(product_id, ()), created_at)
+            total += unit_price * quantity
+            lines.append(f'{quantity}x {name} ({size})')
+            item_rows.append((order_id, variation_id, product_id, name, size, quantity, unit_price, promotion_id))
+        order_rows.append((order_id, _timestamp(created_at), round(total, 2), ', '.join(lines),
+                           rng.choices(statuses, weights)[0]))
+    _insert(conn, 'INSERT INTO "order" (id, created_at, total_price, items_summary, status) '
+                  'VALUES (?, ?, ?, ?, ?)', order_rows)
+    _insert(conn, 'INSERT INTO order_item (order_id, variation_id, product_id, product_name, size, '
+                  'quantity, unit_price, promotion_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', item_rows)
+
+    return {
+        'categorias': len(category_rows),
+        'produtos': len(product_rows),
+        'variações': len(variation_rows),
+        'promoções': len(promotion_rows),
+        'pedidos': len(order_rows),
+        'itens de pedido': len(item_rows),
+    }
+
+
+def rebuild_derived():
+    """Recalcula preço efetivo, resumo de pedidos, estoque e busca (app context)."""
+    import rollups
+    import search
+    import stock
+    from cache import generations
+    from extensions import db
+    from pricing import refresh_prices
+
+    with db.engine.begin() as conn:
+        raw = conn.connection.driver_connection
+        stock.refresh_summary(raw)
+        search.create_index(raw)
+        search.reindex(raw)
+        rollups.rebuild(conn)
+    refresh_prices()
+    generations.bump('home', 'catalog', 'layout')
+
+
+def seed_database(**options):
+    """Gera os dados e recalcula as tabelas derivadas (app context)."""
+    from extensions import db
+
+    with db.engine.begin() as conn:
+        counts = generate(conn.connection.driver_connection, **options)
+    rebuild_derived()
+    return counts
+
+
+# --- Comando CLI: flask seed ---
+
+@click.command('seed')
+@click.option('--produtos', 'products', default=1000, show_default=True)
+@click.option('--categorias', 'categories', default=12, show_default=True)
+@click.option('--promocoes', 'promotions', default=5, show_default=True)
+@click.option('--pedidos', 'orders', default=5000, show_default=True)
+@click.option('--meses', 'months', default=12, show_default=True, help='Período dos pedidos.')
+@click.option('--semente', 'seed', default=42, show_default=True)
+@click.option('--acrescentar', is_flag=True, help='Permite gerar num banco que já tem produtos.')
+@with_appcontext
+def seed_command(acrescentar, **options):
+    """Gera um catálogo sintético (produtos, promoções, pedidos) para testes de carga."""
+    from extensions import db
+    from models import Product
+
+    if not acrescentar and db.session.query(Product.id).first() is not None:
+        raise click.ClickException('O banco já tem produtos. Use --acrescentar para gerar mesmo assim '
+                                   '(ou aponte para outro banco).')
+    db.session.remove()
+    counts = seed_database(**options)
+    print(', '.join(f'{count} {name}' for name, count in counts.items()) + ' gerados.')
@@ -0,0 +1,78 @@
+# slugs.py
+from sqlalchemy import or_, select
+from slugify import slugify
+
+
+# --- Slugs Únicos (alocação em lote) ---
+# Product.slug e Category.slug são UNIQUE no banco. Antes, cada tela
+# testava um candidato por query (`filter_by(slug=...)`) e, se existisse,
+# tentava `slug-<id>` ou `slug-novo` (que colidia de novo no segundo
+# produto novo com o mesmo nome).
+#
+# `allocate()` reserva slugs para vários nomes de uma vez: uma única
+# consulta traz os slugs já usados com cada base (`base` e `base-N`), e o
+# sufixo (-2, -3, ...) é escolhido em memória, sem repetir dentro do
+# próprio lote. O prefixo usa GLOB e não LIKE: no SQLite o LIKE ignora
+# maiúsculas e não aproveita o índice UNIQUE (BINARY) da coluna.
+#
+# Entre a consulta e o commit outra requisição pode pegar o mesmo slug;
+# aí o UNIQUE falha (`is_conflict()`) e quem chamou realoca e tenta de
+# novo, até RETRIES vezes.
+
+RETRIES = 3
+QUERY_CHUNK = 200  # bases por consulta (2 parâmetros cada)
+
+
+def _max_length(model):
+    return model.__table__.c.slug.type.length
+
+
+def base_slug(model, text, fallback='item'):
+    """slugify(text) cortado no tamanho da coluna (ou `fallback` se vazio)."""
+    return slugify(text or '')[:_max_length(model)].strip('-') or fallback
+
+
+def taken(connection, model, bases, exclude_id=None):
+    """Slugs em uso iguais a alguma base ou no formato base-N."""
+    column, bases, used = model.__table__.c.slug, sorted(set(bases)), set()
+    for i in range(0, len(bases), QUERY_CHUNK):
+        chunk = bases[i:i + QUERY_CHUNK]
+        query = select(column).where(or_(*(
+            or_(column == base, column.op('GLOB')(f'{base}-[0-9]*')) for base in chunk
+        )))
+        if exclude_id is not None:
+            query = query.where(model.__table__.c.id != exclude_id)
+        used.update(connection.execute(query).scalars())
+    return used
+
+
+def allocate(connection, model, texts, exclude_id=None, reserved=()):
+    """
+    Um slug livre para cada texto (na mesma ordem): base, base-2, base-3...
+    `connection` é a sessão ou uma conexão do SQLAlchemy; `exclude_id` é o
+    registro que está sendo editado (pode manter o próprio slug);
+    `reserved` são slugs que o chamador já vai usar no mesmo lote.
+    """
+    bases = [base_slug(model, text) for text in texts]
+    used = taken(connection, model, bases, exclude_id) | set(reserved)
+    max_length = _max_length(model)
+    counters, slugs = {}, []
+    for base in bases:
+        slug, counter = base, counters.get(base, 1)
+        while slug in used:
+            counter += 1
+            suffix = f'-{counter}'
+            slug = f'{base[:max_length - len(suffix)]}{suffix}'
+        counters[base] = counter
+        used.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def allocate_one(connection, model, text, exclude_id=None):
+    return allocate(connection, model, [text], exclude_id)[0]
+
+
+def is_conflict(exc, model):
+    """True se `exc` (IntegrityError/sqlite3) é o UNIQUE do slug de `model`."""
+    return f'{model.__tablename__}.slug' in str(getattr(exc, 'orig', exc))
@@ -0,0 +1,87 @@
+# sqlite_tuning.py
+from sqlalchemy import event
+
+
+# --- Perfis de Ajuste do SQLite ---
+# Com as configurações padrão (journal_mode=DELETE) um escritor bloqueia
+# todos os leitores, e vários workers do gunicorn acabam em
+# "database is locked". O perfil 'tuned' liga o WAL (leitores não
+# bloqueiam o escritor e vice-versa) e espera o lock em vez de falhar.
+#
+# Escolha com a variável de ambiente SQLITE_PROFILE (ver app.py).
+
+PROFILES = {
+    # Padrão do SQLite, só com espera pelo lock
+    'default': {
+        'pragmas': {
+            'busy_timeout': 5000,
+        },
+        'pool': {},
+    },
+    # Produção: WAL + fsync só nos checkpoints + cache/mmap maiores
+    'tuned': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',      # seguro com WAL; fsync no checkpoint
+            'busy_timeout': 10000,        # ms esperando o lock antes de falhar
+            'cache_size': -32000,         # ~32 MB de páginas por conexão
+            'mmap_size': 268435456,       # 256 MB lidos via mmap
+            'temp_store': 'MEMORY',       # ORDER BY/GROUP BY temporários em RAM
+        },
+        'pool': {
+            # Workers do gunicorn são síncronos: poucas conexões bastam,
+            # mas mantê-las abertas preserva o cache de páginas do SQLite
+            'pool_size': 5,
+            'max_overflow': 5,
+            'pool_recycle': 3600,
+        },
+    },
+}
+
+# Ordem importa: journal_mode precisa vir antes de synchronous
+PRAGMA_ORDER = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store')
+
+
+def get_profile(name):
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Perfil SQLite desconhecido: {name!r}. Opções: {', '.join(PROFILES)}")
+
+
+def engine_options(name):
+    """Valor para SQLALCHEMY_ENGINE_OPTIONS (precisa ser definido antes do db.init_app)."""
+    profile = get_profile(name)
+    options = dict(profile['pool'])
+    busy_timeout = profile['pragmas'].get('busy_timeout')
+    if busy_timeout:
+        # Timeout do próprio driver sqlite3 (em segundos), antes do PRAGMA rodar
+        options['connect_args'] = {'timeout': busy_timeout / 1000.0}
+    return options
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name in PRAGMA_ORDER:
+            if name in pragmas:
+                cursor.execute(f'PRAGMA {name} = {pragmas[name]}')
+    finally:
+        cursor.close()
+
+
+def register_pragmas(engine, name):
+    """Aplica os PRAGMAs do perfil em toda conexão nova do engine."""
+    pragmas = get_profile(name)['pragmas']
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+
+
+def init_app(app, db):
+    """Liga o perfil escolhido em SQLITE_PROFILE ao engine do Flask-SQLAlchemy."""
+    with app.app_context():
+        register_pragmas(db.engine, app.config['SQLITE_PROFILE'])
@@ -0,0 +1,313 @@
+# stock.py
+import datetime
+
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import DDL, event, inspect, select, update
+from sqlalchemy.orm import object_session
+
+import rollups
+from cache import product_generation
+from extensions import db
+from models import Order, Product, StockReservation, Variation
+
+
+# --- Estoque ---
+# 1) Resumo no produto: `product.total_stock` / `product.in_stock` eram
+#    calculados em Python somando as variações (uma query por card). Agora
+#    são colunas mantidas por triggers do SQLite em `variation`, então
+#    valem também para UPDATEs feitos fora do ORM (como a reserva abaixo).
+#
+# 2) Reserva no checkout: `criar_pedido()` não baixava o estoque. Agora
+#    cada linha do carrinho roda um único
+#        UPDATE variation SET stock = stock - :qtd WHERE id = :id AND stock >= :qtd
+#    dentro da transação do pedido; se alguma linha não tiver estoque,
+#    nada é gravado (rollback) e o cliente volta ao carrinho. No cache,
+#    a reserva invalida só a página dos produtos do pedido; home e
+#    listagens, só quando algum tamanho esgota.
+#
+# 3) Devolução: quando o pedido passa para 'Cancelado' (admin, dashboard
+#    ou edição inline), as reservas ainda ativas voltam ao estoque. Pedidos
+#    que ficam 'Pendente' além de STOCK_RESERVATION_HOURS são cancelados e
+#    devolvem, na mesma transação, via `flask stock release-expired` (rode
+#    pelo cron). Assim estoque e status nunca ficam desencontrados.
+#
+# 4) Volta de 'Cancelado' (para 'Pendente' ou 'Concluído'): as reservas
+#    devolvidas baixam o estoque de novo, com o mesmo UPDATE condicional.
+#    Sem estoque, a alteração é recusada (ReservationUnavailable).
+
+CANCELLED = 'Cancelado'
+PENDING = 'Pendente'
+
+
+class ReservationUnavailable(Exception):
+    """Pedido saindo de 'Cancelado' sem estoque para refazer as reservas."""
+
+    def __init__(self, order_id, product_name, size, wanted, available):
+        self.order_id = order_id
+        self.available = available
+        super().__init__(f"Pedido #{order_id} não pode sair de '{CANCELLED}': {product_name} ({size}) "
+                         f"precisa de {wanted}, disponível {available}")
+
+
+class InsufficientStock(Exception):
+    """Uma linha do carrinho pede mais do que o estoque atual."""
+
+    def __init__(self, line, available):
+        self.line = line
+        self.available = available
+        super().__init__(f"{line.product.name} ({line.variation.size}): "
+                         f"pedido {line.quantity}, disponível {available}")
+
+
+# --- Triggers do resumo (product.total_stock / product.in_stock) ---
+
+_REFRESH_SQL = (
+    "UPDATE product SET "
+    "total_stock = (SELECT coalesce(sum(stock), 0) FROM variation WHERE product_id = product.id), "
+    "in_stock = EXISTS (SELECT 1 FROM variation WHERE product_id = product.id AND stock > 0) "
+    "WHERE id IN ({ids})"
+)
+
+TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS trg_variation_stock_insert AFTER INSERT ON variation "
+    f"BEGIN {_REFRESH_SQL.format(ids='NEW.product_id')}; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_variation_stock_update "
+    "AFTER UPDATE OF stock, product_id ON variation "
+    f"BEGIN {_REFRESH_SQL.format(ids='NEW.product_id, OLD.product_id')}; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_variation_stock_delete AFTER DELETE ON variation "
+    f"BEGIN {_REFRESH_SQL.format(ids='OLD.product_id')}; END",
+)
+
+# Banco novo: create_all() cria os triggers junto com a tabela
+for _sql in TRIGGERS:
+    event.listen(Variation.__table__, 'after_create', DDL(_sql).execute_if(dialect='sqlite'))
+
+
+def create_triggers(conn):
+    """Recebe a conexão sqlite3 (como as migrações)."""
+    for sql in TRIGGERS:
+        conn.execute(sql)
+
+
+def refresh_summary(conn):
+    """Recalcula o resumo de todos os produtos."""
+    conn.execute(_REFRESH_SQL.format(ids='SELECT id FROM product'))
+
+
+# --- Reserva no Checkout ---
+
+def reserve(lines, order, session=None):
+    """
+    Baixa o estoque de cada linha (CartLine) e grava as reservas do pedido,
+    na transação da sessão. Levanta InsufficientStock na primeira linha sem
+    estoque: quem chama deve fazer rollback.
+    """
+    session = session or db.session
+    if order.id is None:
+        session.flush()
+    table = Variation.__table__
+    expires_at = datetime.datetime.now() + datetime.timedelta(
+        hours=current_app.config.get('STOCK_RESERVATION_HOURS', 48)
+    )
+    sold_out, slugs = False, set()
+    for line in lines:
+        variation_id = line.variation.id
+        result = session.execute(
+            update(table)
+            .where(table.c.id == variation_id, table.c.stock >= line.quantity)
+            .values(stock=table.c.stock - line.quantity)
+            .returning(table.c.stock)
+        ).first()
+        if result is None:
+            available = session.execute(
+                select(table.c.stock).where(table.c.id == variation_id)
+            ).scalar()
+            raise InsufficientStock(line, available or 0)
+        session.add(StockReservation(order_id=order.id, variation_id=variation_id,
+                                     quantity=line.quantity, expires_at=expires_at))
+        sold_out = sold_out or result.stock <= 0
+        slugs.add(line.product.slug)
+    bump = session.info.setdefault('cache_bump', set())
+    # A página do produto mostra o estoque de cada tamanho (e o máximo do
+    # campo quantidade): toda reserva invalida só a dos produtos do pedido
+    bump.update(product_generation(slug) for slug in slugs)
+    # Tamanho esgotado muda os cards, as facetas (?estoque=1) e a home
+    if sold_out:
+        bump.update(('home', 'catalog'))
+
+
+def release(connection, order_ids, now=None):
+    """
+    Devolve ao estoque as reservas ativas dos pedidos. Funciona com a
+    conexão de um evento de mapper (mesma transação do flush) ou de
+    `db.engine.begin()`. Retorna quantas reservas foram liberadas.
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+    table = StockReservation.__table__
+    variations = Variation.__table__
+    active = connection.execute(
+        select(table.c.id, table.c.variation_id, table.c.quantity)
+        .where(table.c.order_id.in_(order_ids), table.c.released_at.is_(None))
+    ).all()
+    if not active:
+        return 0
+    returned = {}
+    for row in active:
+        returned[row.variation_id] = returned.get(row.variation_id, 0) + row.quantity
+    for variation_id, quantity in returned.items():
+        connection.execute(
+            update(variations).where(variations.c.id == variation_id)
+            .values(stock=variations.c.stock + quantity)
+        )
+    connection.execute(
+        update(table).where(table.c.id.in_([row.id for row in active]))
+        .values(released_at=now or datetime.datetime.now())
+    )
+    return len(active)
+
+
+def reacquire(connection, order_id, now=None):
+    """
+    Baixa de novo o estoque das reservas devolvidas do pedido (pedido que
+    sai de 'Cancelado'). Levanta ReservationUnavailable se faltar estoque:
+    a transação inteira deve ser desfeita. Retorna quantas foram refeitas.
+    """
+    table = StockReservation.__table__
+    variations = Variation.__table__
+    released = connection.execute(
+        select(table.c.id, table.c.variation_id, table.c.quantity)
+        .where(table.c.order_id == order_id, table.c.released_at.isnot(None))
+    ).all()
+    if not released:
+        return 0
+    wanted = {}
+    for row in released:
+        wanted[row.variation_id] = wanted.get(row.variation_id, 0) + row.quantity
+    for variation_id, quantity in wanted.items():
+        result = connection.execute(
+            update(variations)
+            .where(variations.c.id == variation_id, variations.c.stock >= quantity)
+            .values(stock=variations.c.stock - quantity)
+            .returning(variations.c.stock)
+        ).first()
+        if result is None:
+            row = connection.execute(
+                select(Product.__table__.c.name, variations.c.size, variations.c.stock)
+                .join(Product.__table__, Product.__table__.c.id == variations.c.product_id)
+                .where(variations.c.id == variation_id)
+            ).first()
+            name, size, available = row if row is not None else ('Variação removida', '-', 0)
+            raise ReservationUnavailable(order_id, name, size, quantity, available)
+    now = now or datetime.datetime.now()
+    connection.execute(
+        update(table).where(table.c.id.in_([row.id for row in released])).values(
+            released_at=None,
+            expires_at=now + datetime.timedelta(hours=current_app.config.get('STOCK_RESERVATION_HOURS', 48)),
+        )
+    )
+    return len(released)
+
+
+def _bump_catalog(order):
+    # Invalidado no commit da sessão (ver cache.py)
+    session = object_session(order)
+    if session is not None:
+        session.info.setdefault('cache_bump', set()).update(('home', 'catalog'))
+
+
+def _stored_status(connection, order_id):
+    table = Order.__table__
+    return connection.execute(select(table.c.status).where(table.c.id == order_id)).scalar()
+
+
+@event.listens_for(Order, 'before_update')
+def _order_updating(mapper, connection, target):
+    if not inspect(target).attrs.status.history.has_changes():
+        return
+    stored = _stored_status(connection, target.id)
+    if stored == target.status:
+        return
+    if target.status == CANCELLED:
+        changed = release(connection, [target.id])
+    elif stored == CANCELLED:
+        changed = reacquire(connection, target.id)
+    else:
+        return
+    if changed:
+        _bump_catalog(target)
+
+
+@event.listens_for(Order, 'before_delete')
+def _order_deleting(mapper, connection, target):
+    table = StockReservation.__table__
+    # Apagar um lead pendente devolve o estoque; um pedido concluído, não
+    if _stored_status(connection, target.id) == PENDING and release(connection, [target.id]):
+        _bump_catalog(target)
+    connection.execute(table.delete().where(table.c.order_id == target.id))
+
+
+def release_expired(now=None):
+    """
+    Cancela os pedidos pendentes com reservas vencidas e devolve o estoque,
+    na mesma transação. UPDATE fora do ORM: o resumo diário (rollups.py)
+    é ajustado aqui.
+    """
+    now = now or datetime.datetime.now()
+    table = StockReservation.__table__
+    orders = Order.__table__
+    with db.engine.begin() as conn:
+        expired = conn.execute(
+            select(orders.c.id, orders.c.created_at, orders.c.total_price)
+            .where(orders.c.status == PENDING, orders.c.id.in_(
+                select(table.c.order_id)
+                .where(table.c.released_at.is_(None), table.c.expires_at <= now)
+            ))
+        ).all()
+        order_ids = [row.id for row in expired]
+        if not order_ids:
+            return [], 0
+        released = release(conn, order_ids, now=now)
+        conn.execute(
+            update(orders).where(orders.c.id.in_(order_ids), orders.c.status == PENDING)
+            .values(status=CANCELLED)
+        )
+        deltas = []
+        for row in expired:
+            day = rollups._as_day(row.created_at)
+            deltas.append((day, PENDING, -1, -(row.total_price or 0.0)))
+            deltas.append((day, CANCELLED, 1, row.total_price))
+        rollups.apply_deltas(conn, deltas)
+    return order_ids, released
+
+
+def init_app(app):
+    app.cli.add_command(stock_cli)
+
+
+# --- Comandos CLI: flask stock release-expired/refresh ---
+
+stock_cli = AppGroup('stock', help='Estoque: reservas dos pedidos e resumo por produto.')
+
+
+@stock_cli.command('release-expired')
+def release_expired_command():
+    """Cancela os pedidos pendentes vencidos e devolve as reservas ao estoque."""
+    from cache import generations
+    order_ids, released = release_expired()
+    if order_ids:
+        generations.bump('home', 'catalog')
+    print(f"{len(order_ids)} pedido(s) vencido(s) cancelado(s); "
+          f"{released} reserva(s) devolvida(s) ao estoque.")
+
+
+@stock_cli.command('refresh')
+def refresh_command():
+    """Recalcula total_stock/in_stock de todos os produtos."""
+    with db.engine.begin() as conn:
+        raw = conn.connection.driver_connection
+        create_triggers(raw)
+        refresh_summary(raw)
+    print("Resumo de estoque recalculado.")
@@ -0,0 +1,84 @@
+# tests/test_query_counts.py
+"""
+Limite de queries das páginas da loja, num catálogo sintético pequeno
+(seed.py). Os números não dependem da quantidade de produtos: se alguém
+voltar a carregar um relacionamento por card (N+1), o teste falha e
+mostra as queries executadas.
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app  # noqa: E402
+from catalog import assert_max_queries  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Category, Product  # noqa: E402
+from seed import seed_database  # noqa: E402
+
+# Mais produtos que uma página da listagem (catalog.DEFAULT_PAGE_SIZE)
+PRODUCTS = 60
+
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('store')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp / 'store.db'}",
+        'CACHE_BACKEND': 'null',  # toda request vai ao banco
+        'CACHE_DIR': str(tmp / 'cache'),
+        'COUNTER_SPOOL_PATH': None,
+        'COUNTER_FLUSH_INTERVAL': 3600,  # a thread dos contadores não entra na contagem
+        'UPLOAD_FOLDER': str(tmp / 'uploads'),
+    })
+    with app.app_context():
+        seed_database(products=PRODUCTS, categories=4, orders=20, seed=1)
+        category = db.session.query(Category).join(Category.products)\
+            .filter(Product.active == True).order_by(Category.id).first()
+        product = Product.query.filter_by(active=True).order_by(Product.id).first()
+        urls = {
+            'category': f'/categoria/{category.slug}',
+            'product': f'/produto/{product.slug}',
+        }
+    # A primeira request faz trabalho único do processo (preços vencidos,
+    # cache do layout) que não entra no limite das páginas
+    app.test_client().get('/')
+    return app, urls
+
+
+def get_within(app, url, limit):
+    client = app.test_client()
+    with app.app_context(), assert_max_queries(limit):
+        response = client.get(url)
+    assert response.status_code == 200, url
+    return response
+
+
+def test_index(store):
+    app, _ = store
+    get_within(app, '/', 6)
+
+
+def test_produtos(store):
+    app, _ = store
+    get_within(app, '/produtos', 8)
+
+
+def test_produtos_with_facets(store):
+    app, _ = store
+    get_within(app, '/produtos?tamanho=M&estoque=1&ordem=menor-preco', 8)
+
+
+def test_categoria(store):
+    app, urls = store
+    get_within(app, urls['category'], 9)
+
+
+def test_produto_detalhe(store):
+    app, urls = store
+    get_within(app, urls['product'], 4)